@@ -0,0 +1,144 @@
+"""
+Micro-benchmarks for the feature pipeline hot paths.
+
+Usage:
+    python scripts/benchmark_features.py
+    python scripts/benchmark_features.py --frames 5400 --repeat 5
+    python scripts/benchmark_features.py --video data/uploads/match.mp4
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.ffmpeg_decoder import ffmpeg_available  # noqa: E402
+from utils.video_processor import (
+    DEFAULT_BLOCK_FRAMES,
+    extract_keypoints_from_video,
+    summarize_feature_sequence,
+    summarize_feature_windows,
+    sliding_windows,
+    MODEL_FRAMES,
+    WindowFeatureEngine,
+)
+
+FEATURE_DIM = 19
+
+
+def _summarize_per_dim(feature_seq, target_frames=MODEL_FRAMES):
+    """Previous implementation: one np.interp call per feature dimension."""
+    arr = np.asarray(feature_seq, dtype=np.float32)
+    n_frames, feat_dim = arr.shape
+    src_idx = np.arange(n_frames, dtype=np.float32)
+    dst_idx = np.linspace(0, n_frames - 1, num=target_frames, dtype=np.float32)
+    sampled = np.empty((target_frames, feat_dim), dtype=np.float32)
+    for d in range(feat_dim):
+        sampled[:, d] = np.interp(dst_idx, src_idx, arr[:, d])
+    return sampled.flatten()
+
+
+def _best_of(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def bench_summarize(n_frames, window_frames, repeat):
+    rng = np.random.default_rng(0)
+    seq = (rng.random((n_frames, FEATURE_DIM)) * 255).astype(np.float32)
+    stride = max(window_frames // 2, 4)
+    starts = range(0, n_frames - window_frames + 1, stride)
+
+    def per_dim():
+        return np.stack([_summarize_per_dim(seq[s:s + window_frames]) for s in starts])
+
+    def per_window():
+        return np.stack([summarize_feature_sequence(seq[s:s + window_frames]) for s in starts])
+
+    def batched():
+        return summarize_feature_windows(sliding_windows(seq, window_frames, stride))
+
+    t_ref, ref = _best_of(per_dim, repeat)
+    t_vec, vec = _best_of(per_window, repeat)
+    t_batch, batch = _best_of(batched, repeat)
+
+    assert np.array_equal(ref, vec) and np.array_equal(ref, batch)
+    print(f"summarize: {len(ref)} windows of {window_frames} frames")
+    print(f"  per-dim np.interp : {t_ref * 1000:8.2f} ms")
+    print(f"  vectorized/window : {t_vec * 1000:8.2f} ms  ({t_ref / t_vec:5.1f}x)")
+    print(f"  batched           : {t_batch * 1000:8.2f} ms  ({t_ref / t_batch:5.1f}x)")
+
+    # Smaller hops: batched resampling vs. the shared prefix/indexed engine.
+    for hop in (stride, max(stride // 2, 1), 1):
+        t_b, b = _best_of(lambda: summarize_feature_windows(sliding_windows(seq, window_frames, hop)), repeat)
+
+        def engine():
+            eng = WindowFeatureEngine(seq, window_frames)
+            return eng.window_vectors(eng.window_starts(hop))
+
+        t_e, e = _best_of(engine, repeat)
+        assert np.array_equal(b, e)
+        print(f"  hop={hop:<3} {len(b):6d} win : batched {t_b * 1000:8.2f} ms  engine {t_e * 1000:8.2f} ms")
+
+
+def _format_timings(timings):
+    stages = ("decode", "preprocess", "features", "wall")
+    return "  ".join(f"{k}={timings.get(k, 0.0) * 1000:7.1f}ms" for k in stages)
+
+
+def bench_extract(video_path, pipeline_workers):
+    print(f"extract: {video_path}")
+    timings = {}
+    serial = extract_keypoints_from_video(video_path, decoder="opencv", timings=timings)
+    print(f"  serial        : {_format_timings(timings)}  frames={timings.get('frames', 0)}")
+    for workers in pipeline_workers:
+        timings = {}
+        piped = extract_keypoints_from_video(
+            video_path, pipeline_workers=workers, decoder="opencv", timings=timings
+        )
+        assert np.array_equal(serial, piped)
+        print(f"  pipeline x{workers:<3}: {_format_timings(timings)}")
+
+    timings = {}
+    blocked = extract_keypoints_from_video(
+        video_path, block_frames=DEFAULT_BLOCK_FRAMES, decoder="opencv", timings=timings
+    )
+    assert np.allclose(serial, blocked, rtol=1e-5, atol=1e-4)
+    print(f"  block x{DEFAULT_BLOCK_FRAMES:<6}: {_format_timings(timings)}")
+
+    if ffmpeg_available():
+        for block_frames in (0, DEFAULT_BLOCK_FRAMES):
+            timings = {}
+            piped = extract_keypoints_from_video(
+                video_path, block_frames=block_frames, decoder="ffmpeg", timings=timings
+            )
+            assert piped.shape == serial.shape
+            print(f"  ffmpeg blk={block_frames:<3}: {_format_timings(timings)}")
+    else:
+        print("  ffmpeg        : not installed, skipped")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=2700, help="Per-frame features in the sequence")
+    parser.add_argument("--window-frames", type=int, default=24)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--video", default=None, help="Also benchmark per-frame extraction on this video")
+    parser.add_argument("--pipeline-workers", type=int, nargs="*", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    bench_summarize(args.frames, args.window_frames, args.repeat)
+    if args.video:
+        bench_extract(args.video, args.pipeline_workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+import os
+import sys
+
+# Add root path so utils imports work
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from utils.analysis_jobs import MATCH_ANALYSIS_JOB, run_match_analysis
+from utils.job_queue import DONE, claim_next_job, run_job
+
+JOB_HANDLERS = {
+    MATCH_ANALYSIS_JOB: run_match_analysis,
+}
+
+
+def _run(job_id: str, db_path=None) -> str:
+    status = run_job(job_id, JOB_HANDLERS, db_path)
+    print(f"{'✅' if status == DONE else '⚠️'} Job {job_id}: {status}")
+    return status
+
+
+def main(job_id: str, db_path=None, drain: bool = True) -> int:
+    status = _run(job_id, db_path)
+    # Keep taking queued jobs, so the queue drains with no Streamlit session open.
+    while drain:
+        next_id = claim_next_job(db_path)
+        if next_id is None:
+            break
+        _run(next_id, db_path)
+    return 0 if status == DONE else 1
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(
+        description="Runs a queued background job (started by dispatch_jobs), then any still queued."
+    )
+    parser.add_argument("job_id")
+    parser.add_argument("--db", default=None, help="Job store (default: PADELEDGE_JOB_DB).")
+    parser.add_argument(
+        "--once", action="store_true", help="Exit after this job instead of claiming queued ones."
+    )
+    args = parser.parse_args()
+    sys.exit(main(args.job_id, args.db, drain=not args.once))
@@ -4,6 +4,7 @@ import glob
 import numpy as np
 import joblib
 import json
+import time
 from datetime import datetime
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
@@ -12,7 +13,24 @@ from sklearn.metrics import classification_report, accuracy_score
 # Add root path so utils imports work
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-from utils.video_processor import extract_clip_features, MODEL_FRAMES
+from utils.video_processor import (
+    clip_coarse_energy,
+    extract_clip_features,
+    resolve_decoder,
+    FEATURE_EXTRACTOR_VERSION,
+    MODEL_FRAMES,
+)
+from utils.feature_cache import cached_clip_coarse_energy, cached_clip_features, FEATURE_CACHE_DIR
+from utils.file_hash import file_sha256
+from utils.motion_gate import calibrate_motion_gate
+from utils.forest_engine import (
+    compile_forest,
+    flat_forest_path,
+    load_flat_forest,
+    max_proba_difference,
+    save_flat_forest,
+)
+from utils.worker_pool import init_decode_worker, resolve_worker_count
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 DATA_DIR = os.getenv("PADELEDGE_DATA_DIR", os.path.join(BASE_DIR, "data", "samples"))
@@ -23,8 +41,15 @@ RELEASE_REPORT_PATH = os.getenv(
     "PADELEDGE_RELEASE_REPORT_PATH",
     os.path.join(BASE_DIR, "models", "release_report.json"),
 )
+# Flattened array copy of the promoted forest that ShotDetector prefers at inference.
+FOREST_PATH = os.getenv("PADELEDGE_FOREST_PATH", flat_forest_path(MODEL_PATH))
+# Largest probability difference to sklearn accepted for the flattened forest.
+FOREST_MAX_PROBA_DIFF = 1e-9
 MIN_ACCURACY = float(os.getenv("PADELEDGE_MIN_ACCURACY", "0.65"))
 MIN_MACRO_F1 = float(os.getenv("PADELEDGE_MIN_MACRO_F1", "0.55"))
+TRAIN_WORKERS = int(os.getenv("PADELEDGE_TRAIN_WORKERS", "1"))
+TARGET_FPS = float(os.getenv("PADELEDGE_TARGET_FPS", "0")) or None
+FRAME_STRIDE = int(os.getenv("PADELEDGE_FRAME_STRIDE", "0")) or None
 
 
 def find_training_videos():
@@ -40,16 +65,100 @@ def find_training_videos():
             video_files += glob.glob(os.path.join(class_dir, "*.mov"))
             video_files += glob.glob(os.path.join(class_dir, "*.avi"))
 
-            for vf in video_files:
+            for vf in sorted(video_files):
                 files.append(vf)
                 labels.append(label)
 
     return files, labels
 
 
-def load_training_data(verbose=True):
+def _extract_clip_job(video_path, use_cache, decode_options):
+    """
+    Returns (features, cache_hit, error, coarse_energy) so one bad clip never
+    aborts the run. The coarse energy calibrates the two-pass keyframe scan
+    and is cached with the features.
+    """
+    try:
+        if use_cache:
+            features, hit = cached_clip_features(
+                video_path, target_frames=MODEL_FRAMES, **decode_options
+            )
+            coarse_energy, _ = cached_clip_coarse_energy(video_path)
+        else:
+            features = extract_clip_features(
+                video_path, target_frames=MODEL_FRAMES, **decode_options
+            )
+            coarse_energy = clip_coarse_energy(video_path)
+            hit = False
+        return features, hit, None, coarse_energy
+    except Exception as e:
+        return None, False, f"{type(e).__name__}: {e}", None
+
+
+def _report_progress(done, total, video_path, hit, error, verbose):
+    if not verbose:
+        return
+    if error:
+        status = f"failed ({error})"
+    else:
+        status = "cached" if hit else "extracted"
+    print(f"➡ [{done}/{total}] Fixed-length features {status}: {video_path}")
+
+
+def _extract_all(files, use_cache, workers, verbose, decode_options):
+    """Extracts features for all files; results are returned in input order."""
+    results = [None] * len(files)
+
+    if workers <= 1 or len(files) <= 1:
+        for i, vf in enumerate(files):
+            results[i] = _extract_clip_job(vf, use_cache, decode_options)
+            _report_progress(i + 1, len(files), vf, results[i][1], results[i][2], verbose)
+        return results
+
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(files)),
+        initializer=init_decode_worker,
+    ) as pool:
+        futures = {
+            pool.submit(_extract_clip_job, vf, use_cache, decode_options): i
+            for i, vf in enumerate(files)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            i = futures[future]
+            try:
+                results[i] = future.result()
+            except Exception as e:
+                # A worker crash (e.g. segfault in a codec) surfaces here.
+                results[i] = (None, False, f"{type(e).__name__}: {e}", None)
+            _report_progress(done, len(files), files[i], results[i][1], results[i][2], verbose)
+
+    return results
+
+
+def resolve_decode_options(target_fps=None, frame_stride=None, decoder=None):
+    """
+    Decode rate and backend for extraction; falls back to PADELEDGE_TARGET_FPS /
+    PADELEDGE_FRAME_STRIDE / PADELEDGE_DECODER. "auto" is resolved here so the
+    concrete backend is what gets recorded for inference.
+    """
+    return {
+        "target_fps": target_fps if target_fps is not None else TARGET_FPS,
+        "frame_stride": frame_stride if frame_stride is not None else FRAME_STRIDE,
+        "decoder": resolve_decoder(decoder),
+    }
+
+
+def load_training_data(verbose=True, use_cache=True, workers=None, decode_options=None):
+    workers = resolve_worker_count(workers, TRAIN_WORKERS)
+    decode_options = decode_options or resolve_decode_options()
     if verbose:
         print("📂 Scanning training data folder:", DATA_DIR)
+        if use_cache:
+            print("🗄 Feature cache:", FEATURE_CACHE_DIR)
+        print(f"⚙ Extraction workers: {workers}")
+        print(f"⚙ Decode options: {decode_options}")
 
     files, labels = find_training_videos()
 
@@ -58,22 +167,34 @@ def load_training_data(verbose=True):
 
     X = []
     y = []
-
-    for vf, label in zip(files, labels):
-        if verbose:
-            print(f"➡ Extracting fixed-length features from: {vf}")
-
-        features = extract_clip_features(vf, target_frames=MODEL_FRAMES)
+    coarse = []
+    cache_hits = 0
+    failed = []
+
+    results = _extract_all(files, use_cache, workers, verbose, decode_options)
+    for vf, label, (features, hit, error, coarse_energy) in zip(files, labels, results):
+        cache_hits += int(hit)
+        if error:
+            failed.append((vf, error))
+            continue
 
         if features is None:
             if verbose:
-                print("⚠ No frame features detected — skipping")
+                print(f"⚠ No frame features detected — skipping: {vf}")
             continue
 
         X.append(features)
         y.append(label)
+        coarse.append(coarse_energy)
 
-    return np.array(X, dtype=np.float32), np.array(y)
+    if verbose and use_cache:
+        print(f"🗄 Feature cache hits: {cache_hits}/{len(files)}")
+    if failed:
+        print(f"⚠ Feature extraction failed for {len(failed)} clip(s):")
+        for vf, error in failed:
+            print(f"   - {vf}: {error}")
+
+    return np.array(X, dtype=np.float32), np.array(y), coarse
 
 
 def _archive_existing_model_if_present():
@@ -84,9 +205,85 @@ def _archive_existing_model_if_present():
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
     archived_path = os.path.join(ARCHIVE_DIR, f"shot_classifier_{ts}.pkl")
     os.replace(MODEL_PATH, archived_path)
+    if os.path.exists(FOREST_PATH):
+        os.replace(FOREST_PATH, flat_forest_path(archived_path))
     return archived_path
 
 
+def export_flat_forest(model, X_check, verbose=True):
+    """
+    Compiles the promoted forest into FOREST_PATH and checks it against
+    sklearn's predict_proba on X_check. A forest that does not match is not
+    written (and a stale one is removed), so inference falls back to the pickle.
+    Returns the export report stored in metrics.json.
+    """
+    forest = compile_forest(model, source_sha256=file_sha256(MODEL_PATH))
+    max_diff = max_proba_difference(forest, model, X_check)
+    labels_match = bool(np.array_equal(forest.predict(X_check), model.predict(X_check)))
+    report = {
+        "path": FOREST_PATH,
+        "trees": forest.n_trees,
+        "nodes": int(len(forest.feature)),
+        "max_depth": forest.max_depth,
+        "checked_rows": int(len(X_check)),
+        "max_proba_diff": max_diff,
+        "labels_match": labels_match,
+        "exported": False,
+    }
+    if max_diff > FOREST_MAX_PROBA_DIFF or not labels_match:
+        if os.path.exists(FOREST_PATH):
+            os.remove(FOREST_PATH)
+        if verbose:
+            print(f"⚠ Flat forest does not match sklearn (max diff {max_diff:.2e}); not exported.")
+        return report
+
+    save_flat_forest(forest, FOREST_PATH)
+    t0 = time.perf_counter()
+    joblib.load(MODEL_PATH)
+    t1 = time.perf_counter()
+    load_flat_forest(FOREST_PATH)
+    t2 = time.perf_counter()
+    report.update(
+        {
+            "exported": True,
+            "pickle_bytes": os.path.getsize(MODEL_PATH),
+            "forest_bytes": os.path.getsize(FOREST_PATH),
+            "pickle_load_sec": t1 - t0,
+            "forest_load_sec": t2 - t1,
+        }
+    )
+    if verbose:
+        print(
+            f"✅ Flat forest exported to: {FOREST_PATH} "
+            f"({report['forest_bytes'] / 1e6:.1f} MB vs {report['pickle_bytes'] / 1e6:.1f} MB pickle, "
+            f"max proba diff {max_diff:.1e})"
+        )
+    return report
+
+
+def _load_previous_metrics():
+    try:
+        with open(METRICS_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def _previous_active_decode():
+    previous = _load_previous_metrics()
+    # Models trained before the decoder was recorded always used OpenCV.
+    return previous.get("active_decode") or {
+        "target_fps": None,
+        "frame_stride": None,
+        "decoder": "opencv",
+    }
+
+
+def _previous_active_motion_gate():
+    # Models trained before the gate existed run ungated.
+    return _load_previous_metrics().get("active_motion_gate")
+
+
 def _build_metrics(y_true, preds, trained_on_full_data=False):
     if y_true is None or preds is None:
         return {
@@ -120,8 +317,21 @@ def _build_metrics(y_true, preds, trained_on_full_data=False):
     }
 
 
-def train_model(verbose=True):
-    X, y = load_training_data(verbose=verbose)
+def train_model(
+    verbose=True,
+    use_cache=True,
+    workers=None,
+    target_fps=None,
+    frame_stride=None,
+    decoder=None,
+):
+    decode_options = resolve_decode_options(target_fps, frame_stride, decoder)
+    X, y, coarse_energy = load_training_data(
+        verbose=verbose,
+        use_cache=use_cache,
+        workers=workers,
+        decode_options=decode_options,
+    )
 
     if len(X) == 0:
         raise RuntimeError("❌ No training data found! Aborting training.")
@@ -165,10 +375,27 @@ def train_model(verbose=True):
             print("⚠ Trained on full dataset (no holdout metrics available).")
 
     metrics_payload["feature_dim"] = int(X.shape[1]) if X.ndim == 2 else None
+    metrics_payload["feature_extractor_version"] = FEATURE_EXTRACTOR_VERSION
+    # ShotDetector reads these back so inference decodes at the training rate.
+    metrics_payload["target_fps"] = decode_options["target_fps"]
+    metrics_payload["frame_stride"] = decode_options["frame_stride"]
+    metrics_payload["decoder"] = decode_options["decoder"]
     metrics_payload["model_version"] = datetime.now().strftime("%Y%m%d_%H%M%S")
     metrics_payload["min_accuracy_gate"] = MIN_ACCURACY
     metrics_payload["min_macro_f1_gate"] = MIN_MACRO_F1
 
+    # Idle-window gate for inference, calibrated on the labelled shots so real
+    # shots pass it; the coarse threshold covers the two-pass keyframe scan.
+    motion_gate = calibrate_motion_gate(X, coarse_energy=coarse_energy)
+    metrics_payload["motion_gate"] = motion_gate
+    if verbose and motion_gate:
+        print(
+            f"🚦 Motion gate threshold: {motion_gate['threshold']:.3f} "
+            f"(training shots passing: {motion_gate['train_pass_rate']:.1%})"
+        )
+        if motion_gate["coarse_threshold"] is not None:
+            print(f"🚦 Coarse scan threshold: {motion_gate['coarse_threshold']:.3f}")
+
     has_existing_model = os.path.exists(MODEL_PATH)
     gate_evaluated = not metrics_payload.get("dummy", False)
     gate_passed = True
@@ -189,6 +416,7 @@ def train_model(verbose=True):
     os.makedirs(os.path.dirname(RELEASE_REPORT_PATH), exist_ok=True)
     if promoted:
         joblib.dump(model, MODEL_PATH)
+        metrics_payload["flat_forest"] = export_flat_forest(model, X, verbose=verbose)
 
     metrics_payload["promoted"] = promoted
     metrics_payload["release_gate_evaluated"] = gate_evaluated
@@ -198,6 +426,14 @@ def train_model(verbose=True):
     )
     metrics_payload["archived_previous_model"] = archived_previous
     metrics_payload["active_model_path"] = MODEL_PATH
+    # Decode settings the *active* model was trained with; a blocked candidate
+    # must not change how the kept model is fed at inference time.
+    metrics_payload["active_decode"] = (
+        dict(decode_options) if promoted else _previous_active_decode()
+    )
+    metrics_payload["active_motion_gate"] = (
+        motion_gate if promoted else _previous_active_motion_gate()
+    )
 
     with open(METRICS_PATH, "w", encoding="utf-8") as f:
         json.dump(metrics_payload, f, ensure_ascii=False, indent=2)
@@ -215,9 +451,23 @@ def train_model(verbose=True):
     return promoted
 
 
-def main(verbose=False):
+def main(
+    verbose=False,
+    use_cache=True,
+    workers=None,
+    target_fps=None,
+    frame_stride=None,
+    decoder=None,
+):
     try:
-        train_model(verbose=verbose)
+        train_model(
+            verbose=verbose,
+            use_cache=use_cache,
+            workers=workers,
+            target_fps=target_fps,
+            frame_stride=frame_stride,
+            decoder=decoder,
+        )
     except Exception as e:
         print("❌ TRAINING ERROR:", str(e))
         raise
@@ -227,6 +477,43 @@ if __name__ == "__main__":
     import argparse
     parser = argparse.ArgumentParser()
     parser.add_argument("-v", "--verbose", action="store_true")
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Ignore the per-clip feature cache and decode every clip.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Feature extraction processes (0 = all cores). "
+        "Defaults to PADELEDGE_TRAIN_WORKERS or 1.",
+    )
+    parser.add_argument(
+        "--target-fps",
+        type=float,
+        default=None,
+        help="Decode roughly this many frames per second (PADELEDGE_TARGET_FPS).",
+    )
+    parser.add_argument(
+        "--frame-stride",
+        type=int,
+        default=None,
+        help="Decode every Nth frame; overrides --target-fps (PADELEDGE_FRAME_STRIDE).",
+    )
+    parser.add_argument(
+        "--decoder",
+        choices=["auto", "opencv", "ffmpeg"],
+        default=None,
+        help="Video decoder backend (PADELEDGE_DECODER, default auto).",
+    )
     args = parser.parse_args()
 
-    main(verbose=args.verbose)
+    main(
+        verbose=args.verbose,
+        use_cache=not args.no_cache,
+        workers=args.workers,
+        target_fps=args.target_fps,
+        frame_stride=args.frame_stride,
+        decoder=args.decoder,
+    )
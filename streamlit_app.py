@@ -1,15 +1,31 @@
 # streamlit_app.py
 import os
 import json
-from datetime import datetime
+import time
+from datetime import date, datetime
 import streamlit as st
 
 # --- Match Analyzer Utils ---
-from utils.shot_detector import ShotDetector
+from utils.shot_detector import EARLY_EXIT, ShotDetector
 from utils.timeline import build_timeline
-from utils.thumbnails import extract_thumbnail
-from utils.heatmap import generate_heatmap_xy
+from utils.heatmap_store import accumulate_heatmap, heatmap_store_index, render_accumulated_heatmap
 from utils.feedback import generate_feedback
+from utils.analysis_cache import analysis_cache_key, analysis_cache_stats, load_analysis
+from utils.analysis_jobs import MATCH_ANALYSIS_JOB, analysis_variant, match_analysis_params
+from utils.job_queue import (
+    ACTIVE_STATUSES,
+    CANCELLED,
+    FAILED,
+    JOB_POLL_SEC,
+    QUEUED,
+    cancel_job,
+    dispatch_jobs,
+    get_job,
+    submit_job,
+)
+from utils.upload_store import save_upload_by_content
+from utils.stage_timing import StageTimer
+from utils.metrics import ANALYSIS_LOG_PATH
 
 # --- Training Dashboard ---
 from utils.training_dashboard import render_training_dashboard
@@ -38,9 +54,8 @@ st.sidebar.caption("PadelEdge Pro • AI Shot Recognition")
 
 
 def log_analysis_event(record: dict):
-    log_path = os.path.join("data", "analysis_logs", "match_analyses.jsonl")
-    os.makedirs(os.path.dirname(log_path), exist_ok=True)
-    with open(log_path, "a", encoding="utf-8") as f:
+    os.makedirs(os.path.dirname(ANALYSIS_LOG_PATH), exist_ok=True)
+    with open(ANALYSIS_LOG_PATH, "a", encoding="utf-8") as f:
         f.write(json.dumps(record, ensure_ascii=False) + "\n")
 
 # =========================================================
@@ -62,35 +77,191 @@ if page == "Match Analyzer":
         st.info("Upload en video til venstre panel for at starte.")
         st.stop()
 
-    # Save upload
-    os.makedirs("data/uploads", exist_ok=True)
-    video_path = os.path.join("data", "uploads", uploaded.name)
-    with open(video_path, "wb") as f:
-        f.write(uploaded.read())
+    # Save upload: streamed to disk in chunks and hashed in the same pass,
+    # once per uploaded file (reruns reuse the saved copy). Stored under its
+    # content hash, so another upload with the same name never replaces a
+    # file a job is still analysing.
+    upload_id = getattr(uploaded, "file_id", None) or f"{uploaded.name}:{uploaded.size}"
+    saved = st.session_state.get("saved_upload")
+    if saved is None or saved[0] != upload_id or not os.path.exists(saved[1].path):
+        upload_timer = StageTimer()
+        with upload_timer.stage("upload_write"):
+            saved = (upload_id, save_upload_by_content(uploaded, uploaded.name))
+        st.session_state["saved_upload"] = saved
+        # Logged with the first analysis of this upload only.
+        st.session_state["upload_stages"] = upload_timer.as_dict()
+    video_path = saved[1].path
+    video_sha256 = saved[1].sha256
 
     st.video(video_path)
-    st.info("Kører analyse — dette kan tage ét øjeblik...")
+    analysis_mode = st.radio(
+        "Analysemetode",
+        ["Standard", "Parallel (alle CPU-kerner)", "Hurtig to-trins (lange kampoptagelser)"],
+        index=0,
+        horizontal=True,
+        help=(
+            "Parallel deler videoen i tidsbidder, der analyseres samtidigt. "
+            "To-trins finder først dueller ud fra bevægelse i lav opløsning og analyserer kun dem i fuld rate."
+        ),
+    )
+    player_id = st.text_input(
+        "Spiller-ID (valgfri)",
+        help="Slagene lægges til spillerens sæson-heatmap. Samme kamp tælles kun med én gang pr. spiller.",
+    ).strip()
+    match_date = st.date_input(
+        "Kampdato",
+        value=date.today(),
+        help="Dagen kampen blev spillet; sæson-heatmappet filtreres på den.",
+    ) if player_id else None
+    two_pass = analysis_mode.startswith("Hurtig")
+    parallel = analysis_mode.startswith("Parallel")
+    early_exit = st.checkbox(
+        "Tidligt stop i klassifikationen",
+        value=EARLY_EXIT,
+        help=(
+            "Stopper for hvert vindue, så snart skovens afstemning er afgjort. "
+            "Samme slag-typer, men konfidensen bliver en nedre grænse."
+        ),
+    )
 
     # ------------------------------------
     # Run shot analysis
     # ------------------------------------
+    mode = "two_pass" if two_pass else ("parallel" if parallel else "single_pass")
+    # The model itself is cached process-wide across reruns and sessions. It
+    # is needed here only to key the cache; analyses run in worker processes.
     detector = ShotDetector()
-    preds, timestamps, keypoints, confidences = detector.analyze(video_path)
+    detector.early_exit = early_exit and hasattr(detector.model, "predict_early_exit")
+    variant = analysis_variant(mode, detector)
+    cache_key = analysis_cache_key(video_sha256, detector.model_sha256, variant)
+    ui_timer = StageTimer()
+    session_job = st.session_state.get("analysis_job")
+    cached = None
+    # While this session's job for the key is pending, polling reruns read the
+    # job, not the cache, so each submitted analysis counts one cache miss.
+    if session_job is None or session_job[0] != cache_key:
+        with ui_timer.stage("cache_lookup"):
+            cached = load_analysis(cache_key)
+    # Run statistics of the job that just produced the result; None on cache hits.
+    run = None
+
+    if cached is None:
+        if session_job is None or session_job[0] != cache_key:
+            params = match_analysis_params(
+                os.path.abspath(video_path), video_sha256, uploaded.name, mode, early_exit
+            )
+            session_job = (cache_key, submit_job(MATCH_ANALYSIS_JOB, params, job_key=cache_key))
+            st.session_state["analysis_job"] = session_job
+        job_id = session_job[1]
+        dispatch_jobs()
+        job = get_job(job_id)
+
+        if job["status"] in ACTIVE_STATUSES:
+            if job["status"] == QUEUED:
+                st.info("Analysen står i kø — den starter, når en worker er ledig...")
+            else:
+                st.info("Kører analyse i baggrunden — siden opdateres automatisk...")
+            st.progress(
+                job["progress"],
+                text=f"{job['progress']:.0%} ({job['frames_done']}/{job['frames_total']} frames)",
+            )
+            if st.button("Annullér analyse"):
+                cancel_job(job_id)
+            time.sleep(JOB_POLL_SEC)
+            st.rerun()
+        if job["status"] == CANCELLED:
+            st.warning("Analysen blev annulleret.")
+            if st.button("Start analysen igen"):
+                del st.session_state["analysis_job"]
+                st.rerun()
+            st.stop()
+        if job["status"] == FAILED:
+            del st.session_state["analysis_job"]
+            st.error(f"Analysen fejlede: {job['error']}")
+            st.stop()
+
+        run = job["result"]
+        if job["started_at"] and job["finished_at"]:
+            ui_timer.add("job_queue", job["started_at"] - job["created_at"])
+            ui_timer.add("job_run", job["finished_at"] - job["started_at"])
+        cache_key = run["cache_key"]
+        cached = load_analysis(cache_key)
+        # Consumed: later reruns look the result up in the cache again.
+        del st.session_state["analysis_job"]
+        if cached is None:
+            st.error("Analyse-resultatet kunne ikke indlæses fra cachen.")
+            st.stop()
+
+    preds = cached["predictions"]
+    timestamps = cached["timestamps_sec"]
+    confidences = cached["confidences"]
+    keypoints = cached["keypoints"]
+    thumbs = [cached["files"].get(f"thumb_{i}") for i in range(len(preds))]
+    heat = cached["files"].get("heatmap")
+    fresh = run is not None and not run.get("reused")
+    stages = {
+        **st.session_state.pop("upload_stages", {}),
+        **ui_timer.as_dict(),
+        **(run.get("stages", {}) if run else {}),
+    }
 
+    cache_stats = analysis_cache_stats()
     log_analysis_event(
         {
             "timestamp": datetime.utcnow().isoformat() + "Z",
             "video_name": uploaded.name,
             "video_path": video_path,
+            "video_sha256": video_sha256,
             "num_events": len(preds),
             "predictions": preds,
             "timestamps_sec": timestamps,
             "confidences": confidences,
-            "model_path": detector.model_path,
-            "model_labels": detector.class_labels,
+            "model_path": run["model_path"] if run else detector.model_path,
+            "model_sha256": run["model_sha256"] if run else detector.model_sha256,
+            "model_format": run["model_format"] if run else detector.model_format,
+            "analysis_cache": {"key": cache_key, "hit": not fresh, **cache_stats},
+            "analysis_job": session_job[1] if run else None,
+            "motion_gate": run["motion_gate"] if fresh else None,
+            "analysis_mode": mode,
+            "two_pass": run["two_pass"] if fresh else None,
+            "early_exit": run["early_exit"] if fresh else None,
+            "model_labels": run["model_labels"] if run else detector.class_labels,
+            "stages": stages,
         }
     )
 
+    if not fresh:
+        st.caption(
+            f"Resultat hentet fra analyse-cachen ({cache_stats['hits']} hits / "
+            f"{cache_stats['misses']} misses, {cache_stats['entries']} analyser gemt)"
+        )
+    else:
+        gate = run["motion_gate"]
+        if gate.get("enabled"):
+            st.caption(
+                f"Motion-gate: {gate['skipped']}/{gate['windows']} vinduer sprunget over som inaktive "
+                f"({gate['skip_rate']:.0%}, tærskel {gate['threshold']:.2f})"
+            )
+
+        if run["two_pass"]:
+            tp = run["two_pass"]
+            st.caption(
+                f"To-trins analyse: {len(tp['segments'])} dueller, "
+                f"{tp['analyzed_fraction']:.0%} af videoen analyseret i fuld rate"
+            )
+
+        ee = run["early_exit"]
+        if ee.get("enabled") and ee["windows"]:
+            st.caption(
+                f"Tidligt stop: gennemsnitligt {ee['mean_trees']:.0f}/{ee['n_trees']} træer pr. vindue "
+                f"({ee['tree_fraction']:.0%})"
+            )
+
+    if player_id:
+        # Keyed by the video, not the cache key: retrained models and other
+        # analysis modes must not count the same match again.
+        accumulate_heatmap(f"{video_sha256}:{player_id}", player_id, preds, keypoints, match_date)
+
     if not preds:
         st.error("Ingen slag fundet.")
         st.stop()
@@ -108,7 +279,7 @@ if page == "Match Analyzer":
             conf = confidences[i] if i < len(confidences) else None
             if conf is not None:
                 st.caption(f"Confidence: {conf:.2f}")
-            thumb = extract_thumbnail(video_path, ev["time"])
+            thumb = thumbs[i] if i < len(thumbs) else None
             if thumb:
                 st.image(thumb, width=220)
             st.markdown("---")
@@ -117,12 +288,35 @@ if page == "Match Analyzer":
     # Impact Heatmap
     # ------------------------------------
     st.subheader("🔥 Impact Heatmap")
-    heat = generate_heatmap_xy(keypoints)
     if heat:
         st.image(heat, use_column_width=True)
     else:
         st.info("Ingen impact-data til heatmap.")
 
+    with st.expander("Sæson-heatmap"):
+        store = heatmap_store_index()
+        if not store["players"]:
+            st.caption("Ingen spillere registreret endnu. Angiv et spiller-ID ved upload.")
+        else:
+            season_player = st.selectbox(
+                "Spiller", store["players"],
+                index=store["players"].index(player_id) if player_id in store["players"] else 0,
+            )
+            season_shot = st.selectbox("Slagtype", ["Alle"] + store["shot_types"])
+            first_day, last_day = (datetime.fromisoformat(d).date() for d in store["days"])
+            season_days = st.date_input("Periode", (first_day, last_day))
+            start_day, end_day = (season_days if len(season_days) == 2 else (season_days[0], season_days[0]))
+            season_heat = render_accumulated_heatmap(
+                player_id=season_player,
+                shot_type=None if season_shot == "Alle" else season_shot,
+                start_day=start_day,
+                end_day=end_day,
+            )
+            if season_heat:
+                st.image(season_heat, use_column_width=True)
+            else:
+                st.info("Ingen slag i den valgte periode.")
+
     # ------------------------------------
     # AI Feedback
     # ------------------------------------
@@ -0,0 +1,122 @@
+import os
+import shutil
+import sys
+from pathlib import Path
+
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+from utils.analysis_cache import (  # noqa: E402
+    analysis_cache_key,
+    analysis_cache_stats,
+    clear_analysis_cache_stats,
+    load_analysis,
+    store_analysis,
+)
+from utils.analysis_jobs import analysis_variant  # noqa: E402
+from utils.shot_detector import ShotDetector  # noqa: E402
+
+
+def _result(n_events: int):
+    return {
+        "predictions": ["bandeja"] * n_events,
+        "timestamps_sec": [float(i) for i in range(n_events)],
+        "confidences": [0.9] * n_events,
+    }
+
+
+def test_key_depends_on_video_model_and_variant():
+    key = analysis_cache_key("video", "model", "full")
+    assert key == analysis_cache_key("video", "model", "full")
+    assert key != analysis_cache_key("video2", "model", "full")
+    assert key != analysis_cache_key("video", "model2", "full")
+    assert key != analysis_cache_key("video", "model", "two_pass")
+
+
+def test_variant_depends_on_decode_window_and_gate_settings():
+    # Only the settings are read, so skip loading a model.
+    detector = ShotDetector.__new__(ShotDetector)
+    detector.early_exit = False
+    detector.decode_options = {"target_fps": 10.0, "frame_stride": None, "decoder": "opencv"}
+    detector.motion_gate = None
+    base = analysis_variant("standard", detector)
+    assert base == analysis_variant("parallel", detector)
+    assert base != analysis_variant("two_pass", detector)
+    assert base != detector.settings_signature() and detector.settings_signature() in base
+    assert detector.settings_signature() != detector.settings_signature(window_hop=0.25)
+
+    variants = {base}
+    for options in ({"target_fps": 15.0}, {"frame_stride": 2}, {"decoder": "ffmpeg"}):
+        detector.decode_options = {**detector.decode_options, **options}
+        variants.add(analysis_variant("standard", detector))
+    detector.motion_gate = {"threshold": 1.5, "coarse_threshold": None}
+    variants.add(analysis_variant("standard", detector))
+    detector.motion_gate = {"threshold": 1.5, "coarse_threshold": 0.2}
+    variants.add(analysis_variant("standard", detector))
+    assert len(variants) == 6
+
+
+def test_store_and_load_roundtrip_with_artifacts(tmp_path):
+    clear_analysis_cache_stats()
+    cache_dir = str(tmp_path / "cache")
+    thumb = tmp_path / "thumb_123.jpg"
+    thumb.write_bytes(b"jpeg")
+    key = analysis_cache_key("video", "model")
+
+    assert load_analysis(key, cache_dir) is None
+    keypoints = [np.arange(6, dtype=np.float32), np.ones(6, dtype=np.float32)]
+    entry = store_analysis(key, _result(2), keypoints, files={"thumb_0": str(thumb), "heatmap": None},
+                           cache_dir=cache_dir)
+    thumb.unlink()  # the entry keeps its own copy
+    # Other users (e.g. the web server) can list and read the entry.
+    assert os.stat(entry).st_mode & 0o055 == 0o055
+
+    cached = load_analysis(key, cache_dir)
+    assert cached["predictions"] == ["bandeja", "bandeja"]
+    assert np.array_equal(cached["keypoints"][1], keypoints[1])
+    assert set(cached["files"]) == {"thumb_0"}
+    assert Path(cached["files"]["thumb_0"]).read_bytes() == b"jpeg"
+
+    stats = analysis_cache_stats(cache_dir)
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    assert stats["bytes"] > 0
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    clear_analysis_cache_stats()
+    cache_dir = str(tmp_path / "cache")
+    keys = [analysis_cache_key(f"video{i}", "model") for i in range(3)]
+    payload = [np.zeros(2000, dtype=np.float32)] * 4  # ~32 KB per entry
+    for i, key in enumerate(keys[:2]):
+        store_analysis(key, _result(1), payload, cache_dir=cache_dir)
+        os.utime(Path(cache_dir) / key[:2] / key / "result.json", (1000 + i, 1000 + i))
+
+    # Reading the oldest entry makes the other one least recently used.
+    assert load_analysis(keys[0], cache_dir) is not None
+    store_analysis(keys[2], _result(1), payload, cache_dir=cache_dir, max_bytes=70_000)
+
+    assert load_analysis(keys[1], cache_dir) is None
+    assert load_analysis(keys[0], cache_dir) is not None
+    assert load_analysis(keys[2], cache_dir) is not None
+    assert analysis_cache_stats(cache_dir)["evictions"] == 1
+
+
+def test_size_index_is_rebuilt_for_an_existing_cache(tmp_path):
+    cache_dir = tmp_path / "cache"
+    payload = [np.zeros(2000, dtype=np.float32)]
+    for i in range(2):
+        store_analysis(analysis_cache_key(f"video{i}", "model"), _result(1), payload, cache_dir=str(cache_dir))
+    before = analysis_cache_stats(str(cache_dir))
+
+    # A cache written before the index existed is scanned once.
+    (cache_dir / "size_index.sqlite3").unlink()
+    after = analysis_cache_stats(str(cache_dir))
+    assert (after["entries"], after["bytes"]) == (before["entries"], before["bytes"]) == (2, before["bytes"])
+
+    # Entries removed behind the index's back are dropped at eviction time.
+    key = analysis_cache_key("video0", "model")
+    shutil.rmtree(cache_dir / key[:2] / key)
+    store_analysis(analysis_cache_key("video2", "model"), _result(1), payload, cache_dir=str(cache_dir), max_bytes=1)
+    assert analysis_cache_stats(str(cache_dir))["entries"] == 1
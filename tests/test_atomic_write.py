@@ -0,0 +1,42 @@
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+from utils.atomic_write import atomic_directory, atomic_write  # noqa: E402
+
+
+def test_atomic_write_replaces_only_on_success(tmp_path):
+    target = tmp_path / "out" / "artifact.bin"
+    with atomic_write(str(target)) as f:
+        f.write(b"first")
+    assert target.read_bytes() == b"first"
+    assert target.stat().st_mode & 0o044 == 0o044
+
+    with pytest.raises(RuntimeError):
+        with atomic_write(str(target)) as f:
+            f.write(b"partial")
+            raise RuntimeError("disk full")
+    assert target.read_bytes() == b"first"
+    assert os.listdir(target.parent) == ["artifact.bin"]
+
+
+def test_atomic_directory_swaps_whole_directory(tmp_path):
+    entry = tmp_path / "entry"
+    with atomic_directory(str(entry)) as tmp_dir:
+        Path(tmp_dir, "a.txt").write_text("a")
+    with atomic_directory(str(entry)) as tmp_dir:
+        Path(tmp_dir, "b.txt").write_text("b")
+    assert os.listdir(entry) == ["b.txt"]
+    assert entry.stat().st_mode & 0o055 == 0o055
+
+    with pytest.raises(RuntimeError):
+        with atomic_directory(str(entry)) as tmp_dir:
+            Path(tmp_dir, "c.txt").write_text("c")
+            raise RuntimeError("copy failed")
+    assert os.listdir(entry) == ["b.txt"]
+    assert os.listdir(tmp_path) == ["entry"]
@@ -0,0 +1,84 @@
+import shutil
+import sys
+from pathlib import Path
+
+import numpy as np
+
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+SAMPLE_BANDEJA = BASE_DIR / "data" / "samples" / "overhead" / "bandeja" / "Bandeja 2.mp4"
+
+
+def test_cached_clip_features_decodes_once(tmp_path, monkeypatch):
+    import utils.feature_cache as feature_cache
+
+    calls = []
+    real_extract = feature_cache.extract_clip_features
+
+    def counting_extract(path, target_frames, **kwargs):
+        calls.append(path)
+        return real_extract(path, target_frames=target_frames, **kwargs)
+
+    monkeypatch.setattr(feature_cache, "extract_clip_features", counting_extract)
+    cache_dir = str(tmp_path / "features")
+
+    first, hit_first = feature_cache.cached_clip_features(str(SAMPLE_BANDEJA), cache_dir=cache_dir)
+    second, hit_second = feature_cache.cached_clip_features(str(SAMPLE_BANDEJA), cache_dir=cache_dir)
+
+    assert not hit_first
+    assert hit_second
+    assert len(calls) == 1
+    np.testing.assert_array_equal(first, second)
+    assert all(p.stat().st_mode & 0o044 == 0o044 for p in (tmp_path / "features").rglob("*.npy"))
+
+    # Same content under a different name reuses the entry.
+    renamed = tmp_path / "renamed.mp4"
+    shutil.copy2(SAMPLE_BANDEJA, renamed)
+    _, hit_renamed = feature_cache.cached_clip_features(str(renamed), cache_dir=cache_dir)
+    assert hit_renamed
+    assert len(calls) == 1
+
+
+def test_feature_cache_key_tracks_content_and_frames(tmp_path):
+    from utils.feature_cache import feature_cache_key
+
+    clip = tmp_path / "clip.mp4"
+    clip.write_bytes(b"abc")
+    key = feature_cache_key(str(clip))
+
+    assert feature_cache_key(str(clip), target_frames=15) != key
+    clip.write_bytes(b"abcd")
+    assert feature_cache_key(str(clip)) != key
+
+
+def test_coarse_energy_is_cached_by_content(tmp_path, monkeypatch):
+    import utils.feature_cache as feature_cache
+
+    calls = []
+    real_energy = feature_cache.clip_coarse_energy
+
+    def counting_energy(path):
+        calls.append(path)
+        return real_energy(path)
+
+    monkeypatch.setattr(feature_cache, "clip_coarse_energy", counting_energy)
+    cache_dir = str(tmp_path / "features")
+
+    first, hit_first = feature_cache.cached_clip_coarse_energy(str(SAMPLE_BANDEJA), cache_dir=cache_dir)
+    renamed = tmp_path / "renamed.mp4"
+    shutil.copy2(SAMPLE_BANDEJA, renamed)
+    second, hit_second = feature_cache.cached_clip_coarse_energy(str(renamed), cache_dir=cache_dir)
+
+    assert first is not None and first > 0
+    assert not hit_first and hit_second
+    assert second == first
+    assert len(calls) == 1
+
+    # Clips shorter than the probe are cached too, as None.
+    short = tmp_path / "short.mp4"
+    monkeypatch.setattr(feature_cache, "clip_coarse_energy", lambda path: calls.append(path))
+    short.write_bytes(b"not a video")
+    assert feature_cache.cached_clip_coarse_energy(str(short), cache_dir=cache_dir) == (None, False)
+    assert feature_cache.cached_clip_coarse_energy(str(short), cache_dir=cache_dir) == (None, True)
+    assert len(calls) == 2
@@ -0,0 +1,127 @@
+import sys
+from pathlib import Path
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+from utils.forest_engine import (  # noqa: E402
+    compile_forest,
+    flat_forest_path,
+    load_flat_forest,
+    max_proba_difference,
+    save_flat_forest,
+)
+
+
+def _fit_forest(seed: int = 0, n_classes: int = 3):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(200, 12))
+    y = np.array(["bandeja", "vibora", "smash"][:n_classes])[
+        (X[:, 0] > 0).astype(int) + (X[:, 1] > 0.5).astype(int) * (n_classes - 2)
+    ]
+    model = RandomForestClassifier(n_estimators=25, max_depth=8, random_state=seed).fit(X, y)
+    return model, X
+
+
+def test_flat_forest_matches_sklearn_probabilities():
+    model, X = _fit_forest()
+    forest = compile_forest(model)
+    rng = np.random.default_rng(1)
+    X_new = rng.normal(size=(700, X.shape[1]))
+
+    assert max_proba_difference(forest, model, X) == 0.0
+    assert max_proba_difference(forest, model, X_new) == 0.0
+    assert np.array_equal(forest.predict(X_new), model.predict(X_new))
+    assert list(forest.classes_) == list(model.classes_)
+    assert forest.n_trees == 25
+
+
+def test_flat_forest_matches_sklearn_exactly_at_thresholds():
+    model, X = _fit_forest(seed=2, n_classes=2)
+    forest = compile_forest(model)
+    # Rows whose values sit exactly on (and just next to) split thresholds.
+    tree = model.estimators_[0].tree_
+    split = tree.children_left != -1
+    X_edge = np.repeat(X[:1], int(split.sum()), axis=0)
+    X_edge[np.arange(len(X_edge)), tree.feature[split]] = tree.threshold[split]
+    X_up = X_edge.copy()
+    X_up[np.arange(len(X_up)), tree.feature[split]] = np.nextafter(
+        tree.threshold[split].astype(np.float32), np.float32(np.inf)
+    )
+
+    assert max_proba_difference(forest, model, X_edge) == 0.0
+    assert max_proba_difference(forest, model, X_up) == 0.0
+
+
+def test_flat_forest_roundtrips_without_pickle(tmp_path):
+    model, X = _fit_forest()
+    forest = compile_forest(model, source_sha256="abc123")
+    path = save_flat_forest(forest, str(tmp_path / "shot_classifier.forest.bin"))
+
+    loaded = load_flat_forest(path)
+    assert loaded.source_sha256 == "abc123"
+    assert loaded.max_depth == forest.max_depth
+    assert np.array_equal(loaded.predict_proba(X), forest.predict_proba(X))
+    assert not list(tmp_path.glob("*.tmp"))
+    assert Path(path).stat().st_mode & 0o044 == 0o044  # readable by other users
+
+
+def test_flat_forest_is_memory_mapped_read_only(tmp_path):
+    model, X = _fit_forest()
+    path = save_flat_forest(compile_forest(model), str(tmp_path / "shot_classifier.forest.bin"))
+
+    mapped = load_flat_forest(path, mmap_arrays=True)
+    assert mapped.mmapped
+    for arr in (mapped.feature, mapped.threshold, mapped.children, mapped.leaf_values):
+        assert not arr.flags.writeable
+        assert arr.flags.aligned
+    assert max_proba_difference(mapped, model, X) == 0.0
+
+    private = load_flat_forest(path, mmap_arrays=False)
+    assert not private.mmapped
+    assert np.array_equal(private.predict_proba(X), mapped.predict_proba(X))
+
+
+def test_model_versions_report_artifact_format(tmp_path):
+    from utils.file_hash import file_sha256
+    from utils.model_versions import get_artifact_info
+
+    model, _ = _fit_forest()
+    model_path = tmp_path / "shot_classifier.pkl"
+    joblib.dump(model, model_path)
+    assert get_artifact_info(str(model_path))["format"] == "sklearn_pickle"
+
+    forest = compile_forest(model, source_sha256=file_sha256(str(model_path)))
+    forest_path = save_flat_forest(forest, flat_forest_path(str(model_path)))
+    info = get_artifact_info(str(model_path))
+    assert info["format"] == "flat_forest_v2"
+    assert info["artifact_path"] == forest_path
+    assert info["mapped_size"].endswith("KB")
+
+    # A forest exported from a different pickle is not reported as served.
+    stale = compile_forest(model, source_sha256="0" * 64)
+    save_flat_forest(stale, forest_path)
+    assert get_artifact_info(str(model_path))["format"] == "sklearn_pickle"
+
+
+def test_early_exit_keeps_labels_and_bounds_confidence():
+    model, X = _fit_forest(seed=3)
+    forest = compile_forest(model)
+    X_new = np.random.default_rng(4).normal(size=(500, X.shape[1]))
+
+    labels, low, high, trees = forest.predict_early_exit(X_new, chunk_trees=5)
+    proba = forest.predict_proba(X_new)
+    best = proba.max(axis=1)
+
+    assert np.array_equal(labels, forest.predict(X_new))
+    assert np.all(low <= best) and np.all(best <= high + 1e-12)
+    assert trees.min() >= 1 and trees.max() <= forest.n_trees
+    assert trees.mean() < forest.n_trees
+    # Rows that ran every tree report predict_proba's exact confidence.
+    full = trees == forest.n_trees
+    assert np.array_equal(low[full], best[full])
+    assert np.array_equal(high[full], best[full])
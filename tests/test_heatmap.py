@@ -0,0 +1,54 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+from utils.heatmap import bin_xy, generate_heatmap_xy, wrist_xy  # noqa: E402
+
+
+def _keypoints(xs, ys, n_landmarks=33):
+    kp = np.zeros((len(xs), n_landmarks * 3), dtype=np.float32)
+    kp[:, 16 * 3] = xs
+    kp[:, 16 * 3 + 1] = ys
+    return kp
+
+
+def test_wrist_columns_are_binned_in_image_orientation():
+    kp = _keypoints([0.1, 0.1, 0.9, np.nan], [0.1, 0.1, 0.9, 0.5])
+    xy = wrist_xy(kp)
+    assert xy.shape == (3, 2)  # the NaN frame is dropped
+
+    counts = bin_xy(xy, bins=4, value_range=((0, 1), (0, 1)))
+    assert counts[0, 0] == 2  # small x, small y: top-left
+    assert counts[3, 3] == 1
+    assert counts.sum() == 3
+
+
+def test_missing_wrist_data_gives_no_heatmap(tmp_path):
+    # Motion features (19 columns) hold no pose landmarks.
+    assert generate_heatmap_xy(np.random.rand(50, 19), str(tmp_path / "h.png")) is None
+    assert generate_heatmap_xy([], str(tmp_path / "h.png")) is None
+    # Ragged rows: only frames holding the wrist count.
+    ragged = [np.zeros(19), _keypoints([0.5], [0.5])[0]]
+    assert wrist_xy(ragged).tolist() == [[0.5, 0.5]]
+
+
+def test_concurrent_heatmaps_get_separate_files(tmp_path):
+    rng = np.random.default_rng(0)
+    batches = [_keypoints(rng.random(200), rng.random(200)) for _ in range(8)]
+    paths = [str(tmp_path / f"analysis_{i}.png") for i in range(len(batches))]
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        written = list(pool.map(generate_heatmap_xy, batches, paths))
+
+    assert written == paths
+    for path in written:
+        image = cv2.imread(path)
+        assert image is not None and image.shape[0] == 400
+        assert Path(path).stat().st_mode & 0o044 == 0o044
+    assert not list(tmp_path.glob("*.tmp"))
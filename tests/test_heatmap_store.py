@@ -0,0 +1,80 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+from utils.heatmap_store import (  # noqa: E402
+    accumulate_heatmap,
+    heatmap_store_index,
+    query_heatmap,
+    render_accumulated_heatmap,
+)
+
+
+def _keypoints(points):
+    kp = np.zeros((len(points), 99), dtype=np.float32)
+    kp[:, 48:50] = points
+    return kp
+
+
+def test_accumulates_per_player_shot_and_day(tmp_path):
+    db = str(tmp_path / "heat.sqlite3")
+    kp = _keypoints([[0.1, 0.1], [0.9, 0.9], [0.5, 1.4]])  # the last is clipped onto the border
+    shots = ["bandeja", "vibora", "bandeja"]
+
+    assert accumulate_heatmap("match-1", "p1", shots, kp, day="2026-03-01", db_path=db) == 3
+    # Reruns of the same analysis are not counted twice.
+    assert accumulate_heatmap("match-1", "p1", shots, kp, day="2026-03-01", db_path=db) == 0
+    assert accumulate_heatmap("match-2", "p1", shots, kp, day="2026-04-01", db_path=db) == 3
+    assert accumulate_heatmap("match-3", "p2", shots, kp, day="2026-04-01", db_path=db) == 3
+    # Re-opened later (another mode or model, another date picked): still counted once.
+    assert accumulate_heatmap("match-1", "p1", shots[:1], kp[:1], day="2026-06-01", db_path=db) == 0
+    # The match date is required; nothing is stamped with the recording day.
+    with pytest.raises(TypeError):
+        accumulate_heatmap("match-4", "p1", shots, kp, db_path=db)
+
+    counts, events = query_heatmap("p1", db_path=db)
+    assert events == 6 and counts.sum() == 6
+    assert counts[4, 4] == 2  # (0.1, 0.1) of the 40x40 grid, twice
+
+    counts, events = query_heatmap("p1", "bandeja", start_day="2026-03-15", db_path=db)
+    assert events == 2 and counts[-1, 20] == 1
+
+    assert query_heatmap(None, "vibora", end_day="2026-04-01", db_path=db)[1] == 3
+    assert query_heatmap("p3", db_path=db)[1] == 0
+
+    index = heatmap_store_index(db)
+    assert index["players"] == ["p1", "p2"]
+    assert index["shot_types"] == ["bandeja", "vibora"]
+    assert index["days"] == ["2026-03-01", "2026-04-01"]
+
+    png = render_accumulated_heatmap(db_path=db, player_id="p1")
+    assert cv2.imdecode(np.frombuffer(png, np.uint8), cv2.IMREAD_COLOR) is not None
+    assert render_accumulated_heatmap(db_path=db, player_id="p3") is None
+    # Rendered in memory: the season view leaves no files behind.
+    assert [p.name for p in tmp_path.iterdir()] == ["heat.sqlite3"]
+
+
+def test_concurrent_updates_are_not_lost(tmp_path):
+    db = str(tmp_path / "heat.sqlite3")
+    kp = _keypoints([[0.5, 0.5]] * 4)
+
+    def _add(i):
+        return accumulate_heatmap(f"match-{i}", "p1", ["smash"] * 4, kp, day="2026-05-01", db_path=db)
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        assert sum(pool.map(_add, range(20))) == 80
+    assert query_heatmap("p1", db_path=db)[1] == 80
+
+
+def test_grid_resolution_is_fixed_per_store(tmp_path):
+    db = str(tmp_path / "heat.sqlite3")
+    accumulate_heatmap("match-1", "p1", ["smash"], _keypoints([[0.5, 0.5]]), "2026-05-01", db_path=db)
+    with pytest.raises(ValueError):
+        query_heatmap("p1", db_path=db, bins=20)
@@ -0,0 +1,132 @@
+import os
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+from utils.job_queue import (  # noqa: E402
+    CANCELLED,
+    DONE,
+    FAILED,
+    QUEUED,
+    RUNNING,
+    cancel_job,
+    claim_next_job,
+    dispatch_jobs,
+    get_job,
+    list_jobs,
+    run_job,
+    submit_job,
+)
+
+
+class _FakeProc:
+    def __init__(self, pid):
+        self.pid = pid
+        self.returncode = None
+
+    def poll(self):
+        return self.returncode
+
+
+def _launcher(started):
+    def launch(job_id, db_path):
+        proc = _FakeProc(10_000 + len(started))
+        started.append((job_id, proc))
+        return proc
+    return launch
+
+
+def test_dispatch_respects_concurrency_and_reaps_dead_workers(tmp_path):
+    db = str(tmp_path / "jobs.sqlite3")
+    ids = [submit_job("demo", {"n": i}, job_key=f"key-{i}", db_path=db) for i in range(3)]
+    # An active job with the same key is reused instead of queued again.
+    assert submit_job("demo", {"n": 0}, job_key="key-0", db_path=db) == ids[0]
+
+    started = []
+    assert dispatch_jobs(db, concurrency=2, launcher=_launcher(started)) == ids[:2]
+    assert [get_job(i, db)["status"] for i in ids] == [RUNNING, RUNNING, QUEUED]
+    assert dispatch_jobs(db, concurrency=2, launcher=_launcher(started)) == []
+
+    # The first worker dies without reporting: its job fails and frees the slot.
+    started[0][1].returncode = -9
+    assert dispatch_jobs(db, concurrency=2, launcher=_launcher(started)) == ids[2:]
+    dead = get_job(ids[0], db)
+    assert dead["status"] == FAILED and "exited" in dead["error"]
+    assert [job["job_id"] for job in list_jobs(db_path=db)] == ids[::-1]
+
+
+def test_run_job_reports_progress_and_result(tmp_path):
+    db = str(tmp_path / "jobs.sqlite3")
+    job_id = submit_job("demo", {"frames": 40}, db_path=db)
+    seen = []
+
+    def handler(params, progress):
+        progress(10, params["frames"])
+        seen.append(get_job(job_id, db)["progress"])
+        return {"events": 3}
+
+    assert run_job(job_id, {"demo": handler}, db) == DONE
+    job = get_job(job_id, db)
+    assert seen == [0.25]
+    assert job["result"] == {"events": 3}
+    assert job["progress"] == 1.0 and job["frames_done"] == 40
+
+
+def test_cancel_stops_queued_and_running_jobs(tmp_path):
+    db = str(tmp_path / "jobs.sqlite3")
+    queued = submit_job("demo", {}, db_path=db)
+    assert cancel_job(queued, db)
+    assert get_job(queued, db)["status"] == CANCELLED
+    assert run_job(queued, {"demo": lambda params, progress: {}}, db) == CANCELLED
+
+    running = submit_job("demo", {}, db_path=db)
+
+    def handler(params, progress):
+        assert cancel_job(running, db)
+        progress(1, 10)
+        raise AssertionError("progress() should have raised")
+
+    assert run_job(running, {"demo": handler}, db) == CANCELLED
+    assert not cancel_job(running, db)
+
+
+def test_failures_are_recorded(tmp_path):
+    db = str(tmp_path / "jobs.sqlite3")
+    job_id = submit_job("demo", {}, db_path=db)
+
+    def handler(params, progress):
+        raise ValueError("broken video")
+
+    assert run_job(job_id, {"demo": handler}, db) == FAILED
+    assert get_job(job_id, db)["error"] == "ValueError: broken video"
+
+    unknown = submit_job("other", {}, db_path=db)
+    assert run_job(unknown, {"demo": handler}, db) == FAILED
+    # A new submit after a finished job with the same key queues fresh work.
+    assert submit_job("demo", {}, job_key="k", db_path=db) != job_id
+
+
+def test_zero_concurrency_starts_nothing(tmp_path):
+    db = str(tmp_path / "jobs.sqlite3")
+    submit_job("demo", {}, db_path=db)
+    assert dispatch_jobs(db, concurrency=0, launcher=_launcher([])) == []
+
+
+def test_finished_worker_claims_next_queued_job(tmp_path):
+    db = str(tmp_path / "jobs.sqlite3")
+    ids = [submit_job("demo", {"n": i}, db_path=db) for i in range(3)]
+    started = []
+    assert dispatch_jobs(db, concurrency=1, launcher=_launcher(started)) == ids[:1]
+    # Slot taken: a worker may not start a second job next to it.
+    assert claim_next_job(db, concurrency=1) is None
+
+    assert run_job(ids[0], {"demo": lambda params, progress: {}}, db) == DONE
+    # With no session dispatching, the same worker process takes the next job.
+    assert claim_next_job(db, concurrency=1) == ids[1]
+    claimed = get_job(ids[1], db)
+    assert claimed["status"] == RUNNING and claimed["worker_pid"] == os.getpid()
+    assert claim_next_job(db, concurrency=1) is None
+    assert claim_next_job(db, concurrency=2) == ids[2]
+    assert claim_next_job(db, concurrency=3) is None
@@ -0,0 +1,59 @@
+import os
+import sys
+from pathlib import Path
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+from utils.model_cache import (  # noqa: E402
+    clear_model_cache,
+    get_cached_model,
+    model_cache_stats,
+)
+
+
+def _dump_forest(path: Path, seed: int):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(60, 8))
+    y = np.where(X[:, 0] > 0, "bandeja", "vibora")
+    model = RandomForestClassifier(n_estimators=20, random_state=seed).fit(X, y)
+    joblib.dump(model, path)
+
+
+def test_model_is_loaded_once_and_reloaded_only_on_content_change(tmp_path):
+    clear_model_cache()
+    model_path = tmp_path / "shot_classifier.pkl"
+    _dump_forest(model_path, seed=0)
+
+    first = get_cached_model(str(model_path))
+    assert first is not None
+    assert get_cached_model(str(model_path)) is first
+    assert model_cache_stats()["loads"] == 1
+
+    # A touch changes mtime but not content: re-hashed, not re-loaded.
+    stat = model_path.stat()
+    os.utime(model_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert get_cached_model(str(model_path)).model is first.model
+    assert model_cache_stats()["loads"] == 1
+
+    _dump_forest(model_path, seed=1)
+    stat = model_path.stat()
+    os.utime(model_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10**9))
+    reloaded = get_cached_model(str(model_path))
+    assert reloaded.model is not first.model
+    assert reloaded.sha256 != first.sha256
+    assert model_cache_stats()["loads"] == 2
+
+
+def test_missing_or_corrupt_model_is_not_cached(tmp_path):
+    clear_model_cache()
+    model_path = tmp_path / "shot_classifier.pkl"
+    assert get_cached_model(str(model_path)) is None
+
+    model_path.write_bytes(b"x" * 8192)
+    assert get_cached_model(str(model_path)) is None
+    assert model_cache_stats()["entries"] == 0
@@ -0,0 +1,111 @@
+import shutil
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+SAMPLE_CLIPS = sorted((BASE_DIR / "data" / "samples").rglob("*.mp4"))
+
+from utils.motion_gate import (  # noqa: E402
+    calibrate_motion_gate,
+    clip_motion_energy,
+    find_active_segments,
+    window_motion_energy,
+)
+from utils.video_processor import (  # noqa: E402
+    clip_coarse_energy,
+    extract_clip_features,
+    MODEL_FRAMES,
+    scan_motion_activity,
+    WindowFeatureEngine,
+)
+
+
+def test_calibrated_gate_passes_every_training_shot():
+    rng = np.random.default_rng(0)
+    X = rng.uniform(2.0, 20.0, size=(40, MODEL_FRAMES * 19)).astype(np.float32)
+
+    gate = calibrate_motion_gate(X, quantile=0.05, margin=0.5)
+
+    assert gate["train_clips"] == 40
+    assert gate["train_pass_rate"] == 1.0
+    assert 0.0 < gate["threshold"] < clip_motion_energy(X).min()
+    assert gate["coarse_threshold"] is None
+    assert calibrate_motion_gate(np.zeros((0, MODEL_FRAMES * 19))) is None
+
+
+def test_window_energy_matches_clip_energy_of_unresampled_window():
+    rng = np.random.default_rng(1)
+    seq = rng.uniform(0.0, 30.0, size=(200, 19)).astype(np.float32)
+    engine = WindowFeatureEngine(seq, MODEL_FRAMES)
+    starts = engine.window_starts(7)
+
+    energy = window_motion_energy(engine, starts)
+    expected = clip_motion_energy(engine.window_vectors(starts))
+
+    np.testing.assert_allclose(energy, expected, rtol=1e-9)
+
+
+def _write_shot_between_idle(clip: Path, out: Path, idle_sec: float = 4.0):
+    """The clip at 320x180 between idle stretches of its first/last frame plus sensor noise."""
+    cap = cv2.VideoCapture(str(clip))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frames = []
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(cv2.resize(frame, (320, 180)))
+    cap.release()
+
+    rng = np.random.default_rng(0)
+    idle = int(fps * idle_sec)
+
+    def noisy(frame):
+        noise = rng.normal(0.0, 2.0, frame.shape)
+        return np.clip(frame + noise, 0, 255).astype(np.uint8)
+
+    writer = cv2.VideoWriter(str(out), cv2.VideoWriter_fourcc(*"mp4v"), fps, (320, 180))
+    for frame in [noisy(frames[0]) for _ in range(idle)] + frames + [noisy(frames[-1]) for _ in range(idle)]:
+        writer.write(frame)
+    writer.release()
+    return idle / fps, (idle + len(frames)) / fps
+
+
+@pytest.fixture(scope="module")
+def shot_matches(tmp_path_factory):
+    """Every sample clip embedded between idle stretches, plus the gate calibrated on the clips as in training."""
+    features = np.array([extract_clip_features(str(clip), decoder="opencv") for clip in SAMPLE_CLIPS])
+    gate = calibrate_motion_gate(features, coarse_energy=[clip_coarse_energy(str(c)) for c in SAMPLE_CLIPS])
+    root = tmp_path_factory.mktemp("shot_matches")
+    matches = []
+    for i, clip in enumerate(SAMPLE_CLIPS):
+        video = root / f"match_{i}.mp4"
+        matches.append((video, *_write_shot_between_idle(clip, video)))
+    return gate, matches
+
+
+@pytest.mark.parametrize(
+    "decoder",
+    ["opencv", pytest.param("ffmpeg", marks=pytest.mark.skipif(shutil.which("ffmpeg") is None,
+                                                               reason="ffmpeg not installed"))],
+)
+def test_coarse_keyframe_scan_never_drops_a_real_shot(shot_matches, decoder):
+    gate, matches = shot_matches
+    threshold = gate["coarse_threshold"]
+    assert gate["coarse_clips"] == len(SAMPLE_CLIPS) and threshold > gate["threshold"]
+
+    for video, shot_start, shot_end in matches:
+        times, energy = scan_motion_activity(str(video), decoder=decoder)
+        intervals = np.diff(times, prepend=0.0)
+        segments = find_active_segments(times, energy >= threshold, intervals)
+
+        assert any(start <= shot_start and shot_end <= end for start, end in segments), video.name
+        # Samples spanning only idle frames (camera noise) stay below it.
+        idle = (times <= shot_start) | (times - intervals >= shot_end)
+        assert idle.sum() > len(times) // 2
+        assert (energy[idle] < threshold).all(), video.name
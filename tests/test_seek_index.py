@@ -0,0 +1,175 @@
+import os
+import shutil
+import subprocess
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+import pytest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+import utils.file_hash as file_hash  # noqa: E402
+import utils.seek_index as seek_index  # noqa: E402
+from utils.ffmpeg_decoder import FFMPEG_BIN, ffmpeg_available  # noqa: E402
+from utils.seek_index import (  # noqa: E402
+    iter_frames_at,
+    load_seek_index,
+    resolve_source_fps,
+    seek_index_path,
+    seek_to_frame,
+    SeekIndex,
+)
+from utils.video_processor import extract_keypoints_from_video, iter_keypoints_from_video  # noqa: E402
+
+SAMPLE_VIDEO = BASE_DIR / "data" / "samples" / "overhead" / "bandeja" / "Bandeja 2.mp4"
+
+
+@pytest.fixture(autouse=True)
+def _index_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(seek_index, "SEEK_INDEX_DIR", str(tmp_path / "seek_index"))
+
+
+def _copy_sample(tmp_path: Path) -> Path:
+    video = tmp_path / "match.mp4"
+    shutil.copy2(SAMPLE_VIDEO, video)
+    return video
+
+
+def test_full_decode_pass_persists_seek_index(tmp_path):
+    video = _copy_sample(tmp_path)
+    cap = cv2.VideoCapture(str(video))
+    container_fps = cap.get(cv2.CAP_PROP_FPS)
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    # Ranged passes do not see the whole video and write nothing.
+    extract_keypoints_from_video(str(video), decoder="opencv", seek_index=True, end_frame=20)
+    assert not os.path.exists(seek_index_path(str(video)))
+
+    extract_keypoints_from_video(str(video), decoder="opencv", frame_stride=2, seek_index=True)
+    index = load_seek_index(str(video))
+    assert index is not None and index.timestamps_measured
+    assert index.frame_count == frame_count
+    assert index.keyframes[0] == 0
+    assert np.all(np.diff(index.pts_sec) > 0)
+    assert index.fps == pytest.approx(container_fps, rel=1e-3)
+    assert os.stat(seek_index_path(str(video))).st_mode & 0o044 == 0o044
+    # Stored by content, not next to the video: a copy finds the same index.
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["match.mp4", "seek_index"]
+    copy = tmp_path / "copies" / "renamed.mp4"
+    copy.parent.mkdir()
+    shutil.copy2(video, copy)
+    assert load_seek_index(str(copy)).frame_count == frame_count
+
+    # Any change to the video makes the index stale.
+    with open(video, "ab") as f:
+        f.write(b"\0")
+    assert load_seek_index(str(video)) is None
+
+
+def test_decode_from_start_does_not_hash_before_first_frame(tmp_path, monkeypatch):
+    video = _copy_sample(tmp_path)
+    hashed = []
+    real_sha256 = file_hash.file_sha256
+    monkeypatch.setattr(file_hash, "file_sha256", lambda path: hashed.append(path) or real_sha256(path))
+    file_hash.clear_file_hash_cache()
+
+    chunks = iter_keypoints_from_video(str(video), decoder="opencv", chunk_size=4, seek_index=True)
+    next(chunks)
+    assert hashed == []
+    # Hashed once, after the pass, to file the index it collected.
+    for _ in chunks:
+        pass
+    assert len(hashed) == 1 and load_seek_index(str(video)) is not None
+    # A later full pass finds the index and writes nothing.
+    extract_keypoints_from_video(str(video), decoder="opencv", seek_index=True)
+    assert len(hashed) == 1
+
+
+@pytest.mark.skipif(not ffmpeg_available(), reason="ffmpeg binary not installed")
+def test_ffmpeg_pass_indexes_keyframes_from_packets(tmp_path):
+    video = _copy_sample(tmp_path)
+    extract_keypoints_from_video(str(video), decoder="opencv", seek_index=True)
+    decoded = load_seek_index(str(video))
+    os.remove(seek_index_path(str(video)))
+
+    extract_keypoints_from_video(str(video), decoder="ffmpeg", seek_index=True)
+    scanned = load_seek_index(str(video))
+    assert not scanned.timestamps_measured
+    assert scanned.frame_count == decoded.frame_count
+    # Both sources see keyframe flags per packet (decode order), so with
+    # B-frames positions may differ by up to the reorder delay.
+    assert len(scanned.keyframes) == len(decoded.keyframes)
+    assert np.all(np.abs(decoded.keyframes - scanned.keyframes) <= 4)
+
+
+def test_source_fps_prefers_measured_rate_over_bad_container_rate():
+    index = SeekIndex(np.arange(100) / 29.97, [0, 50], container_fps=0.0)
+    assert index.fps == pytest.approx(29.97)
+    assert resolve_source_fps(0.0, index) == pytest.approx(29.97)
+    assert resolve_source_fps(90000.0, index) == pytest.approx(29.97)
+    assert resolve_source_fps(25.0, index) == pytest.approx(29.97)
+    assert resolve_source_fps(29.97, index) == 29.97
+    assert resolve_source_fps(0.0, None) == 25.0
+    assert index.frame_at(1.0) == 29
+    assert index.keyframe_before(49) == 0 and index.keyframe_before(50) == 50
+
+
+def test_indexed_random_access_returns_the_same_frames(tmp_path):
+    video = _copy_sample(tmp_path)
+    extract_keypoints_from_video(str(video), decoder="opencv", seek_index=True)
+    index = load_seek_index(str(video))
+    last = index.frame_count - 1
+    targets = [last, 3, last // 2, last // 2 + 1, 0]
+
+    indexed_cap, straight_cap = cv2.VideoCapture(str(video)), cv2.VideoCapture(str(video))
+    indexed = dict(iter_frames_at(indexed_cap, targets, index=index))
+    straight = dict(iter_frames_at(straight_cap, targets))
+    indexed_cap.release()
+    straight_cap.release()
+    assert sorted(indexed) == sorted(set(targets))
+    for frame_no in targets:
+        assert np.array_equal(indexed[frame_no], straight[frame_no])
+
+
+@pytest.mark.skipif(not ffmpeg_available(), reason="ffmpeg binary not installed")
+def test_ranged_decodes_land_on_the_right_frame_at_variable_frame_rate(tmp_path):
+    # 30 fps for 40 frames, then 15 fps: frame / container rate is wrong after that.
+    video = tmp_path / "vfr.mp4"
+    proc = subprocess.run(
+        [FFMPEG_BIN, "-v", "error", "-y", "-i", str(SAMPLE_VIDEO), "-frames:v", "85",
+         "-vf", "setpts='if(lt(N,40),N/30,4/3+(N-40)/15)/TB'", "-fps_mode", "passthrough",
+         "-c:v", "libx264", "-g", "24", "-bf", "2", "-pix_fmt", "yuv420p", str(video)],
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        pytest.skip(f"ffmpeg cannot encode H.264: {proc.stderr}")
+    extract_keypoints_from_video(str(video), decoder="opencv", frame_stride=1, seek_index=True)
+    index = load_seek_index(str(video))
+    assert index.timestamps_measured
+
+    cap = cv2.VideoCapture(str(video))
+    frames = []
+    ok, frame = cap.read()
+    while ok:
+        frames.append(frame)
+        ok, frame = cap.read()
+    cap.release()
+    for frame_no in (20, 60, 80):
+        cap = cv2.VideoCapture(str(video))
+        assert seek_to_frame(cap, frame_no, index)
+        ok, frame = cap.read()
+        cap.release()
+        assert ok and np.array_equal(frame, frames[frame_no])
+
+    for decoder in ("opencv", "ffmpeg"):
+        full = extract_keypoints_from_video(str(video), decoder=decoder, frame_stride=1)
+        for start in (20, 50, 65):
+            ranged = extract_keypoints_from_video(
+                str(video), decoder=decoder, frame_stride=1, start_frame=start, end_frame=start + 15
+            )
+            assert np.array_equal(ranged, full[start:start + 14]), (decoder, start)
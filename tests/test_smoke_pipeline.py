@@ -3,16 +3,32 @@ import os
 import shutil
 import subprocess
 import sys
+import time
 from pathlib import Path
 
+import cv2
+import pytest
 
 BASE_DIR = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(BASE_DIR))
+
+from utils.ffmpeg_decoder import FFMPEG_BIN, ffmpeg_available  # noqa: E402
+
 TRAIN_SCRIPT = BASE_DIR / "scripts" / "train_shot_model.py"
 SAMPLE_BANDEJA = BASE_DIR / "data" / "samples" / "overhead" / "bandeja" / "Bandeja 2.mp4"
 SAMPLE_VIBORA = BASE_DIR / "data" / "samples" / "overhead" / "vibora" / "Vibora 2.mp4"
 
 
+@pytest.fixture(autouse=True)
+def _seek_index_dir(tmp_path, monkeypatch):
+    # Analyses persist seek indexes; keep them out of the repository's data dir,
+    # in this process and in job worker processes.
+    import utils.seek_index as seek_index
+
+    monkeypatch.setattr(seek_index, "SEEK_INDEX_DIR", str(tmp_path / "seek_index"))
+    monkeypatch.setenv("PADELEDGE_SEEK_INDEX_DIR", str(tmp_path / "seek_index"))
+
+
 def _prepare_tiny_dataset(root: Path) -> Path:
     data_dir = root / "data" / "samples" / "overhead"
     b_dir = data_dir / "bandeja"
@@ -24,7 +40,7 @@ def _prepare_tiny_dataset(root: Path) -> Path:
     return root / "data" / "samples"
 
 
-def _train_for_test(tmp_path: Path):
+def _train_for_test(tmp_path: Path, extra_args=()):
     data_dir = _prepare_tiny_dataset(tmp_path)
     model_dir = tmp_path / "models"
     model_path = model_dir / "shot_classifier.pkl"
@@ -36,20 +52,22 @@ def _train_for_test(tmp_path: Path):
     env["PADELEDGE_MODEL_PATH"] = str(model_path)
     env["PADELEDGE_METRICS_PATH"] = str(metrics_path)
     env["PADELEDGE_ARCHIVE_DIR"] = str(archive_dir)
+    env["PADELEDGE_RELEASE_REPORT_PATH"] = str(model_dir / "release_report.json")
+    env["PADELEDGE_FEATURE_CACHE_DIR"] = str(tmp_path / "features")
 
     proc = subprocess.run(
-        [sys.executable, str(TRAIN_SCRIPT), "-v"],
+        [sys.executable, str(TRAIN_SCRIPT), "-v", *extra_args],
         capture_output=True,
         text=True,
         cwd=str(BASE_DIR),
         env=env,
     )
     assert proc.returncode == 0, proc.stdout + "\n" + proc.stderr
-    return model_path, metrics_path
+    return model_path, metrics_path, proc.stdout
 
 
 def test_training_script_creates_model_and_metrics(tmp_path):
-    model_path, metrics_path = _train_for_test(tmp_path)
+    model_path, metrics_path, _ = _train_for_test(tmp_path)
 
     assert model_path.exists()
     assert model_path.stat().st_size > 0
@@ -60,8 +78,21 @@ def test_training_script_creates_model_and_metrics(tmp_path):
     assert "feature_dim" in payload
 
 
+def test_training_script_parallel_workers_skip_broken_clips(tmp_path):
+    broken_dir = tmp_path / "data" / "samples" / "overhead" / "bandeja"
+    broken_dir.mkdir(parents=True)
+    (broken_dir / "broken.mp4").write_bytes(b"not a video")
+
+    model_path, _, stdout = _train_for_test(tmp_path, extra_args=("--workers", "2"))
+
+    assert model_path.exists()
+    assert "Extraction workers: 2" in stdout
+    assert "[3/3]" in stdout
+    assert "skipping" in stdout
+
+
 def test_shot_detector_analyze_returns_valid_structure(tmp_path, monkeypatch):
-    model_path, metrics_path = _train_for_test(tmp_path)
+    model_path, metrics_path, _ = _train_for_test(tmp_path)
     monkeypatch.setenv("PADELEDGE_MODEL_PATH", str(model_path))
     monkeypatch.setenv("PADELEDGE_METRICS_PATH", str(metrics_path))
 
@@ -79,3 +110,287 @@ def test_shot_detector_analyze_returns_valid_structure(tmp_path, monkeypatch):
     assert len(preds) == len(timestamps) == len(keypoints) == len(confidences)
     assert len(preds) > 0
     assert all(isinstance(t, float) for t in timestamps)
+
+
+def test_analyze_classifies_all_windows_in_one_call(tmp_path, monkeypatch):
+    model_path, metrics_path, _ = _train_for_test(tmp_path)
+    monkeypatch.setenv("PADELEDGE_MODEL_PATH", str(model_path))
+    monkeypatch.setenv("PADELEDGE_METRICS_PATH", str(metrics_path))
+
+    import importlib
+    import utils.shot_detector as shot_detector
+
+    importlib.reload(shot_detector)
+    detector = shot_detector.ShotDetector()
+    calls = []
+    predict_proba = detector.model.predict_proba
+    monkeypatch.setattr(
+        detector.model, "predict_proba", lambda X: calls.append(len(X)) or predict_proba(X)
+    )
+
+    preds, timestamps, _, confidences = detector.analyze(str(SAMPLE_BANDEJA))
+    assert len(calls) == 1 and calls[0] > 1
+
+    # Streaming in tiny chunks batches per chunk but must give the same events.
+    events = list(detector.iter_events(str(SAMPLE_BANDEJA), chunk_frames=7))
+    assert [e[0] for e in events] == preds
+    assert [e[1] for e in events] == timestamps
+    assert [e[3] for e in events] == confidences
+
+
+def test_training_exports_flat_forest_used_for_inference(tmp_path, monkeypatch):
+    model_path, metrics_path, _ = _train_for_test(tmp_path)
+    payload = json.loads(metrics_path.read_text(encoding="utf-8"))
+    flat = payload["flat_forest"]
+    assert flat["exported"] and flat["labels_match"]
+    assert flat["max_proba_diff"] <= 1e-9
+    assert Path(flat["path"]).exists()
+
+    monkeypatch.setenv("PADELEDGE_MODEL_PATH", str(model_path))
+    monkeypatch.setenv("PADELEDGE_METRICS_PATH", str(metrics_path))
+
+    import importlib
+    import utils.shot_detector as shot_detector
+
+    importlib.reload(shot_detector)
+    detector = shot_detector.ShotDetector()
+    assert detector.model_format == "flat_forest"
+    preds, timestamps, _, confidences = detector.analyze(str(SAMPLE_BANDEJA))
+
+    # The pickle must give the same events.
+    monkeypatch.setenv("PADELEDGE_FLAT_FOREST", "0")
+    importlib.reload(shot_detector)
+    reference = shot_detector.ShotDetector()
+    assert reference.model_format == "sklearn_pickle"
+    assert reference.model_sha256 == detector.model_sha256
+    ref_preds, ref_timestamps, _, ref_confidences = reference.analyze(str(SAMPLE_BANDEJA))
+    assert (preds, timestamps) == (ref_preds, ref_timestamps)
+    assert confidences == ref_confidences
+
+    # Early exit stops per window once the vote is decided; same events.
+    detector.early_exit = True
+    ee_preds, ee_timestamps, _, ee_confidences = detector.analyze(str(SAMPLE_BANDEJA))
+    assert (ee_preds, ee_timestamps) == (preds, timestamps)
+    assert all(lo <= c + 1e-12 for lo, c in zip(ee_confidences, confidences))
+    stats = detector.last_early_exit_stats
+    assert stats["enabled"] and stats["windows"] > 0
+    assert 0 < stats["mean_trees"] <= stats["n_trees"]
+
+
+def test_merge_window_events_keeps_last_window_of_each_run():
+    from utils.shot_detector import merge_window_events
+
+    windows = [("a", 0.5, 0, 0.6), ("a", 1.0, 1, 0.7), ("b", 1.5, 2, 0.9), ("a", 2.0, 3, 0.8)]
+    merged = list(merge_window_events(windows))
+
+    assert merged == [("a", 1.0, 1, 0.7), ("b", 1.5, 2, 0.9), ("a", 2.0, 3, 0.8)]
+
+    # Idle (None) windows split runs and never become events.
+    gated = [("a", 0.5, 0, 0.6), (None, 1.0, 1, None), ("a", 1.5, 2, 0.9), (None, 2.0, 3, None)]
+    assert list(merge_window_events(gated)) == [("a", 0.5, 0, 0.6), ("a", 1.5, 2, 0.9)]
+
+
+def test_motion_gate_is_calibrated_and_skips_idle_windows(tmp_path, monkeypatch):
+    model_path, metrics_path, stdout = _train_for_test(tmp_path)
+    payload = json.loads(metrics_path.read_text(encoding="utf-8"))
+    assert payload["active_motion_gate"]["train_pass_rate"] == 1.0
+    assert "Motion gate threshold" in stdout
+
+    monkeypatch.setenv("PADELEDGE_MODEL_PATH", str(model_path))
+    monkeypatch.setenv("PADELEDGE_METRICS_PATH", str(metrics_path))
+
+    import importlib
+    import utils.shot_detector as shot_detector
+
+    importlib.reload(shot_detector)
+    detector = shot_detector.ShotDetector()
+    preds, _, _, _ = detector.analyze(str(SAMPLE_BANDEJA))
+    assert len(preds) > 0
+    assert detector.last_gate_stats["enabled"]
+    assert detector.last_gate_stats["skip_rate"] == 0.0
+
+    calls = []
+    monkeypatch.setattr(detector.model, "predict_proba", lambda X: calls.append(len(X)))
+    detector.motion_gate = {"threshold": float("inf")}
+    assert detector.analyze(str(SAMPLE_BANDEJA)) == ([], [], [], [])
+    assert detector.last_gate_stats["skip_rate"] == 1.0
+    assert calls == []
+
+
+def test_target_fps_is_recorded_and_used_for_inference(tmp_path, monkeypatch):
+    model_path, metrics_path, _ = _train_for_test(tmp_path, extra_args=("--target-fps", "15"))
+    payload = json.loads(metrics_path.read_text(encoding="utf-8"))
+    assert payload["target_fps"] == 15.0
+    assert payload["active_decode"]["target_fps"] == 15.0
+    assert payload["active_decode"]["decoder"] in ("opencv", "ffmpeg")
+
+    monkeypatch.setenv("PADELEDGE_MODEL_PATH", str(model_path))
+    monkeypatch.setenv("PADELEDGE_METRICS_PATH", str(metrics_path))
+
+    import importlib
+    import utils.shot_detector as shot_detector
+
+    importlib.reload(shot_detector)
+    detector = shot_detector.ShotDetector()
+    assert detector.decode_options["target_fps"] == 15.0
+
+    preds, timestamps, _, _ = detector.analyze(str(SAMPLE_BANDEJA))
+    assert len(preds) > 0
+    assert max(timestamps) < 85 / 30.0
+
+
+def _write_clip_between_idle(path: Path, idle_sec: float = 10.0):
+    cap = cv2.VideoCapture(str(SAMPLE_BANDEJA))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frames = []
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(cv2.resize(frame, (320, 180)))
+    cap.release()
+
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (320, 180))
+    idle = int(fps * idle_sec)
+    for frame in [frames[0]] * idle + frames + [frames[-1]] * idle:
+        writer.write(frame)
+    writer.release()
+
+
+def test_two_pass_analysis_skips_dead_time_with_same_events(tmp_path, monkeypatch):
+    model_path, metrics_path, _ = _train_for_test(tmp_path)
+    monkeypatch.setenv("PADELEDGE_MODEL_PATH", str(model_path))
+    monkeypatch.setenv("PADELEDGE_METRICS_PATH", str(metrics_path))
+    video_path = tmp_path / "match.mp4"
+    _write_clip_between_idle(video_path)
+
+    import importlib
+    import utils.shot_detector as shot_detector
+
+    importlib.reload(shot_detector)
+    detector = shot_detector.ShotDetector()
+    single = detector.analyze(str(video_path), decoder="opencv")
+    two_pass = detector.analyze_two_pass(str(video_path), decoder="opencv")
+
+    assert len(single[0]) > 0
+    assert two_pass[0] == single[0]
+    assert two_pass[1] == single[1]
+    assert two_pass[3] == single[3]
+    stats = detector.last_two_pass_stats
+    assert len(stats["segments"]) == 1
+    assert stats["analyzed_fraction"] < 0.5
+
+    # Chunked parallel analysis stitches the same windows back together.
+    parallel = detector.analyze_parallel(str(video_path), workers=2, n_chunks=5, decoder="opencv")
+    assert parallel[0] == single[0]
+    assert parallel[1] == single[1]
+    assert parallel[3] == single[3]
+    assert detector.last_decode_timings["chunks"] == 5
+
+    # One chunk per worker: progress follows the frames decoded inside the
+    # chunks, and cancelling stops the running chunks instead of waiting.
+    from utils.job_queue import JobCancelled
+
+    monkeypatch.setattr(shot_detector, "STREAM_CHUNK_FRAMES", 16)
+    monkeypatch.setattr(shot_detector, "PARALLEL_POLL_SEC", 0.01)
+    t0 = time.perf_counter()
+    detector.analyze_parallel(str(video_path), workers=2, n_chunks=2, decoder="opencv")
+    full_sec = time.perf_counter() - t0
+
+    reports = []
+
+    def cancel_once_decoding(frames_done, frames_total):
+        reports.append((frames_done, frames_total))
+        if frames_done > 0:
+            raise JobCancelled("test")
+
+    detector.progress = cancel_once_decoding
+    t0 = time.perf_counter()
+    with pytest.raises(JobCancelled):
+        detector.analyze_parallel(str(video_path), workers=2, n_chunks=2, decoder="opencv")
+    cancel_sec = time.perf_counter() - t0
+    detector.progress = None
+    assert 0 < reports[-1][0] < reports[-1][1] / 2
+    assert cancel_sec < full_sec / 2
+
+
+@pytest.mark.skipif(not ffmpeg_available(), reason="ffmpeg binary not installed")
+def test_ffmpeg_seeks_give_same_events_on_h264(tmp_path, monkeypatch):
+    model_path, metrics_path, _ = _train_for_test(tmp_path)
+    monkeypatch.setenv("PADELEDGE_MODEL_PATH", str(model_path))
+    monkeypatch.setenv("PADELEDGE_METRICS_PATH", str(metrics_path))
+    source = tmp_path / "source.mp4"
+    _write_clip_between_idle(source)
+    # H.264 with B-frames: decode order differs from display order, and the
+    # chunk and segment seeks start between keyframes.
+    video_path = tmp_path / "match.mp4"
+    proc = subprocess.run(
+        [FFMPEG_BIN, "-v", "error", "-y", "-i", str(source), "-c:v", "libx264", "-g", "48", "-bf", "3",
+         "-pix_fmt", "yuv420p", str(video_path)],
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        pytest.skip(f"ffmpeg cannot encode H.264: {proc.stderr}")
+
+    import importlib
+    import numpy as np
+    import utils.shot_detector as shot_detector
+
+    importlib.reload(shot_detector)
+    detector = shot_detector.ShotDetector()
+    single = detector.analyze(str(video_path), decoder="ffmpeg")
+    assert detector.last_decode_timings["decoder"] == "ffmpeg"
+    assert len(single[0]) > 0
+    for result in (
+        detector.analyze_two_pass(str(video_path), decoder="ffmpeg"),
+        detector.analyze_parallel(str(video_path), workers=2, n_chunks=5, decoder="ffmpeg"),
+    ):
+        assert result[0] == single[0]
+        assert result[1] == single[1]
+        assert result[3] == single[3]
+        assert all(np.array_equal(a, b) for a, b in zip(result[2], single[2]))
+
+
+def test_background_job_runs_analysis_in_worker_process(tmp_path, monkeypatch):
+    model_path, metrics_path, _ = _train_for_test(tmp_path)
+    # Inherited by the worker process.
+    monkeypatch.setenv("PADELEDGE_MODEL_PATH", str(model_path))
+    monkeypatch.setenv("PADELEDGE_METRICS_PATH", str(metrics_path))
+    monkeypatch.setenv("PADELEDGE_ANALYSIS_CACHE_DIR", str(tmp_path / "analysis_cache"))
+    video_path = tmp_path / "match.mp4"
+    _write_clip_between_idle(video_path)
+
+    import importlib
+    import time
+    import utils.shot_detector as shot_detector
+    from utils.analysis_cache import load_analysis
+    from utils.analysis_jobs import MATCH_ANALYSIS_JOB, match_analysis_params
+    from utils.file_hash import file_sha256
+    from utils.job_queue import DONE, dispatch_jobs, get_job, submit_job
+
+    importlib.reload(shot_detector)
+    expected = shot_detector.ShotDetector().analyze(str(video_path))
+
+    db = str(tmp_path / "jobs.sqlite3")
+    params = match_analysis_params(str(video_path), file_sha256(str(video_path)), "match.mp4")
+    job_id = submit_job(MATCH_ANALYSIS_JOB, params, db_path=db)
+    assert dispatch_jobs(db) == [job_id]
+
+    deadline = time.time() + 120
+    while get_job(job_id, db)["status"] not in (DONE, "failed", "cancelled") and time.time() < deadline:
+        time.sleep(0.2)
+    job = get_job(job_id, db)
+    assert job["status"] == DONE, job["error"]
+    assert job["frames_total"] > 0 and job["progress"] == 1.0
+    stages = job["result"]["stages"]
+    assert {"model_load", "analyze", "decode", "features", "classify", "thumbnails", "heatmap"} <= set(stages)
+    assert stages["decode"]["frames"] > 0 and stages["decode"]["fps"] > 0
+
+    cached = load_analysis(job["result"]["cache_key"], cache_dir=str(tmp_path / "analysis_cache"))
+    assert cached["predictions"] == [str(p) for p in expected[0]]
+    assert cached["timestamps_sec"] == [float(t) for t in expected[1]]
+    # Thumbnails exist only inside the cache entry, which the LRU evicts.
+    thumbs = [cached["files"][f"thumb_{i}"] for i in range(len(expected[1]))]
+    assert thumbs and all(os.path.exists(p) for p in thumbs)
+    assert all(p.startswith(str(tmp_path / "analysis_cache")) for p in thumbs)
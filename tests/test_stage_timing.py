@@ -0,0 +1,69 @@
+import json
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+from utils.metrics import load_stage_latency_summary  # noqa: E402
+from utils.stage_timing import (  # noqa: E402
+    StageTimer,
+    current_stage_timer,
+    summarize_stage_timings,
+    timed_stage,
+    use_stage_timer,
+)
+from utils.video_processor import extract_keypoints_from_video  # noqa: E402
+
+SAMPLE_VIDEO = BASE_DIR / "data" / "samples" / "overhead" / "bandeja" / "Bandeja 2.mp4"
+
+
+def test_stages_accumulate_wall_cpu_frames_and_rss():
+    timer = StageTimer()
+    for _ in range(2):
+        with timer.stage("work", frames=50) as stage:
+            sum(i * i for i in range(200_000))
+            stage.frames += 50
+    timer.add("decode", 0.5, frames=25)
+
+    stages = timer.as_dict()
+    work = stages["work"]
+    assert work["calls"] == 2 and work["frames"] == 200
+    assert work["wall_sec"] > 0 and work["cpu_sec"] > 0
+    assert abs(work["fps"] - 200 / work["wall_sec"]) < 0.01 * work["fps"]
+    assert work["peak_rss_mb"] > 0
+    assert stages["decode"]["fps"] == 50.0 and stages["decode"]["cpu_sec"] is None
+
+
+def test_timed_stage_reports_to_the_active_timer_only():
+    with timed_stage("ignored"):
+        pass
+    assert current_stage_timer() is None
+
+    timer = StageTimer()
+    with use_stage_timer(timer):
+        with timed_stage("classify", frames=3):
+            pass
+        seq = extract_keypoints_from_video(str(SAMPLE_VIDEO))
+    assert current_stage_timer() is None
+
+    stages = timer.as_dict()
+    assert set(stages) == {"classify", "decode", "features"}
+    assert stages["decode"]["frames"] == stages["features"]["frames"] == len(seq)
+    assert stages["decode"]["wall_sec"] > 0 and stages["features"]["wall_sec"] > 0
+
+
+def test_latency_summary_gives_percentiles_per_stage(tmp_path):
+    log_path = tmp_path / "match_analyses.jsonl"
+    lines = [json.dumps({"stages": {"decode": {"wall_sec": float(i), "fps": 10.0 * i}}}) for i in range(1, 101)]
+    lines += [json.dumps({"predictions": []}), "not json"]
+    log_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+
+    (row,) = load_stage_latency_summary(str(log_path))
+    assert row["stage"] == "decode" and row["runs"] == 100
+    assert row["wall_sec_p50"] == 50.5
+    assert abs(row["wall_sec_p95"] - 95.05) < 1e-9
+    assert row["cpu_sec_p50"] is None
+
+    assert summarize_stage_timings([]) == []
+    assert load_stage_latency_summary(str(tmp_path / "missing.jsonl")) == []
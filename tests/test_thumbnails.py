@@ -0,0 +1,57 @@
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+from utils.thumbnails import extract_thumbnails  # noqa: E402
+
+
+def _write_counter_video(path: Path, n_frames: int = 120, fps: float = 25.0, shade: int = 0):
+    """Frame i is a flat gray of brightness 2*i (+shade), so a thumbnail reveals its frame."""
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (640, 360))
+    for i in range(n_frames):
+        writer.write(np.full((360, 640, 3), min(2 * i + shade, 255), dtype=np.uint8))
+    writer.release()
+
+
+def _brightness(path: str) -> float:
+    return float(cv2.imread(path).mean())
+
+
+def test_thumbnails_are_extracted_in_one_pass_and_cached(tmp_path, monkeypatch):
+    video = tmp_path / "match.mp4"
+    _write_counter_video(video)
+    cache_dir = tmp_path / "thumbs"
+    timestamps = [3.0, 0.4, 2.0, 0.4, 9.9]  # unsorted, duplicate, past the end
+
+    opened = []
+    real_capture = cv2.VideoCapture
+    monkeypatch.setattr(cv2, "VideoCapture", lambda p: opened.append(p) or real_capture(p))
+    paths = extract_thumbnails(str(video), timestamps, str(cache_dir), width=160)
+
+    assert len(opened) == 1
+    assert paths[1] == paths[3] and paths[4] is None
+    for ts, path in zip(timestamps[:3], paths[:3]):
+        assert abs(_brightness(path) - 2 * int(ts * 25)) < 4
+        assert cv2.imread(path).shape[1] == 160
+
+    # Second call is served from the cache without decoding.
+    mtimes = [Path(p).stat().st_mtime_ns for p in paths[:3]]
+    assert extract_thumbnails(str(video), timestamps[:3], str(cache_dir), width=160) == paths[:3]
+    assert [Path(p).stat().st_mtime_ns for p in paths[:3]] == mtimes
+
+
+def test_thumbnails_of_different_videos_do_not_collide(tmp_path):
+    first, second = tmp_path / "a.mp4", tmp_path / "b.mp4"
+    _write_counter_video(first, n_frames=30)
+    _write_counter_video(second, n_frames=30, shade=100)
+    cache_dir = str(tmp_path / "thumbs")
+
+    (a,) = extract_thumbnails(str(first), [0.5], cache_dir)
+    (b,) = extract_thumbnails(str(second), [0.5], cache_dir)
+    assert a != b
+    assert _brightness(b) - _brightness(a) > 50
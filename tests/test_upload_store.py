@@ -0,0 +1,81 @@
+import io
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+
+from utils.file_hash import cached_file_sha256, file_sha256  # noqa: E402
+from utils.upload_store import save_upload_by_content, save_upload_stream  # noqa: E402
+
+
+class _ChunkRecorder(io.BytesIO):
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.reads = []
+
+    def read(self, size=-1):
+        self.reads.append(size)
+        return super().read(size)
+
+
+def test_upload_is_streamed_in_chunks_and_hashed(tmp_path):
+    data = os.urandom(10_000)
+    upload = _ChunkRecorder(data)
+    upload.read(10)  # e.g. a preview already consumed part of it
+    target = tmp_path / "uploads" / "match.mp4"
+
+    saved = save_upload_stream(upload, str(target), chunk_size=4096)
+
+    assert target.read_bytes() == data
+    assert saved.size == len(data)
+    assert saved.sha256 == file_sha256(str(target))
+    assert cached_file_sha256(str(target)) == saved.sha256
+    assert not saved.reused
+    assert max(upload.reads) == 4096
+    assert [p.name for p in target.parent.iterdir()] == ["match.mp4"]
+    assert target.stat().st_mode & 0o044 == 0o044  # readable by other users
+
+
+def test_identical_upload_reuses_file_and_changed_upload_replaces_it(tmp_path):
+    target = tmp_path / "match.mp4"
+    first = save_upload_stream(io.BytesIO(b"a" * 5000), str(target), chunk_size=1024)
+    mtime = target.stat().st_mtime_ns
+
+    again = save_upload_stream(io.BytesIO(b"a" * 5000), str(target), chunk_size=1024)
+    assert again.reused and again.sha256 == first.sha256
+    assert target.stat().st_mtime_ns == mtime
+
+    changed = save_upload_stream(io.BytesIO(b"b" * 5000), str(target), chunk_size=1024)
+    assert not changed.reused and changed.sha256 != first.sha256
+    assert target.read_bytes() == b"b" * 5000
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_uploads_are_stored_by_content_so_same_names_never_collide(tmp_path):
+    first = save_upload_by_content(io.BytesIO(b"a" * 5000), "match.mp4", str(tmp_path), chunk_size=1024)
+    other = save_upload_by_content(io.BytesIO(b"b" * 5000), "match.mp4", str(tmp_path), chunk_size=1024)
+    again = save_upload_by_content(io.BytesIO(b"a" * 5000), "../match.mp4", str(tmp_path), chunk_size=1024)
+
+    assert first.path == str(tmp_path / first.sha256 / "match.mp4")
+    assert other.path != first.path
+    assert Path(first.path).read_bytes() == b"a" * 5000  # untouched by the second upload
+    assert again.reused and again.path == first.path
+    assert cached_file_sha256(other.path) == other.sha256
+    assert sorted(p.name for p in tmp_path.iterdir()) == sorted([first.sha256, other.sha256])
+
+
+def test_failed_upload_leaves_no_partial_file(tmp_path):
+    class _Broken(io.BytesIO):
+        def read(self, size=-1):
+            if self.tell() >= 2048:
+                raise IOError("connection reset")
+            return super().read(size)
+
+    target = tmp_path / "match.mp4"
+    with pytest.raises(IOError):
+        save_upload_stream(_Broken(b"x" * 8192), str(target), chunk_size=1024)
+    assert not list(tmp_path.iterdir())
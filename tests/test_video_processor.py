@@ -0,0 +1,292 @@
+import shutil
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR))
+SAMPLE_BANDEJA = BASE_DIR / "data" / "samples" / "overhead" / "bandeja" / "Bandeja 2.mp4"
+
+from utils.video_processor import (  # noqa: E402
+    DEFAULT_BLOCK_FRAMES,
+    extract_keypoints_from_video,
+    iter_keypoints_from_video,
+    resolve_frame_stride,
+    scan_motion_activity,
+    SlidingWindowBuffer,
+    summarize_feature_sequence,
+    summarize_feature_windows,
+    sliding_windows,
+    MODEL_FRAMES,
+    WindowFeatureEngine,
+)
+
+
+def _summarize_per_dim(feature_seq, target_frames=MODEL_FRAMES):
+    arr = np.asarray(feature_seq, dtype=np.float32)
+    n_frames, feat_dim = arr.shape
+    src_idx = np.arange(n_frames, dtype=np.float32)
+    dst_idx = np.linspace(0, n_frames - 1, num=target_frames, dtype=np.float32)
+    sampled = np.empty((target_frames, feat_dim), dtype=np.float32)
+    for d in range(feat_dim):
+        sampled[:, d] = np.interp(dst_idx, src_idx, arr[:, d])
+    return sampled.flatten()
+
+
+@pytest.mark.parametrize("n_frames", [1, 2, 7, 29, 30, 31, 64, 257])
+def test_summarize_matches_per_dim_interp_bit_for_bit(n_frames):
+    rng = np.random.default_rng(n_frames)
+    seq = (rng.random((n_frames, 19)) * 255).astype(np.float32)
+
+    np.testing.assert_array_equal(summarize_feature_sequence(seq), _summarize_per_dim(seq))
+
+
+def test_summarize_feature_windows_matches_single_window_calls():
+    rng = np.random.default_rng(1)
+    seq = (rng.random((300, 19)) * 255).astype(np.float32)
+    window_frames, stride = 24, 12
+
+    batched = summarize_feature_windows(sliding_windows(seq, window_frames, stride))
+    expected = np.stack(
+        [
+            summarize_feature_sequence(seq[s:s + window_frames])
+            for s in range(0, len(seq) - window_frames + 1, stride)
+        ]
+    )
+
+    assert batched.shape == (len(expected), MODEL_FRAMES * 19)
+    np.testing.assert_array_equal(batched, expected)
+
+
+def test_resolve_frame_stride():
+    assert resolve_frame_stride(60.0, target_fps=30) == 2
+    assert resolve_frame_stride(50.0, target_fps=25) == 2
+    assert resolve_frame_stride(30.0, target_fps=60) == 1
+    assert resolve_frame_stride(30.0) == 1
+    assert resolve_frame_stride(30.0, target_fps=10, frame_stride=2) == 2
+
+
+def test_frame_stride_decodes_every_nth_frame():
+    full = extract_keypoints_from_video(str(SAMPLE_BANDEJA))
+    halved = extract_keypoints_from_video(str(SAMPLE_BANDEJA), frame_stride=2)
+
+    assert halved.shape[1] == full.shape[1]
+    assert abs(len(halved) - len(full) / 2) <= 1
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 24, 1000])
+def test_sliding_window_buffer_matches_full_sequence(chunk_size):
+    rng = np.random.default_rng(2)
+    seq = rng.random((203, 19)).astype(np.float32)
+    window_frames, stride = 24, 12
+
+    ring = SlidingWindowBuffer(window_frames, stride)
+    starts, windows = [], []
+    for i in range(0, len(seq), chunk_size):
+        batch = ring.push(seq[i:i + chunk_size])
+        if batch is not None:
+            starts.extend(batch[0].tolist())
+            windows.extend(np.array(batch[1]))
+        # Retained frames stay bounded by one window plus one chunk.
+        assert len(ring.buffer) <= window_frames + chunk_size
+
+    expected = sliding_windows(seq, window_frames, stride)
+    assert starts == list(range(0, len(seq) - window_frames + 1, stride))
+    np.testing.assert_array_equal(np.stack(windows), expected)
+
+
+def test_sliding_window_buffer_holds_short_streams():
+    ring = SlidingWindowBuffer(24, 12)
+    assert ring.push(np.ones((24, 19), dtype=np.float32)) is None
+    assert ring.frames_seen == 24
+    assert len(ring.buffer) == 24
+
+
+def test_iter_keypoints_chunks_match_full_extraction():
+    full = extract_keypoints_from_video(str(SAMPLE_BANDEJA))
+    chunks = list(iter_keypoints_from_video(str(SAMPLE_BANDEJA), chunk_size=16))
+
+    assert all(len(c) <= 16 for c in chunks)
+    np.testing.assert_array_equal(np.concatenate(chunks), full)
+
+
+def test_pipelined_extraction_matches_serial_and_reports_stages():
+    serial = extract_keypoints_from_video(str(SAMPLE_BANDEJA), decoder="opencv")
+    timings = {}
+    piped = extract_keypoints_from_video(
+        str(SAMPLE_BANDEJA), pipeline_workers=2, decoder="opencv", timings=timings
+    )
+
+    np.testing.assert_array_equal(piped, serial)
+    assert timings["frames"] == len(serial)
+    for stage in ("decode", "preprocess", "features", "wall"):
+        assert timings[stage] > 0
+
+
+def test_pipelined_extraction_stops_cleanly_when_closed_early():
+    stream = iter_keypoints_from_video(str(SAMPLE_BANDEJA), pipeline_workers=2, decoder="opencv")
+    first = next(stream)
+    stream.close()
+
+    assert first.shape == (19,)
+
+
+@pytest.mark.parametrize("block_frames", [1, 5, DEFAULT_BLOCK_FRAMES])
+def test_block_mode_matches_per_frame_features_within_tolerance(block_frames):
+    serial = extract_keypoints_from_video(str(SAMPLE_BANDEJA), decoder="opencv")
+    blocked = extract_keypoints_from_video(
+        str(SAMPLE_BANDEJA), block_frames=block_frames, decoder="opencv"
+    )
+
+    assert blocked.shape == serial.shape
+    # max and the 16-bin histogram are exact; mean/std only differ by float32 rounding.
+    np.testing.assert_array_equal(blocked[:, 1], serial[:, 1])
+    np.testing.assert_array_equal(blocked[:, 3:], serial[:, 3:])
+    np.testing.assert_allclose(blocked, serial, rtol=1e-5, atol=1e-4)
+
+
+def test_block_mode_rechunks_to_requested_size():
+    chunks = list(iter_keypoints_from_video(str(SAMPLE_BANDEJA), block_frames=16, chunk_size=10))
+
+    assert [len(c) for c in chunks[:-1]] == [10] * (len(chunks) - 1)
+    assert sum(len(c) for c in chunks) == len(extract_keypoints_from_video(str(SAMPLE_BANDEJA)))
+
+
+def test_missing_ffmpeg_falls_back_to_opencv(monkeypatch):
+    import utils.ffmpeg_decoder as ffmpeg_decoder
+
+    monkeypatch.setattr(ffmpeg_decoder, "FFMPEG_BIN", "padeledge-no-such-ffmpeg")
+    timings = {}
+    features = extract_keypoints_from_video(str(SAMPLE_BANDEJA), decoder="ffmpeg", timings=timings)
+
+    assert timings["decoder"] == "opencv"
+    np.testing.assert_array_equal(
+        features, extract_keypoints_from_video(str(SAMPLE_BANDEJA), decoder="opencv")
+    )
+
+
+def _fake_ffmpeg(tmp_path, frames: int):
+    """An 'ffmpeg' that writes `frames` black 256x144 frames, then fails."""
+    script = tmp_path / "ffmpeg"
+    script.write_text(
+        "#!/bin/sh\n"
+        f"head -c {frames * 256 * 144} /dev/zero\n"
+        "echo 'decode error' >&2\n"
+        "exit 1\n"
+    )
+    script.chmod(0o755)
+    return str(script)
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="needs a POSIX shell")
+def test_ffmpeg_failing_midway_warns_about_truncated_features(tmp_path, monkeypatch, capsys):
+    import utils.ffmpeg_decoder as ffmpeg_decoder
+
+    monkeypatch.setattr(ffmpeg_decoder, "FFMPEG_BIN", _fake_ffmpeg(tmp_path, frames=5))
+    timings = {}
+    features = extract_keypoints_from_video(str(SAMPLE_BANDEJA), decoder="ffmpeg", timings=timings)
+
+    assert timings["decoder"] == "ffmpeg"
+    assert len(features) == 4
+    assert "features are truncated" in capsys.readouterr().out
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="needs a POSIX shell")
+def test_feature_cache_files_fallback_features_under_the_decoder_that_ran(tmp_path, monkeypatch):
+    import utils.ffmpeg_decoder as ffmpeg_decoder
+    from utils.feature_cache import cached_clip_features, feature_cache_key, load_cached_features
+
+    monkeypatch.setattr(ffmpeg_decoder, "FFMPEG_BIN", _fake_ffmpeg(tmp_path, frames=0))
+    cache_dir = str(tmp_path / "features")
+    features, hit = cached_clip_features(str(SAMPLE_BANDEJA), cache_dir=cache_dir, decoder="ffmpeg")
+
+    assert not hit and features is not None
+    ffmpeg_key = feature_cache_key(str(SAMPLE_BANDEJA), decoder="ffmpeg")
+    opencv_key = feature_cache_key(str(SAMPLE_BANDEJA), decoder="opencv")
+    assert load_cached_features(ffmpeg_key, cache_dir) is None
+    np.testing.assert_array_equal(load_cached_features(opencv_key, cache_dir), features)
+
+
+def test_coarse_scan_samples_keyframes_only():
+    from utils.seek_index import scan_seek_index
+
+    index = scan_seek_index(str(SAMPLE_BANDEJA))
+    timings = {}
+    times, energy = scan_motion_activity(str(SAMPLE_BANDEJA), decoder="opencv", timings=timings)
+
+    assert len(energy) == len(index.keyframes) - 1
+    np.testing.assert_allclose(times, index.keyframes[1:] / index.container_fps)
+    assert (energy > 0).all()
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+def test_ffmpeg_coarse_scan_decodes_only_keyframes():
+    from utils.seek_index import scan_seek_index
+
+    index = scan_seek_index(str(SAMPLE_BANDEJA))
+    timings = {}
+    times, energy = scan_motion_activity(str(SAMPLE_BANDEJA), decoder="ffmpeg", timings=timings)
+
+    assert timings["frames"] == len(index.keyframes) < index.frame_count / 10
+    assert len(energy) == len(times) == len(index.keyframes) - 1
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+@pytest.mark.parametrize("block_frames", [0, DEFAULT_BLOCK_FRAMES])
+def test_ffmpeg_decoder_yields_same_frames_as_opencv(block_frames):
+    timings = {}
+    piped = extract_keypoints_from_video(
+        str(SAMPLE_BANDEJA), frame_stride=2, block_frames=block_frames, decoder="ffmpeg", timings=timings
+    )
+    reference = extract_keypoints_from_video(str(SAMPLE_BANDEJA), frame_stride=2, decoder="opencv")
+
+    assert timings["decoder"] == "ffmpeg"
+    assert piped.shape == reference.shape
+    # Every pixel lands in exactly one histogram bin.
+    np.testing.assert_array_equal(piped[:, 3:].sum(axis=1), 256 * 144)
+
+
+@pytest.mark.parametrize("window_frames,stride", [(8, 4), (20, 1), (30, 7), (47, 23), (64, 32)])
+def test_window_engine_matches_batched_summarize(window_frames, stride):
+    rng = np.random.default_rng(window_frames)
+    seq = (rng.random((301, 19)) * 255).astype(np.float32)
+    engine = WindowFeatureEngine(seq, window_frames)
+    starts = engine.window_starts(stride)
+
+    expected = summarize_feature_windows(sliding_windows(seq, window_frames, stride))
+    assert engine.window_vectors(starts).tobytes() == expected.tobytes()
+
+    windows = sliding_windows(seq, window_frames, stride).astype(np.float64)
+    np.testing.assert_allclose(engine.window_means(starts), windows.mean(axis=1), rtol=1e-9, atol=1e-9)
+    np.testing.assert_allclose(engine.window_stds(starts), windows.std(axis=1), rtol=1e-6, atol=1e-6)
+
+
+def test_push_span_covers_the_same_windows_as_push():
+    rng = np.random.default_rng(3)
+    seq = rng.random((97, 4)).astype(np.float32)
+    windowed, spanned = SlidingWindowBuffer(10, 3), SlidingWindowBuffer(10, 3)
+
+    for i in range(0, len(seq), 11):
+        a, b = windowed.push(seq[i:i + 11]), spanned.push_span(seq[i:i + 11])
+        assert (a is None) == (b is None)
+        if a is not None:
+            np.testing.assert_array_equal(a[0], b[0])
+            np.testing.assert_array_equal(a[1], sliding_windows(b[1], 10, 3))
+
+
+@pytest.mark.parametrize("frame_stride", [1, 2])
+def test_frame_range_yields_the_matching_rows_of_the_full_video(frame_stride):
+    full = extract_keypoints_from_video(str(SAMPLE_BANDEJA), frame_stride=frame_stride, decoder="opencv")
+    r0, r1 = 9, 30
+    part = extract_keypoints_from_video(
+        str(SAMPLE_BANDEJA),
+        frame_stride=frame_stride,
+        decoder="opencv",
+        start_frame=r0 * frame_stride,
+        end_frame=(r1 + 1) * frame_stride,
+    )
+
+    np.testing.assert_array_equal(part, full[r0:r1])
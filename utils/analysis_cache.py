@@ -0,0 +1,229 @@
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+from utils.atomic_write import atomic_directory
+from utils.video_processor import FEATURE_EXTRACTOR_VERSION
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+ANALYSIS_CACHE_DIR = os.getenv(
+    "PADELEDGE_ANALYSIS_CACHE_DIR", os.path.join(BASE_DIR, "data", "analysis_cache")
+)
+# Least recently used entries are evicted once the cache grows past this.
+ANALYSIS_CACHE_MAX_BYTES = int(os.getenv("PADELEDGE_ANALYSIS_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+
+RESULT_FILE = "result.json"
+KEYPOINTS_FILE = "keypoints.npy"
+# Per-entry sizes, so stats and the eviction check never walk the cache.
+SIZE_INDEX_FILE = "size_index.sqlite3"
+
+_LOCK = threading.Lock()
+_STATS = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+
+def analysis_cache_key(video_sha256: str, model_sha256: str, variant: str = "") -> str:
+    """
+    Key of one analysis: the uploaded video's content, the model that
+    classified it and the feature extractor version. `variant` separates
+    runs whose results legitimately differ for the same video and model
+    (e.g. two-pass analysis or early-exit confidences).
+    """
+    signature = "|".join([video_sha256, model_sha256 or "", FEATURE_EXTRACTOR_VERSION, variant])
+    return hashlib.sha256(signature.encode("utf-8")).hexdigest()
+
+
+def _entry_dir(key: str, cache_dir: Optional[str] = None) -> str:
+    root = cache_dir or ANALYSIS_CACHE_DIR
+    return os.path.join(root, key[:2], key)
+
+
+def load_analysis(key: str, cache_dir: Optional[str] = None) -> Optional[Dict]:
+    """
+    The cached result for key, or None. The result dict holds what
+    store_analysis() was given, with keypoints as a list of arrays and
+    `files` mapping each stored artifact name to its path inside the entry.
+    A hit marks the entry as most recently used.
+    """
+    entry = _entry_dir(key, cache_dir)
+    result_path = os.path.join(entry, RESULT_FILE)
+    try:
+        with open(result_path, "r", encoding="utf-8") as f:
+            result = json.load(f)
+        keypoints = np.load(os.path.join(entry, KEYPOINTS_FILE), allow_pickle=False)
+        files = {name: os.path.join(entry, rel) for name, rel in result.get("files", {}).items()}
+        if not all(os.path.exists(path) for path in files.values()):
+            raise FileNotFoundError(entry)
+    except Exception:
+        # Missing, partial or corrupt entry: a miss, rewritten by the next store.
+        with _LOCK:
+            _STATS["misses"] += 1
+        return None
+
+    os.utime(result_path)
+    result["keypoints"] = list(keypoints)
+    result["files"] = files
+    with _LOCK:
+        _STATS["hits"] += 1
+    return result
+
+
+def store_analysis(
+    key: str,
+    result: Dict,
+    keypoints,
+    files: Optional[Dict[str, str]] = None,
+    cache_dir: Optional[str] = None,
+    max_bytes: Optional[int] = None,
+) -> str:
+    """
+    Stores a JSON-serializable result dict, the per-event keypoints and
+    copies of the given artifact files (thumbnails, heatmap) under key,
+    then evicts least recently used entries beyond max_bytes. The entry is
+    assembled in a temp directory and renamed into place, so readers never
+    see a partial one. Returns the entry directory.
+    """
+    root = cache_dir or ANALYSIS_CACHE_DIR
+    entry = _entry_dir(key, cache_dir)
+    with atomic_directory(entry) as tmp_entry:
+        stored_files = {}
+        for name, path in (files or {}).items():
+            if not path or not os.path.exists(path):
+                continue
+            rel = f"{name}{os.path.splitext(path)[1]}"
+            shutil.copyfile(path, os.path.join(tmp_entry, rel))
+            stored_files[name] = rel
+        kp = np.asarray(keypoints, dtype=np.float32) if len(keypoints) else np.zeros((0, 0), np.float32)
+        np.save(os.path.join(tmp_entry, KEYPOINTS_FILE), kp, allow_pickle=False)
+        with open(os.path.join(tmp_entry, RESULT_FILE), "w", encoding="utf-8") as f:
+            json.dump(dict(result, files=stored_files, stored_at=time.time()), f, ensure_ascii=False)
+    conn = _size_index(root)
+    try:
+        conn.execute("INSERT OR REPLACE INTO entries (key, bytes) VALUES (?, ?)", (key, _dir_bytes(entry)))
+        conn.commit()
+    finally:
+        conn.close()
+    with _LOCK:
+        _STATS["stores"] += 1
+    evict_analysis_cache(max_bytes if max_bytes is not None else ANALYSIS_CACHE_MAX_BYTES, root, keep=entry)
+    return entry
+
+
+def _dir_bytes(path: str) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+def _scan_entries(root: str):
+    """(key, bytes) of every complete entry under root, by walking it."""
+    entries = []
+    for shard in os.listdir(root):
+        shard_dir = os.path.join(root, shard)
+        if not os.path.isdir(shard_dir):
+            continue
+        for name in os.listdir(shard_dir):
+            entry = os.path.join(shard_dir, name)
+            # Skips entries being assembled by store_analysis() (*.tmp).
+            if os.path.exists(os.path.join(entry, RESULT_FILE)) and not name.endswith(".tmp"):
+                entries.append((name, _dir_bytes(entry)))
+    return entries
+
+
+def _size_index(root: str) -> sqlite3.Connection:
+    """
+    The cache's size index, shared by all processes using root. Created
+    from one walk over the entries when missing (e.g. a cache written
+    before the index existed); kept current by store and eviction after.
+    """
+    os.makedirs(root, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(root, SIZE_INDEX_FILE), timeout=30.0)
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, bytes INTEGER NOT NULL);
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+        """
+    )
+    conn.execute("BEGIN IMMEDIATE")
+    if conn.execute("SELECT 1 FROM meta WHERE key = 'scanned'").fetchone() is None:
+        conn.executemany("INSERT OR REPLACE INTO entries (key, bytes) VALUES (?, ?)", _scan_entries(root))
+        conn.execute("INSERT INTO meta (key, value) VALUES ('scanned', '1')")
+    conn.commit()
+    return conn
+
+
+def evict_analysis_cache(
+    max_bytes: int = ANALYSIS_CACHE_MAX_BYTES, cache_dir: Optional[str] = None, keep: Optional[str] = None
+) -> int:
+    """
+    Removes least recently used entries until the cache fits max_bytes
+    (never `keep`, the entry just stored). Returns the number removed.
+    The total comes from the size index; last-used times are only read
+    once the cache is actually over budget.
+    """
+    root = cache_dir or ANALYSIS_CACHE_DIR
+    conn = _size_index(root)
+    removed = 0
+    try:
+        total = conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM entries").fetchone()[0]
+        if total <= max_bytes:
+            return 0
+        entries = []
+        for key, size in conn.execute("SELECT key, bytes FROM entries").fetchall():
+            entry = _entry_dir(key, root)
+            try:
+                last_used = os.path.getmtime(os.path.join(entry, RESULT_FILE))
+            except OSError:
+                # Removed behind the index's back.
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                total -= size
+                continue
+            entries.append((last_used, size, key, entry))
+        for _, size, key, entry in sorted(entries):
+            if total <= max_bytes:
+                break
+            if entry == keep:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            removed += 1
+        conn.commit()
+    finally:
+        conn.close()
+    with _LOCK:
+        _STATS["evictions"] += removed
+    return removed
+
+
+def analysis_cache_stats(cache_dir: Optional[str] = None) -> Dict:
+    """Process-wide hit/miss counters plus the cache's current size, from the size index."""
+    conn = _size_index(cache_dir or ANALYSIS_CACHE_DIR)
+    try:
+        entries, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM entries").fetchone()
+    finally:
+        conn.close()
+    with _LOCK:
+        stats = dict(_STATS)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+    stats["entries"] = int(entries)
+    stats["bytes"] = int(total)
+    return stats
+
+
+def clear_analysis_cache_stats():
+    with _LOCK:
+        for key in _STATS:
+            _STATS[key] = 0
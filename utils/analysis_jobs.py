@@ -0,0 +1,120 @@
+import os
+import tempfile
+from typing import Callable, Dict, Optional
+
+from utils.analysis_cache import analysis_cache_key, load_analysis, store_analysis
+from utils.heatmap import generate_heatmap_xy
+from utils.file_hash import remember_file_sha256
+from utils.shot_detector import ShotDetector
+from utils.stage_timing import StageTimer, use_stage_timer
+from utils.thumbnails import extract_thumbnails
+
+MATCH_ANALYSIS_JOB = "match_analysis"
+ANALYSIS_MODES = ("single_pass", "parallel", "two_pass")
+
+
+def analysis_variant(analysis_mode: str, detector: ShotDetector) -> str:
+    """
+    Analysis cache variant: parallel gives the same results as standard
+    (frame-accurate seeks, see ShotDetector.analyze_parallel);
+    two-pass, early exit and the detector's decode / window / gate settings
+    (ShotDetector.settings_signature) do not.
+    """
+    mode = ("two_pass" if analysis_mode == "two_pass" else "full") + ("+early_exit" if detector.early_exit else "")
+    return f"{mode}|{detector.settings_signature()}"
+
+
+def match_analysis_params(
+    video_path: str,
+    video_sha256: str,
+    video_name: str,
+    analysis_mode: str = "single_pass",
+    early_exit: bool = False,
+) -> Dict:
+    if analysis_mode not in ANALYSIS_MODES:
+        raise ValueError(f"Unknown analysis mode: {analysis_mode}")
+    return {
+        "video_path": video_path,
+        "video_sha256": video_sha256,
+        "video_name": video_name,
+        "analysis_mode": analysis_mode,
+        "early_exit": bool(early_exit),
+    }
+
+
+def run_match_analysis(params: Dict, progress: Optional[Callable] = None) -> Dict:
+    """
+    Job handler: analyzes one uploaded video and stores events, keypoints,
+    thumbnails and heatmap in the analysis cache. The result names the cache
+    key to load plus the run statistics the Match Analyzer logs, including
+    per-stage timings (see utils.stage_timing). The key is computed here,
+    from the model the worker actually loaded.
+    """
+    timer = StageTimer()
+    with use_stage_timer(timer):
+        run = _run_match_analysis(params, progress, timer)
+    run["stages"] = timer.as_dict()
+    return run
+
+
+def _run_match_analysis(params: Dict, progress: Optional[Callable], timer: StageTimer) -> Dict:
+    with timer.stage("model_load"):
+        detector = ShotDetector()
+    detector.early_exit = params["early_exit"] and hasattr(detector.model, "predict_early_exit")
+    detector.progress = progress
+    mode = params["analysis_mode"]
+    variant = analysis_variant(mode, detector)
+    cache_key = analysis_cache_key(params["video_sha256"], detector.model_sha256, variant)
+    run = {
+        "cache_key": cache_key,
+        "variant": variant,
+        "model_path": detector.model_path,
+        "model_sha256": detector.model_sha256,
+        "model_format": detector.model_format,
+        "model_labels": [str(label) for label in detector.class_labels],
+        "analysis_mode": mode,
+    }
+    if load_analysis(cache_key) is not None:
+        # Another job stored the same analysis meanwhile.
+        return dict(run, reused=True)
+
+    video_path = params["video_path"]
+    # The upload was hashed while saving; the seek index is keyed by it.
+    remember_file_sha256(video_path, params["video_sha256"])
+    # Spans decode, features, windowing and classify, which are also timed on their own.
+    with timer.stage("analyze") as stage:
+        if mode == "two_pass":
+            preds, timestamps, keypoints, confidences = detector.analyze_two_pass(video_path)
+        elif mode == "parallel":
+            preds, timestamps, keypoints, confidences = detector.analyze_parallel(video_path)
+        else:
+            preds, timestamps, keypoints, confidences = detector.analyze(video_path)
+        stage.frames += detector.last_decode_timings.get("frames", 0)
+    # The cache entry keeps the only copy of the thumbnails and heatmap.
+    with tempfile.TemporaryDirectory(prefix="padeledge_analysis_") as work_dir:
+        with timer.stage("thumbnails", frames=len(timestamps)):
+            thumbs = extract_thumbnails(video_path, timestamps, work_dir, video_sha256=params["video_sha256"])
+        with timer.stage("heatmap", frames=len(keypoints)):
+            heat = generate_heatmap_xy(keypoints, os.path.join(work_dir, "heatmap.png"))
+
+        with timer.stage("cache_store"):
+            store_analysis(
+                cache_key,
+                {
+                    "video_name": params["video_name"],
+                    "predictions": [str(p) for p in preds],
+                    "timestamps_sec": [float(t) for t in timestamps],
+                    "confidences": [None if c is None else float(c) for c in confidences],
+                    "model_sha256": detector.model_sha256,
+                    "variant": variant,
+                },
+                keypoints,
+                files={"heatmap": heat, **{f"thumb_{i}": t for i, t in enumerate(thumbs)}},
+            )
+    return dict(
+        run,
+        reused=False,
+        motion_gate=detector.last_gate_stats,
+        two_pass=detector.last_two_pass_stats if mode == "two_pass" else None,
+        early_exit=detector.last_early_exit_stats,
+    )
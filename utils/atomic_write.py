@@ -0,0 +1,64 @@
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+
+def _discard(path: str):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+@contextmanager
+def temp_file(directory: str, prefix: str = "", suffix: str = ".tmp"):
+    """
+    Yields (file, tmp_path) for a new temp file in directory, opened "wb".
+    Once the block completes the file is closed and readable by other users
+    (mkstemp creates it 0600); if the block raises it is removed. Renaming
+    it into place is up to the caller, see atomic_write.
+    """
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=prefix, suffix=suffix)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            yield f, tmp_path
+        os.chmod(tmp_path, 0o644)
+    except BaseException:
+        _discard(tmp_path)
+        raise
+
+
+@contextmanager
+def atomic_write(path: str, prefix: str = "", suffix: str = ".tmp"):
+    """
+    Yields a binary file whose content replaces path only once the block
+    completes, so concurrent readers never see a partial file.
+    """
+    with temp_file(os.path.dirname(os.path.abspath(path)), prefix, suffix) as (f, tmp_path):
+        yield f
+    try:
+        os.replace(tmp_path, path)
+    except BaseException:
+        _discard(tmp_path)
+        raise
+
+
+@contextmanager
+def atomic_directory(path: str, suffix: str = ".tmp"):
+    """
+    Yields an empty temp directory next to path that replaces path (and
+    everything in it) once the block completes; removed if the block raises.
+    """
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent, suffix=suffix)
+    try:
+        yield tmp_dir
+        # mkdtemp creates it 0700; the content is read by other processes.
+        os.chmod(tmp_dir, 0o755)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_dir, path)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
@@ -4,6 +4,8 @@ from typing import List, Dict, Optional
 
 import pandas as pd
 
+from utils.upload_store import save_upload_stream
+
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 DATA_DIR = os.path.join(BASE_DIR, "data", "samples")
 UNCERTAIN_DIR = os.path.join(BASE_DIR, "data", "uncertain")
@@ -86,6 +88,21 @@ def save_labeled_clip(
     return target_path
 
 
+def save_labeled_upload(
+    fileobj,
+    category: str,
+    shot_type: str,
+    filename: str,
+):
+    """
+    Streamer en upload direkte til data/samples/<category>/<shot_type>/<filename>
+    (i chunks, atomisk via temp-fil + rename) og returnerer en SavedUpload
+    med filens SHA-256.
+    """
+    target_path = os.path.join(DATA_DIR, category, shot_type, filename)
+    return save_upload_stream(fileobj, target_path)
+
+
 def list_uncertain_clips() -> List[str]:
     """
     Returnerer videoer i data/uncertain (til active learning).
@@ -0,0 +1,149 @@
+import hashlib
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+
+from utils.atomic_write import atomic_write
+from utils.file_hash import cached_file_sha256
+from utils.video_processor import (
+    clip_coarse_energy,
+    COARSE_FRAME_SIZE,
+    COARSE_PROBE_SEC,
+    decode_signature,
+    extract_clip_features,
+    FEATURE_EXTRACTOR_VERSION,
+    MODEL_FRAMES,
+    resolve_decoder,
+)
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+FEATURE_CACHE_DIR = os.getenv(
+    "PADELEDGE_FEATURE_CACHE_DIR", os.path.join(BASE_DIR, "data", "features")
+)
+
+
+def feature_cache_key(
+    video_path: str,
+    target_frames: int = MODEL_FRAMES,
+    target_fps=None,
+    frame_stride=None,
+    decoder=None,
+) -> str:
+    """
+    Content-addressed key for a clip's fixed-length feature vector.
+    Renaming or moving a clip keeps its key; editing it or changing the
+    extractor version, frame count, decode rate or decoder backend
+    invalidates it. The hash is remembered per file, so a cache miss
+    does not hash the clip again when it is decoded.
+    """
+    sha256 = cached_file_sha256(video_path)
+    if sha256 is None:
+        raise FileNotFoundError(video_path)
+    signature = "|".join(
+        [
+            sha256,
+            FEATURE_EXTRACTOR_VERSION,
+            str(int(target_frames)),
+            decode_signature(target_fps, frame_stride, decoder),
+        ]
+    )
+    return hashlib.sha256(signature.encode("utf-8")).hexdigest()
+
+
+def coarse_energy_cache_key(video_path: str) -> str:
+    """Content-addressed key for a clip's clip_coarse_energy(), which does not depend on the decode options."""
+    sha256 = cached_file_sha256(video_path)
+    if sha256 is None:
+        raise FileNotFoundError(video_path)
+    signature = "|".join([sha256, "coarse", str(COARSE_PROBE_SEC), "x".join(map(str, COARSE_FRAME_SIZE))])
+    return hashlib.sha256(signature.encode("utf-8")).hexdigest()
+
+
+def _cache_path(key: str, cache_dir: Optional[str] = None) -> str:
+    root = cache_dir or FEATURE_CACHE_DIR
+    return os.path.join(root, key[:2], f"{key}.npy")
+
+
+def load_cached_features(key: str, cache_dir: Optional[str] = None) -> Optional[np.ndarray]:
+    path = _cache_path(key, cache_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        return np.load(path, allow_pickle=False)
+    except Exception:
+        # Truncated or corrupt entry — treat as a miss so it gets rewritten.
+        return None
+
+
+def store_cached_features(key: str, features: np.ndarray, cache_dir: Optional[str] = None) -> str:
+    path = _cache_path(key, cache_dir)
+    # Concurrent readers never see a partial .npy.
+    with atomic_write(path) as f:
+        np.save(f, np.asarray(features, dtype=np.float32), allow_pickle=False)
+    return path
+
+
+def cached_clip_features(
+    video_path: str,
+    target_frames: int = MODEL_FRAMES,
+    cache_dir: Optional[str] = None,
+    target_fps=None,
+    frame_stride=None,
+    decoder=None,
+) -> Tuple[Optional[np.ndarray], bool]:
+    """
+    Returns (features, cache_hit). Only decodes the clip when no entry
+    exists for its current content.
+    """
+    key = feature_cache_key(
+        video_path,
+        target_frames=target_frames,
+        target_fps=target_fps,
+        frame_stride=frame_stride,
+        decoder=decoder,
+    )
+    features = load_cached_features(key, cache_dir)
+    if features is not None:
+        return features, True
+
+    timings = {}
+    features = extract_clip_features(
+        video_path,
+        target_frames=target_frames,
+        target_fps=target_fps,
+        frame_stride=frame_stride,
+        decoder=decoder,
+        timings=timings,
+    )
+    if features is not None:
+        used = timings.get("decoder")
+        if used and used != resolve_decoder(decoder):
+            # Fell back to another backend: file the features under the one that ran.
+            key = feature_cache_key(
+                video_path,
+                target_frames=target_frames,
+                target_fps=target_fps,
+                frame_stride=frame_stride,
+                decoder=used,
+            )
+        store_cached_features(key, features, cache_dir)
+    return features, False
+
+
+def cached_clip_coarse_energy(video_path: str, cache_dir: Optional[str] = None) -> Tuple[Optional[float], bool]:
+    """
+    Returns (clip_coarse_energy, cache_hit), stored next to the clip's
+    features so a retrain only decodes clips it has not seen. A clip too
+    short for the probe is cached as NaN and returned as None.
+    """
+    key = coarse_energy_cache_key(video_path)
+    cached = load_cached_features(key, cache_dir)
+    if cached is not None and cached.shape == (1,):
+        value = float(cached[0])
+        return (None if np.isnan(value) else value), True
+
+    energy = clip_coarse_energy(video_path)
+    store_cached_features(key, np.array([np.nan if energy is None else energy]), cache_dir)
+    # Rounded like the stored float32, so cold and warm runs calibrate alike.
+    return (None if energy is None else float(np.float32(energy))), False
@@ -0,0 +1,88 @@
+import os
+import shutil
+import subprocess
+import tempfile
+
+import numpy as np
+
+FFMPEG_BIN = os.getenv("PADELEDGE_FFMPEG_BIN", "ffmpeg")
+
+
+def ffmpeg_available() -> bool:
+    return shutil.which(FFMPEG_BIN) is not None
+
+
+class FfmpegGrayReader:
+    """
+    Decodes a video with a local ffmpeg process that drops skipped frames,
+    scales and converts to 8-bit gray inside the decoder, and streams raw
+    frames over a pipe. Full-resolution BGR frames never reach Python.
+
+    start_sec seeks before decoding (frame-accurate: ffmpeg decodes from the
+    previous keyframe and discards up to the seek point) and max_frames stops
+    after that many output frames. keyframes_only makes the decoder skip
+    every other frame (-skip_frame nokey), so only keyframes are decoded.
+
+    read_into() fills a caller-owned (height, width) uint8 array in place.
+    """
+
+    def __init__(self, video_path: str, size, frame_stride: int = 1, start_sec=None, max_frames=None,
+                 keyframes_only: bool = False):
+        self.width, self.height = int(size[0]), int(size[1])
+        self.frame_bytes = self.width * self.height
+        self.returncode = None
+        self.error = ""
+
+        filters = []
+        if frame_stride > 1:
+            filters.append(f"select=not(mod(n\\,{int(frame_stride)}))")
+        filters.append(f"scale={self.width}:{self.height}:flags=bilinear")
+        filters.append("format=gray")
+
+        cmd = [FFMPEG_BIN, "-v", "error", "-nostdin"]
+        if start_sec:
+            cmd += ["-ss", f"{float(start_sec):.6f}"]
+        if keyframes_only:
+            cmd += ["-skip_frame", "nokey"]
+        cmd += [
+            "-i", video_path,
+            "-vf", ",".join(filters),
+            # Emit exactly the selected frames; no duplication to a fixed rate.
+            "-vsync", "0",
+        ]
+        if max_frames is not None:
+            cmd += ["-frames:v", str(int(max_frames))]
+        cmd += [
+            "-f", "rawvideo",
+            "-pix_fmt", "gray",
+            "pipe:1",
+        ]
+        # stderr goes to a file so a chatty decoder can never block on a full pipe.
+        self._stderr = tempfile.TemporaryFile()
+        self.proc = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=self._stderr,
+            bufsize=self.frame_bytes * 4,
+        )
+
+    def read_into(self, out: np.ndarray) -> bool:
+        """Reads the next frame into `out`; returns False at end of stream."""
+        view = memoryview(out).cast("B")
+        got = 0
+        while got < self.frame_bytes:
+            n = self.proc.stdout.readinto(view[got:])
+            if not n:
+                return False
+            got += n
+        return True
+
+    def close(self):
+        if self.proc.poll() is None:
+            self.proc.kill()
+        self.proc.stdout.close()
+        self.returncode = self.proc.wait()
+        self._stderr.seek(0)
+        self.error = self._stderr.read().decode("utf-8", errors="replace").strip()
+        self._stderr.close()
+        return self.returncode
@@ -0,0 +1,49 @@
+import hashlib
+import os
+import threading
+from typing import Dict, Optional
+
+HASH_CHUNK_BYTES = 1024 * 1024
+
+_LOCK = threading.Lock()
+# abspath -> (mtime_ns, size, sha256)
+_HASHES: Dict[str, tuple] = {}
+
+
+def file_sha256(path: str, chunk_size: int = HASH_CHUNK_BYTES) -> str:
+    """Hashes a file in fixed-size chunks so large videos never sit in memory."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cached_file_sha256(path: str) -> Optional[str]:
+    """SHA-256 of a file, recomputed only when its mtime or size changes."""
+    path = os.path.abspath(path)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    with _LOCK:
+        known = _HASHES.get(path)
+        if known is not None and known[:2] == (stat.st_mtime_ns, stat.st_size):
+            return known[2]
+    sha256 = file_sha256(path)
+    with _LOCK:
+        _HASHES[path] = (stat.st_mtime_ns, stat.st_size, sha256)
+    return sha256
+
+
+def remember_file_sha256(path: str, sha256: str):
+    """Seeds cached_file_sha256() for a file whose hash was computed while writing it."""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    with _LOCK:
+        _HASHES[path] = (stat.st_mtime_ns, stat.st_size, sha256)
+
+
+def clear_file_hash_cache():
+    with _LOCK:
+        _HASHES.clear()
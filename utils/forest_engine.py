@@ -0,0 +1,336 @@
+import json
+import mmap
+import os
+import struct
+from typing import Tuple
+
+import numpy as np
+
+from utils.atomic_write import atomic_write
+
+FOREST_FORMAT_VERSION = 2
+FOREST_MAGIC = b"PEFOREST"
+# Array offsets in the file are multiples of this so mapped arrays are aligned.
+ARRAY_ALIGN = 64
+# Trees evaluated between two vote-margin checks in predict_early_exit().
+EARLY_EXIT_CHUNK_TREES = int(os.getenv("PADELEDGE_EARLY_EXIT_CHUNK_TREES", "25"))
+# Map the arrays read-only instead of reading them into each process.
+FOREST_MMAP = os.getenv("PADELEDGE_FOREST_MMAP", "1") != "0"
+# Rows evaluated at once; bounds the (rows, trees, classes) leaf gather.
+PREDICT_BATCH_ROWS = 256
+
+
+def flat_forest_path(model_path: str) -> str:
+    """Where the flattened copy of a pickled model lives (next to it)."""
+    return os.path.splitext(model_path)[0] + ".forest.bin"
+
+
+def _float32_floor(threshold: np.ndarray) -> np.ndarray:
+    """
+    Largest float32 <= each float64 threshold. sklearn compares float32
+    inputs against float64 thresholds, and for any float32 x,
+    x <= t64 exactly when x <= floor32(t64), so storing the floored value
+    halves the array without changing a single decision.
+    """
+    t32 = threshold.astype(np.float32)
+    too_big = t32.astype(np.float64) > threshold
+    t32[too_big] = np.nextafter(t32[too_big], np.float32(-np.inf))
+    return t32
+
+
+class FlatForest:
+    """
+    A fitted RandomForestClassifier flattened into contiguous arrays: split
+    feature, float32 threshold and a (left, right) child pair per node, for
+    all trees back to back. Nodes [0, n_splits) are splits; node
+    n_splits + k is leaf k, whose normalized class distribution is
+    leaf_values[k]. Leaves loop back to themselves (threshold +inf), so a
+    step never has to check for them.
+
+    All (row, tree) pairs of a batch descend together, one vectorized step
+    per tree level, with no per-tree Python loop and no thread-pool
+    dispatch. Finished pairs are dropped every COMPACT_EVERY levels.
+
+    Exposes classes_, n_features_in_, predict_proba() and predict() so it
+    can stand in for the sklearn model.
+    """
+
+    COMPACT_EVERY = 4
+
+    def __init__(self, feature, threshold, children, leaf_values, roots, classes,
+                 n_splits: int, max_depth: int, n_features: int, source_sha256: str = ""):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = children
+        self.leaf_values = leaf_values
+        self.roots = roots
+        self.classes_ = classes
+        self.n_splits = int(n_splits)
+        self.max_depth = int(max_depth)
+        self.n_features_in_ = int(n_features)
+        self.source_sha256 = source_sha256
+        # True when the arrays are views of a read-only file mapping.
+        self.mmapped = False
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.feature, self.threshold, self.children, self.leaf_values, self.roots)
+        return int(sum(a.nbytes for a in arrays))
+
+    def _leaves(self, X: np.ndarray, roots: np.ndarray = None) -> np.ndarray:
+        """(n_rows, len(roots)) leaf indices for float32 X (default: all trees)."""
+        if roots is None:
+            roots = self.roots
+        n_rows, n_features = X.shape
+        flat_x = X.ravel()
+        final = np.tile(roots, n_rows)
+        pending = np.arange(final.size)
+        current = final.copy()
+        # Offset of each pending (row, tree) pair's row in flat_x.
+        row_offset = (pending // len(roots)) * n_features
+        level = 0
+        while pending.size:
+            go_right = flat_x[row_offset + self.feature[current]] > self.threshold[current]
+            current = self.children[2 * current + go_right]
+            level += 1
+            if level % self.COMPACT_EVERY:
+                continue
+            done = current >= self.n_splits
+            if done.any():
+                final[pending[done]] = current[done]
+                keep = np.flatnonzero(~done)
+                pending = pending[keep]
+                current = current[keep]
+                row_offset = row_offset[keep]
+        return (final - self.n_splits).reshape(n_rows, len(roots))
+
+    def predict_proba(self, X) -> np.ndarray:
+        # sklearn evaluates trees on float32 inputs.
+        X = np.asarray(X, dtype=np.float32)
+        X = X.reshape(len(X), -1)
+        out = np.empty((len(X), len(self.classes_)), dtype=np.float64)
+        for i in range(0, len(X), PREDICT_BATCH_ROWS):
+            leaves = self._leaves(X[i:i + PREDICT_BATCH_ROWS])
+            out[i:i + len(leaves)] = self.leaf_values[leaves].sum(axis=1) / self.n_trees
+        return out
+
+    def predict(self, X) -> np.ndarray:
+        return np.asarray(self.classes_).take(np.argmax(self.predict_proba(X), axis=1))
+
+    def predict_early_exit(self, X, chunk_trees: int = EARLY_EXIT_CHUNK_TREES):
+        """
+        Evaluates the trees chunk_trees at a time and stops for each row as
+        soon as its vote is decided: one more tree adds at most 1 to a
+        class's summed probability, so once the leader is ahead of every
+        other class by more than the number of remaining trees the final
+        argmax cannot change. Labels are therefore exactly predict()'s.
+
+        Returns (labels, confidence_low, confidence_high, trees_evaluated).
+        The final max probability lies in [confidence_low, confidence_high]
+        (up to float rounding);
+        both equal predict_proba's value for rows that ran every tree.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        X = X.reshape(len(X), -1)
+        n_rows, n_classes = len(X), len(self.classes_)
+        votes = np.zeros((n_rows, n_classes), dtype=np.float64)
+        trees_evaluated = np.zeros(n_rows, dtype=np.int64)
+        pending = np.arange(n_rows)
+        chunk_trees = max(int(chunk_trees), 1)
+
+        for t0 in range(0, self.n_trees, chunk_trees):
+            if not pending.size:
+                break
+            roots = self.roots[t0:t0 + chunk_trees]
+            leaves = self._leaves(X[pending], roots)
+            # Prepending the running total keeps the tree-by-tree summation
+            # order of predict_proba, so full runs match it bit for bit.
+            stacked = np.concatenate([votes[pending, None, :], self.leaf_values[leaves]], axis=1)
+            votes[pending] = stacked.sum(axis=1)
+            trees_evaluated[pending] = t0 + len(roots)
+
+            remaining = self.n_trees - (t0 + len(roots))
+            if n_classes > 1:
+                top2 = np.partition(votes[pending], n_classes - 2, axis=1)[:, -2:]
+                decided = (top2[:, 1] - top2[:, 0]) > remaining
+            else:
+                decided = np.ones(len(pending), dtype=bool)
+            pending = pending[~decided]
+
+        proba = votes / self.n_trees
+        best = np.argmax(proba, axis=1)
+        low = proba[np.arange(n_rows), best]
+        high = np.minimum(low + (self.n_trees - trees_evaluated) / self.n_trees, 1.0)
+        labels = np.asarray(self.classes_).take(best)
+        return labels, low, high, trees_evaluated
+
+
+def compile_forest(model, source_sha256: str = "") -> FlatForest:
+    """Flattens a fitted single-output sklearn forest classifier."""
+    trees = [est.tree_ for est in model.estimators_]
+    split_masks = [tree.children_left != -1 for tree in trees]
+    n_splits = int(sum(np.count_nonzero(m) for m in split_masks))
+
+    feature, threshold, children, leaf_values, roots = [], [], [], [], []
+    split_base = 0
+    leaf_base = n_splits
+    max_depth = 0
+    for tree, is_split in zip(trees, split_masks):
+        is_leaf = ~is_split
+        # Renumber: splits -> [0, n_splits), leaves -> [n_splits, n_nodes).
+        node_id = np.empty(tree.node_count, dtype=np.int64)
+        node_id[is_split] = split_base + np.arange(np.count_nonzero(is_split))
+        node_id[is_leaf] = leaf_base + np.arange(np.count_nonzero(is_leaf))
+        split_base += int(np.count_nonzero(is_split))
+        leaf_base += int(np.count_nonzero(is_leaf))
+
+        feature.append(tree.feature[is_split].astype(np.int32))
+        threshold.append(_float32_floor(tree.threshold[is_split]))
+        pairs = np.stack(
+            [node_id[tree.children_left[is_split]], node_id[tree.children_right[is_split]]], axis=1
+        )
+        children.append(pairs.reshape(-1))
+        roots.append(node_id[0])
+
+        # Same normalization as DecisionTreeClassifier.predict_proba.
+        values = tree.value[is_leaf, 0, :].astype(np.float64)
+        normalizer = values.sum(axis=1, keepdims=True)
+        normalizer[normalizer == 0.0] = 1.0
+        leaf_values.append(values / normalizer)
+        max_depth = max(max_depth, int(tree.max_depth))
+
+    n_leaves = leaf_base - n_splits
+    leaf_ids = np.arange(n_splits, leaf_base)
+    # Leaves: feature 0, threshold +inf -> never go right -> stay put.
+    feature.append(np.zeros(n_leaves, dtype=np.int32))
+    threshold.append(np.full(n_leaves, np.inf, dtype=np.float32))
+    children.append(np.repeat(leaf_ids, 2))
+
+    return FlatForest(
+        feature=np.concatenate(feature),
+        threshold=np.concatenate(threshold),
+        children=np.concatenate(children).astype(np.int32),
+        leaf_values=np.concatenate(leaf_values),
+        roots=np.asarray(roots, dtype=np.int32),
+        classes=np.asarray(model.classes_),
+        n_splits=n_splits,
+        max_depth=max_depth,
+        n_features=model.n_features_in_,
+        source_sha256=source_sha256,
+    )
+
+
+def _array_layout(arrays: dict) -> Tuple[dict, int]:
+    """Byte offsets (relative to the data section) of each array, ARRAY_ALIGN-aligned."""
+    layout, offset = {}, 0
+    for name, arr in arrays.items():
+        offset = -(-offset // ARRAY_ALIGN) * ARRAY_ALIGN
+        layout[name] = {
+            "dtype": arr.dtype.str,
+            "shape": list(arr.shape),
+            "offset": offset,
+            "nbytes": int(arr.nbytes),
+        }
+        offset += arr.nbytes
+    return layout, offset
+
+
+def save_flat_forest(forest: FlatForest, path: str) -> str:
+    """
+    Writes the forest as FOREST_MAGIC, a length-prefixed JSON header and the
+    raw arrays, each starting on an ARRAY_ALIGN boundary so they can be
+    memory-mapped in place. Written to a temp file and renamed, never
+    modified in place: processes that still map the old file keep a valid
+    mapping of the old inode.
+    """
+    arrays = {
+        "feature": np.ascontiguousarray(forest.feature),
+        "threshold": np.ascontiguousarray(forest.threshold),
+        "children": np.ascontiguousarray(forest.children),
+        "leaf_values": np.ascontiguousarray(forest.leaf_values),
+        "roots": np.ascontiguousarray(forest.roots),
+    }
+    layout, data_bytes = _array_layout(arrays)
+    header = {
+        "format_version": FOREST_FORMAT_VERSION,
+        "n_splits": forest.n_splits,
+        "max_depth": forest.max_depth,
+        "n_features": forest.n_features_in_,
+        "source_sha256": forest.source_sha256,
+        "classes": [c.item() if hasattr(c, "item") else c for c in forest.classes_],
+        "arrays": layout,
+    }
+    header_bytes = json.dumps(header).encode("utf-8")
+    prefix = len(FOREST_MAGIC) + 8 + len(header_bytes)
+    data_start = -(-prefix // ARRAY_ALIGN) * ARRAY_ALIGN
+
+    with atomic_write(path) as f:
+        f.write(FOREST_MAGIC)
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        for name, arr in arrays.items():
+            f.seek(data_start + layout[name]["offset"])
+            f.write(arr.tobytes())
+        f.truncate(data_start + data_bytes)
+    return path
+
+
+def read_flat_forest_header(path: str) -> Tuple[dict, int]:
+    """(header, data_start) of a flat forest file, without touching its arrays."""
+    with open(path, "rb") as f:
+        if f.read(len(FOREST_MAGIC)) != FOREST_MAGIC:
+            raise ValueError(f"Not a flat forest file: {path}")
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_len).decode("utf-8"))
+    if header.get("format_version") != FOREST_FORMAT_VERSION:
+        raise ValueError(f"Unsupported flat forest format: {header.get('format_version')}")
+    prefix = len(FOREST_MAGIC) + 8 + header_len
+    return header, -(-prefix // ARRAY_ALIGN) * ARRAY_ALIGN
+
+
+def load_flat_forest(path: str, mmap_arrays: bool = None) -> FlatForest:
+    """
+    Loads a flat forest. With mmap_arrays (default FOREST_MMAP) the arrays
+    are read-only views of a shared memory mapping: loading costs one header
+    read and every process serving the same file shares its page cache.
+    Otherwise the arrays are read into private memory.
+    """
+    if mmap_arrays is None:
+        mmap_arrays = FOREST_MMAP
+    header, data_start = read_flat_forest_header(path)
+    with open(path, "rb") as f:
+        if mmap_arrays:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            buffer = f.read()
+    arrays = {}
+    for name, spec in header["arrays"].items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"], dtype=np.int64))
+        arr = np.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + spec["offset"])
+        arrays[name] = arr.reshape(spec["shape"])
+    forest = FlatForest(
+        feature=arrays["feature"],
+        threshold=arrays["threshold"],
+        children=arrays["children"],
+        leaf_values=arrays["leaf_values"],
+        roots=arrays["roots"],
+        classes=np.asarray(header["classes"]),
+        n_splits=header["n_splits"],
+        max_depth=header["max_depth"],
+        n_features=header["n_features"],
+        source_sha256=header.get("source_sha256", ""),
+    )
+    forest.mmapped = bool(mmap_arrays)
+    return forest
+
+
+def max_proba_difference(forest: FlatForest, model, X) -> float:
+    """Largest absolute probability difference to the sklearn model on X."""
+    if len(X) == 0:
+        return 0.0
+    return float(np.max(np.abs(forest.predict_proba(X) - model.predict_proba(X))))
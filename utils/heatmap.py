@@ -1,29 +1,90 @@
 # utils/heatmap.py
+import cv2
 import numpy as np
-import matplotlib.pyplot as plt
 
-def generate_heatmap_xy(keypoint_sequences, out_path="data/heatmaps/latest.png"):
+from utils.atomic_write import atomic_write
+
+HEATMAP_BINS = 40
+# Right wrist in MediaPipe pose order: x=idx*3, y=idx*3+1.
+WRIST_LANDMARK = 16
+# Rendered size of the binned grid (nearest-neighbour upscale) and the colorbar.
+HEATMAP_SIZE = (480, 400)
+COLORBAR_WIDTH = 60
+
+
+def wrist_xy(keypoint_sequences, landmark: int = WRIST_LANDMARK) -> np.ndarray:
+    """
+    (n, 2) finite x/y of one landmark across all frames, sliced from the
+    (frames, landmarks*3) array in one operation. Frames too short to hold
+    the landmark are dropped.
+    """
+    x_col = landmark * 3
+    if keypoint_sequences is None or len(keypoint_sequences) == 0:
+        return np.zeros((0, 2), dtype=np.float64)
+    try:
+        arr = np.asarray(keypoint_sequences, dtype=np.float64)
+    except ValueError:
+        # Ragged rows: keep the ones long enough, then slice as usual.
+        arr = np.asarray([kp[: x_col + 2] for kp in keypoint_sequences if len(kp) > x_col + 1], dtype=np.float64)
+    if arr.ndim != 2 or arr.shape[1] <= x_col + 1:
+        return np.zeros((0, 2), dtype=np.float64)
+    xy = arr[:, x_col:x_col + 2]
+    return xy[np.isfinite(xy).all(axis=1)]
+
+
+def bin_xy(xy: np.ndarray, bins: int = HEATMAP_BINS, value_range=None) -> np.ndarray:
+    """
+    (bins, bins) counts with rows along y and columns along x, row 0 at the
+    smallest y (image coordinates, as the old inverted y-axis). Without
+    value_range the data's own extent is binned, like plt.hist2d.
+    """
+    counts, _, _ = np.histogram2d(xy[:, 0], xy[:, 1], bins=bins, range=value_range)
+    return counts.T
+
+
+def render_heatmap(counts: np.ndarray, size=HEATMAP_SIZE) -> np.ndarray:
+    """
+    BGR image of a count grid through OpenCV's inferno lookup table, with a
+    colorbar labelled 0 and the maximum count on the right.
+    """
+    peak = float(counts.max()) if counts.size else 0.0
+    scaled = np.zeros(counts.shape, dtype=np.uint8) if peak <= 0 else np.round(counts * (255.0 / peak)).astype(np.uint8)
+    grid = cv2.applyColorMap(cv2.resize(scaled, size, interpolation=cv2.INTER_NEAREST), cv2.COLORMAP_INFERNO)
+
+    height = size[1]
+    ramp = np.linspace(255, 0, height).astype(np.uint8)[:, None]
+    bar = cv2.applyColorMap(np.repeat(ramp, COLORBAR_WIDTH // 3, axis=1), cv2.COLORMAP_INFERNO)
+    labels = np.full((height, COLORBAR_WIDTH - bar.shape[1], 3), 255, dtype=np.uint8)
+    cv2.putText(labels, f"{peak:g}", (4, 14), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 0), 1, cv2.LINE_AA)
+    cv2.putText(labels, "0", (4, height - 4), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 0), 1, cv2.LINE_AA)
+    gap = np.full((height, 8, 3), 255, dtype=np.uint8)
+    return np.hstack([grid, gap, bar, labels])
+
+
+def encode_png(image: np.ndarray) -> bytes:
+    """PNG bytes of a rendered heatmap, e.g. for st.image without a file."""
+    ok, buf = cv2.imencode(".png", image)
+    if not ok:
+        raise ValueError("Could not encode heatmap as PNG")
+    return buf.tobytes()
+
+
+def write_png(image: np.ndarray, out_path: str) -> str:
+    """Encodes in memory and renames into place, so readers never see a partial PNG."""
+    data = encode_png(image)
+    with atomic_write(out_path) as f:
+        f.write(data)
+    return out_path
+
+
+def generate_heatmap_xy(keypoint_sequences, out_path: str, bins: int = HEATMAP_BINS, value_range=None):
     """
     keypoint_sequences: np.array (frames, landmarks*3)
     We use right wrist index (MediaPipe: 16) -> x=idx*3, y=idx*3+1
+    Writes a PNG to out_path and returns it, or None without wrist data.
+    No shared plotting state is involved, so concurrent calls are safe.
     """
-    if keypoint_sequences is None or len(keypoint_sequences) == 0:
-        return None
-    xs, ys = [], []
-    for kp in keypoint_sequences:
-        try:
-            x = kp[16*3]
-            y = kp[16*3 + 1]
-            xs.append(x)
-            ys.append(y)
-        except Exception:
-            continue
-    if len(xs) == 0:
+    xy = wrist_xy(keypoint_sequences)
+    if len(xy) == 0:
         return None
-    plt.figure(figsize=(5,4))
-    plt.hist2d(xs, ys, bins=40, cmap='inferno')
-    plt.colorbar()
-    plt.gca().invert_yaxis()  # optional depending on coord system
-    plt.savefig(out_path, dpi=150, bbox_inches='tight')
-    plt.close()
-    return out_path
+    return write_png(render_heatmap(bin_xy(xy, bins, value_range)), out_path)
@@ -0,0 +1,197 @@
+import os
+import sqlite3
+import time
+from datetime import date, datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from utils.heatmap import HEATMAP_BINS, bin_xy, encode_png, render_heatmap, wrist_xy
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+HEATMAP_STORE_PATH = os.getenv(
+    "PADELEDGE_HEATMAP_STORE", os.path.join(BASE_DIR, "data", "heatmap_store.sqlite3")
+)
+# Landmarks are normalized image coordinates; every grid covers the same extent
+# so grids from different matches can simply be added.
+HEATMAP_STORE_RANGE = ((0.0, 1.0), (0.0, 1.0))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS heat_bins (
+    player_id TEXT NOT NULL,
+    shot_type TEXT NOT NULL,
+    day TEXT NOT NULL,
+    events INTEGER NOT NULL,
+    counts BLOB NOT NULL,
+    PRIMARY KEY (player_id, shot_type, day)
+);
+CREATE TABLE IF NOT EXISTS heat_analyses (
+    analysis_id TEXT PRIMARY KEY,
+    player_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    events INTEGER NOT NULL,
+    recorded_at REAL NOT NULL
+);
+"""
+
+
+def _connect(db_path: Optional[str] = None, bins: int = HEATMAP_BINS) -> sqlite3.Connection:
+    path = db_path or HEATMAP_STORE_PATH
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30.0)
+    conn.executescript(_SCHEMA)
+    conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('bins', ?)", (str(bins),))
+    conn.commit()
+    stored = int(conn.execute("SELECT value FROM meta WHERE key = 'bins'").fetchone()[0])
+    if stored != bins:
+        conn.close()
+        raise ValueError(f"Heatmap store {path} uses {stored} bins, not {bins}")
+    return conn
+
+
+def _day(value) -> str:
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return date.fromisoformat(str(value)).isoformat()
+
+
+def _event_grids(shot_types: Sequence[str], keypoints, bins: int) -> Dict[str, Tuple[np.ndarray, int]]:
+    """Per shot type: (bins, bins) int64 grid of the events' wrist positions and the event count."""
+    grids = {}
+    labels = np.asarray([str(s) for s in shot_types])
+    if len(labels) == 0 or len(keypoints) == 0:
+        return grids
+    for shot_type in np.unique(labels):
+        rows = [keypoints[i] for i in np.flatnonzero(labels == shot_type) if i < len(keypoints)]
+        xy = wrist_xy(rows)
+        if len(xy) == 0:
+            continue
+        # Out-of-frame detections land on the border instead of being lost.
+        xy = np.clip(xy, 0.0, 1.0)
+        counts = bin_xy(xy, bins, HEATMAP_STORE_RANGE).astype(np.int64)
+        grids[str(shot_type)] = (counts, len(xy))
+    return grids
+
+
+def accumulate_heatmap(
+    analysis_id: str,
+    player_id: str,
+    shot_types: Sequence[str],
+    keypoints,
+    day,
+    db_path: Optional[str] = None,
+    bins: int = HEATMAP_BINS,
+) -> int:
+    """
+    Adds one match's events to the player's per shot type, per day grids.
+    `day` is the date the match was played, not when it was recorded here.
+    Each analysis_id is counted once and later calls are ignored, so it
+    should name the match and player (e.g. video hash + player id), not an
+    analysis run: reruns, other analysis modes and retrained models must
+    not count the same match again. The read-add-write runs in one
+    IMMEDIATE transaction, so concurrent sessions never lose each other's
+    updates. Returns the number of events added.
+    """
+    if not player_id:
+        return 0
+    day = _day(day)
+    grids = _event_grids(shot_types, keypoints, bins)
+    conn = _connect(db_path, bins)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        seen = conn.execute("SELECT 1 FROM heat_analyses WHERE analysis_id = ?", (analysis_id,)).fetchone()
+        if seen is not None:
+            conn.rollback()
+            return 0
+        added = 0
+        for shot_type, (counts, events) in grids.items():
+            row = conn.execute(
+                "SELECT events, counts FROM heat_bins WHERE player_id = ? AND shot_type = ? AND day = ?",
+                (player_id, shot_type, day),
+            ).fetchone()
+            if row is not None:
+                events += row[0]
+                counts = counts + np.frombuffer(row[1], dtype=np.int64).reshape(bins, bins)
+            conn.execute(
+                "INSERT OR REPLACE INTO heat_bins (player_id, shot_type, day, events, counts) VALUES (?, ?, ?, ?, ?)",
+                (player_id, shot_type, day, int(events), counts.tobytes()),
+            )
+            added += grids[shot_type][1]
+        conn.execute(
+            "INSERT INTO heat_analyses (analysis_id, player_id, day, events, recorded_at) VALUES (?, ?, ?, ?, ?)",
+            (analysis_id, player_id, day, added, time.time()),
+        )
+        conn.commit()
+        return added
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def query_heatmap(
+    player_id: Optional[str] = None,
+    shot_type: Optional[str] = None,
+    start_day=None,
+    end_day=None,
+    db_path: Optional[str] = None,
+    bins: int = HEATMAP_BINS,
+) -> Tuple[np.ndarray, int]:
+    """
+    Summed (bins, bins) grid and event count over all stored grids matching
+    the filters (None matches everything; the date range is inclusive).
+    Cost is one addition per matching player/shot/day grid, independent of
+    how many frames went into them.
+    """
+    clauses, params = [], []
+    if player_id is not None:
+        clauses.append("player_id = ?")
+        params.append(player_id)
+    if shot_type is not None:
+        clauses.append("shot_type = ?")
+        params.append(shot_type)
+    if start_day is not None:
+        clauses.append("day >= ?")
+        params.append(_day(start_day))
+    if end_day is not None:
+        clauses.append("day <= ?")
+        params.append(_day(end_day))
+    where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+    total = np.zeros((bins, bins), dtype=np.int64)
+    events = 0
+    conn = _connect(db_path, bins)
+    try:
+        for n, blob in conn.execute(f"SELECT events, counts FROM heat_bins{where}", params):
+            total += np.frombuffer(blob, dtype=np.int64).reshape(bins, bins)
+            events += n
+    finally:
+        conn.close()
+    return total, events
+
+
+def heatmap_store_index(db_path: Optional[str] = None) -> Dict[str, List]:
+    """Known players, shot types and the first/last recorded day, for query pickers."""
+    conn = _connect(db_path)
+    try:
+        players = [r[0] for r in conn.execute("SELECT DISTINCT player_id FROM heat_bins ORDER BY player_id")]
+        shot_types = [r[0] for r in conn.execute("SELECT DISTINCT shot_type FROM heat_bins ORDER BY shot_type")]
+        first, last = conn.execute("SELECT MIN(day), MAX(day) FROM heat_bins").fetchone()
+    finally:
+        conn.close()
+    return {"players": players, "shot_types": shot_types, "days": [first, last] if first else []}
+
+
+def render_accumulated_heatmap(db_path: Optional[str] = None, **query) -> Optional[bytes]:
+    """
+    PNG bytes of query_heatmap(**query), rendered like a single-match
+    heatmap; None when nothing matches. Nothing is written to disk.
+    """
+    counts, events = query_heatmap(db_path=db_path, **query)
+    if events == 0:
+        return None
+    return encode_png(render_heatmap(counts))
@@ -0,0 +1,339 @@
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+JOB_DB_PATH = os.getenv("PADELEDGE_JOB_DB", os.path.join(BASE_DIR, "data", "jobs.sqlite3"))
+# Jobs running at the same time; further jobs wait in the queue.
+JOB_CONCURRENCY = int(os.getenv("PADELEDGE_JOB_CONCURRENCY", "2"))
+JOB_WORKER_SCRIPT = os.path.join(BASE_DIR, "scripts", "run_job.py")
+# How often the Match Analyzer re-reads a running job.
+JOB_POLL_SEC = float(os.getenv("PADELEDGE_JOB_POLL_SEC", "1.0"))
+# Progress is written at most this often; every write is a cancellation check.
+PROGRESS_INTERVAL_SEC = 0.5
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    job_key TEXT,
+    params TEXT NOT NULL,
+    status TEXT NOT NULL,
+    frames_done INTEGER NOT NULL DEFAULT 0,
+    frames_total INTEGER NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    worker_pid INTEGER,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_key ON jobs (job_key);
+"""
+
+# Worker processes started by this process; polled so finished ones are reaped.
+_PROCS_LOCK = threading.Lock()
+_PROCS: Dict[str, subprocess.Popen] = {}
+
+
+class JobCancelled(Exception):
+    """Raised from a job's progress callback once cancellation was requested."""
+
+
+def _connect(db_path: Optional[str] = None) -> sqlite3.Connection:
+    path = db_path or JOB_DB_PATH
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30.0)
+    conn.row_factory = sqlite3.Row
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _job_dict(row) -> Dict:
+    job = dict(row)
+    job["params"] = json.loads(job["params"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    job["cancel_requested"] = bool(job["cancel_requested"])
+    job["progress"] = job["frames_done"] / job["frames_total"] if job["frames_total"] else 0.0
+    if job["status"] == DONE:
+        job["progress"] = 1.0
+    return job
+
+
+def submit_job(kind: str, params: Dict, job_key: Optional[str] = None, db_path: Optional[str] = None) -> str:
+    """
+    Queues a job and returns its id. A queued or running job with the same
+    job_key is returned instead, so repeated submits (e.g. Streamlit reruns)
+    do not start the same work twice.
+    """
+    conn = _connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        if job_key is not None:
+            row = conn.execute(
+                "SELECT job_id FROM jobs WHERE job_key = ? AND status IN (?, ?) ORDER BY created_at LIMIT 1",
+                (job_key, *ACTIVE_STATUSES),
+            ).fetchone()
+            if row is not None:
+                conn.rollback()
+                return row["job_id"]
+        job_id = uuid.uuid4().hex
+        conn.execute(
+            "INSERT INTO jobs (job_id, kind, job_key, params, status, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, kind, job_key, json.dumps(params, ensure_ascii=False), QUEUED, time.time()),
+        )
+        conn.commit()
+        return job_id
+    finally:
+        conn.close()
+
+
+def get_job(job_id: str, db_path: Optional[str] = None) -> Optional[Dict]:
+    """The job as a dict (params/result decoded, progress in [0, 1]), or None."""
+    conn = _connect(db_path)
+    try:
+        row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+    finally:
+        conn.close()
+    return _job_dict(row) if row is not None else None
+
+
+def list_jobs(limit: int = 50, db_path: Optional[str] = None) -> List[Dict]:
+    """Most recent jobs first."""
+    conn = _connect(db_path)
+    try:
+        rows = conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (int(limit),)).fetchall()
+    finally:
+        conn.close()
+    return [_job_dict(row) for row in rows]
+
+
+def cancel_job(job_id: str, db_path: Optional[str] = None) -> bool:
+    """
+    Cancels a queued job at once; a running one stops at its next progress
+    report. Returns False when the job had already finished.
+    """
+    conn = _connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        cur = conn.execute(
+            "UPDATE jobs SET status = ?, cancel_requested = 1, finished_at = ? WHERE job_id = ? AND status = ?",
+            (CANCELLED, time.time(), job_id, QUEUED),
+        )
+        if cur.rowcount == 0:
+            cur = conn.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE job_id = ? AND status = ?", (job_id, RUNNING)
+            )
+        conn.commit()
+        return cur.rowcount > 0
+    finally:
+        conn.close()
+
+
+def _pid_alive(job_id: str, pid: Optional[int]) -> bool:
+    with _PROCS_LOCK:
+        proc = _PROCS.get(job_id)
+    if proc is not None:
+        return proc.poll() is None
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _launch_worker(job_id: str, db_path: Optional[str]) -> subprocess.Popen:
+    cmd = [sys.executable, JOB_WORKER_SCRIPT, job_id]
+    if db_path:
+        cmd += ["--db", db_path]
+    return subprocess.Popen(cmd, cwd=BASE_DIR, stdin=subprocess.DEVNULL)
+
+
+def _reap_running(conn: sqlite3.Connection) -> int:
+    """Inside an IMMEDIATE transaction: marks running jobs without a live worker failed, returns the live count."""
+    running = conn.execute("SELECT job_id, worker_pid FROM jobs WHERE status = ?", (RUNNING,)).fetchall()
+    alive = 0
+    for row in running:
+        if _pid_alive(row["job_id"], row["worker_pid"]):
+            alive += 1
+        else:
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE job_id = ? AND status = ?",
+                (FAILED, "Worker process exited unexpectedly", time.time(), row["job_id"], RUNNING),
+            )
+    return alive
+
+
+def dispatch_jobs(
+    db_path: Optional[str] = None,
+    concurrency: Optional[int] = None,
+    launcher: Callable = _launch_worker,
+) -> List[str]:
+    """
+    Starts worker processes for queued jobs, oldest first, while fewer than
+    `concurrency` jobs run. Running jobs whose worker process is gone are
+    marked failed first. Safe to call from any number of sessions: slots
+    are claimed in one IMMEDIATE transaction. Returns the started job ids.
+    """
+    concurrency = JOB_CONCURRENCY if concurrency is None else int(concurrency)
+    with _PROCS_LOCK:
+        for job_id, proc in list(_PROCS.items()):
+            if proc.poll() is not None:
+                del _PROCS[job_id]
+
+    started = []
+    conn = _connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        slots = max(concurrency - _reap_running(conn), 0)
+        queued = conn.execute(
+            "SELECT job_id FROM jobs WHERE status = ? ORDER BY created_at LIMIT ?", (QUEUED, slots)
+        ).fetchall()
+        for row in queued:
+            job_id = row["job_id"]
+            try:
+                proc = launcher(job_id, db_path)
+            except Exception as e:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE job_id = ?",
+                    (FAILED, f"Could not start worker: {e}", time.time(), job_id),
+                )
+                continue
+            with _PROCS_LOCK:
+                _PROCS[job_id] = proc
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker_pid = ?, started_at = ? WHERE job_id = ?",
+                (RUNNING, proc.pid, time.time(), job_id),
+            )
+            started.append(job_id)
+        conn.commit()
+    finally:
+        conn.close()
+    return started
+
+
+def claim_next_job(db_path: Optional[str] = None, concurrency: Optional[int] = None) -> Optional[str]:
+    """
+    Worker side: marks the oldest queued job running in this process and
+    returns its id, or None when the queue is empty or `concurrency` jobs
+    already run. A worker that finished its job keeps draining the queue
+    this way, so queued jobs start even when no session calls dispatch_jobs.
+    The claim shares dispatch_jobs' IMMEDIATE transaction pattern, so a job
+    is never claimed twice.
+    """
+    concurrency = JOB_CONCURRENCY if concurrency is None else int(concurrency)
+    conn = _connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = None
+        if _reap_running(conn) < concurrency:
+            row = conn.execute(
+                "SELECT job_id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+        if row is not None:
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker_pid = ?, started_at = ? WHERE job_id = ?",
+                (RUNNING, os.getpid(), time.time(), row["job_id"]),
+            )
+        conn.commit()
+    finally:
+        conn.close()
+    return row["job_id"] if row is not None else None
+
+
+class _ProgressReporter:
+    """progress(frames_done, frames_total) for a running job: throttled writes, cancellation checks."""
+
+    def __init__(self, job_id: str, db_path: Optional[str]):
+        self.job_id = job_id
+        self.db_path = db_path
+        self._last = 0.0
+
+    def __call__(self, frames_done: int, frames_total: int):
+        now = time.monotonic()
+        if now - self._last < PROGRESS_INTERVAL_SEC:
+            return
+        self._last = now
+        conn = _connect(self.db_path)
+        try:
+            conn.execute(
+                "UPDATE jobs SET frames_done = ?, frames_total = ? WHERE job_id = ?",
+                (int(frames_done), int(frames_total), self.job_id),
+            )
+            conn.commit()
+            cancel = conn.execute(
+                "SELECT cancel_requested FROM jobs WHERE job_id = ?", (self.job_id,)
+            ).fetchone()[0]
+        finally:
+            conn.close()
+        if cancel:
+            raise JobCancelled(self.job_id)
+
+
+def _finish(job_id: str, status: str, db_path: Optional[str], result=None, error=None):
+    conn = _connect(db_path)
+    try:
+        conn.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE job_id = ?",
+            (
+                status,
+                json.dumps(result, ensure_ascii=False) if result is not None else None,
+                error,
+                time.time(),
+                job_id,
+            ),
+        )
+        if status == DONE:
+            conn.execute("UPDATE jobs SET frames_done = frames_total WHERE job_id = ?", (job_id,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def run_job(job_id: str, handlers: Dict[str, Callable], db_path: Optional[str] = None) -> str:
+    """
+    Worker side: runs one job with handlers[kind](params, progress) and
+    records its result (a JSON-serializable dict), error or cancellation.
+    `progress(frames_done, frames_total)` raises JobCancelled once the job
+    was cancelled. Returns the final status.
+    """
+    job = get_job(job_id, db_path)
+    if job is None or job["status"] not in ACTIVE_STATUSES:
+        return job["status"] if job else FAILED
+    if job["cancel_requested"]:
+        _finish(job_id, CANCELLED, db_path)
+        return CANCELLED
+    handler = handlers.get(job["kind"])
+    if handler is None:
+        _finish(job_id, FAILED, db_path, error=f"Unknown job kind: {job['kind']}")
+        return FAILED
+
+    try:
+        result = handler(job["params"], _ProgressReporter(job_id, db_path))
+    except JobCancelled:
+        _finish(job_id, CANCELLED, db_path)
+        return CANCELLED
+    except Exception as e:
+        _finish(job_id, FAILED, db_path, error=f"{type(e).__name__}: {e}")
+        return FAILED
+    _finish(job_id, DONE, db_path, result=result)
+    return DONE
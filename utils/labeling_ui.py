@@ -1,5 +1,4 @@
 import os
-import tempfile
 from typing import List
 
 import streamlit as st
@@ -7,6 +6,7 @@ import streamlit as st
 from utils.dataset_manager import (
     get_dataset_overview,
     save_labeled_clip,
+    save_labeled_upload,
     list_uncertain_clips,
 )
 
@@ -55,18 +55,16 @@ def render_labeling_ui():
             st.video(up_file)
 
             if st.button("💾 Gem klip i dataset", type="primary"):
-                # skriv midlertidigt til disk
-                tmp_dir = tempfile.mkdtemp()
-                tmp_path = os.path.join(tmp_dir, up_file.name)
-                with open(tmp_path, "wb") as f:
-                    f.write(up_file.read())
-
-                final_path = save_labeled_clip(
-                    tmp_path,
+                # streames direkte til disk og hashes undervejs
+                saved = save_labeled_upload(
+                    up_file,
                     new_category.strip(),
                     new_shot.strip(),
                     filename=up_file.name,
                 )
+                final_path = saved.path
+                if saved.reused:
+                    st.info("Et identisk klip lå allerede dér — det blev genbrugt.")
                 st.success(f"Klip gemt som træningsdata: {final_path}")
         elif up_file:
             st.warning("Udfyld både kategori og shot-type for at gemme klippet.")
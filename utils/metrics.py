@@ -1,9 +1,12 @@
 import os
 import json
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
+
+from utils.stage_timing import summarize_stage_timings
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 METRICS_PATH = os.path.join(BASE_DIR, "models", "metrics.json")
+ANALYSIS_LOG_PATH = os.path.join(BASE_DIR, "data", "analysis_logs", "match_analyses.jsonl")
 
 
 def load_metrics_summary() -> Optional[Dict[str, Any]]:
@@ -28,3 +31,23 @@ def load_metrics_summary() -> Optional[Dict[str, Any]]:
             return json.load(f)
     except Exception:
         return None
+
+
+def load_stage_latency_summary(log_path: str = ANALYSIS_LOG_PATH, last_n: int = 500) -> List[Dict[str, Any]]:
+    """
+    p50/p95 per analysis stage (wall, CPU, fps, peak RSS) over the last
+    last_n records of match_analyses.jsonl. Records without stage timings
+    (older logs) and unreadable lines are skipped.
+    """
+    if not os.path.exists(log_path):
+        return []
+    records = []
+    with open(log_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get("stages"):
+                records.append(record)
+    return summarize_stage_timings(records[-last_n:])
@@ -0,0 +1,84 @@
+import os
+import threading
+from typing import Callable, Dict, Optional
+
+import joblib
+
+from utils.file_hash import clear_file_hash_cache, file_sha256
+
+# Anything smaller than this cannot be a trained forest (mirrors the old validity check).
+MIN_MODEL_BYTES = 4096
+
+
+class CachedModel:
+    """A loaded model plus the on-disk identity it was loaded from."""
+
+    def __init__(self, path: str, model, sha256: str, mtime_ns: int, size: int):
+        self.path = path
+        self.model = model
+        self.sha256 = sha256
+        self.mtime_ns = mtime_ns
+        self.size = size
+
+
+_LOCK = threading.Lock()
+_ENTRIES: Dict[str, CachedModel] = {}
+_STATS = {"hits": 0, "loads": 0, "rehashes": 0}
+
+
+def get_cached_model(model_path: str, loader: Callable = joblib.load) -> Optional[CachedModel]:
+    """
+    Returns the process-wide cached model for model_path, loading it on first
+    use. Unchanged files (same mtime and size) are served without touching
+    the disk beyond a stat(). When the stat changes the file is re-hashed and
+    only reloaded if its content actually differs, so a touch or a copy of
+    the same artifact costs one hash instead of a full unpickle.
+    `loader` turns the path into the model object (joblib.load for the
+    sklearn pickle, load_flat_forest for the flattened forest).
+    Returns None when the file is missing, too small or cannot be loaded.
+    """
+    path = os.path.abspath(model_path)
+    with _LOCK:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            _ENTRIES.pop(path, None)
+            return None
+        if stat.st_size < MIN_MODEL_BYTES:
+            _ENTRIES.pop(path, None)
+            return None
+
+        entry = _ENTRIES.get(path)
+        if entry is not None and (entry.mtime_ns, entry.size) == (stat.st_mtime_ns, stat.st_size):
+            _STATS["hits"] += 1
+            return entry
+
+        sha256 = file_sha256(path)
+        if entry is not None and entry.sha256 == sha256:
+            _STATS["rehashes"] += 1
+            entry.mtime_ns, entry.size = stat.st_mtime_ns, stat.st_size
+            return entry
+
+        try:
+            model = loader(path)
+        except Exception:
+            _ENTRIES.pop(path, None)
+            return None
+
+        _STATS["loads"] += 1
+        entry = CachedModel(path, model, sha256, stat.st_mtime_ns, stat.st_size)
+        _ENTRIES[path] = entry
+        return entry
+
+
+def clear_model_cache():
+    with _LOCK:
+        _ENTRIES.clear()
+        for key in _STATS:
+            _STATS[key] = 0
+    clear_file_hash_cache()
+
+
+def model_cache_stats() -> Dict[str, int]:
+    with _LOCK:
+        return dict(_STATS, entries=len(_ENTRIES))
@@ -3,6 +3,9 @@ import glob
 from datetime import datetime
 from typing import List, Dict
 
+from utils.forest_engine import flat_forest_path, read_flat_forest_header
+from utils.file_hash import cached_file_sha256
+
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 MODELS_DIR = os.path.join(BASE_DIR, "models")
 LATEST_DIR = os.path.join(MODELS_DIR, "latest")
@@ -17,6 +20,34 @@ def _format_bytes(num_bytes: int) -> str:
     return f"{num_bytes:.1f} TB"
 
 
+def get_artifact_info(model_path: str) -> Dict:
+    """
+    Inference artifact served for a pickled model: the memory-mappable flat
+    forest next to it when that exists and was exported from this pickle,
+    else the pickle itself. mapped_size is the array data mapped read-only
+    (shared between processes); None for pickles.
+    """
+    forest_path = flat_forest_path(model_path)
+    info = {"format": "sklearn_pickle", "artifact_path": model_path, "mapped_size": None}
+    if not os.path.exists(forest_path):
+        return info
+    try:
+        header, _ = read_flat_forest_header(forest_path)
+    except Exception:
+        return info
+    if header.get("source_sha256") != cached_file_sha256(model_path):
+        return info
+    mapped = sum(spec["nbytes"] for spec in header["arrays"].values())
+    info.update(
+        {
+            "format": f"flat_forest_v{header['format_version']}",
+            "artifact_path": forest_path,
+            "mapped_size": _format_bytes(mapped),
+        }
+    )
+    return info
+
+
 def get_current_model_overview() -> Dict:
     info = {
         "exists": False,
@@ -26,6 +57,9 @@ def get_current_model_overview() -> Dict:
         "latest_path": None,
         "latest_modified": None,
         "archive_count": 0,
+        "format": None,
+        "artifact_path": None,
+        "mapped_size": None,
     }
 
     classic_path = os.path.join(MODELS_DIR, "shot_classifier.pkl")
@@ -38,6 +72,7 @@ def get_current_model_overview() -> Dict:
         info["path"] = effective_path
         info["modified"] = datetime.fromtimestamp(os.path.getmtime(effective_path))
         info["size"] = _format_bytes(os.path.getsize(effective_path))
+        info.update(get_artifact_info(effective_path))
 
     if os.path.exists(latest_path):
         info["latest_path"] = latest_path
@@ -65,6 +100,7 @@ def list_model_versions() -> List[Dict]:
                 "path": path,
                 "modified": ts,
                 "size": size,
+                **get_artifact_info(path),
             }
         )
 
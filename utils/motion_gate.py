@@ -0,0 +1,109 @@
+import json
+import os
+from typing import Optional
+
+import numpy as np
+
+from utils.video_processor import MODEL_FRAMES
+
+# Per-frame descriptor columns summed into a window's motion energy:
+# mean_motion and std_motion of |gray - prev| (see _frame_motion_features).
+MOTION_ENERGY_DIMS = (0, 2)
+MOTION_ENERGY_NAMES = ["mean_motion", "std_motion"]
+
+MOTION_GATE_ENABLED = os.getenv("PADELEDGE_MOTION_GATE", "1") != "0"
+# Threshold = margin * this quantile of the training shots' motion energy.
+GATE_QUANTILE = float(os.getenv("PADELEDGE_MOTION_GATE_QUANTILE", "0.05"))
+GATE_MARGIN = float(os.getenv("PADELEDGE_MOTION_GATE_MARGIN", "0.5"))
+# Two-pass analysis: seconds of context kept around each active coarse sample.
+RALLY_PADDING_SEC = float(os.getenv("PADELEDGE_RALLY_PADDING_SEC", "2.0"))
+
+
+def clip_motion_energy(feature_matrix: np.ndarray, target_frames: int = MODEL_FRAMES) -> np.ndarray:
+    """Motion energy of each flattened (target_frames * feature_dim) clip vector."""
+    X = np.asarray(feature_matrix, dtype=np.float64)
+    frames = X.reshape(len(X), target_frames, -1)
+    return frames[:, :, list(MOTION_ENERGY_DIMS)].sum(axis=2).mean(axis=1)
+
+
+def window_motion_energy(engine, starts) -> np.ndarray:
+    """Motion energy of each window of a WindowFeatureEngine, from its prefix sums."""
+    return engine.window_means(starts)[:, list(MOTION_ENERGY_DIMS)].sum(axis=1)
+
+
+def sequence_motion_energy(feature_seq: np.ndarray) -> float:
+    """Motion energy of a whole per-frame sequence (used for clips shorter than a window)."""
+    arr = np.asarray(feature_seq, dtype=np.float64)
+    return float(arr[:, list(MOTION_ENERGY_DIMS)].sum(axis=1).mean())
+
+
+def calibrate_motion_gate(
+    feature_matrix: np.ndarray,
+    quantile: float = GATE_QUANTILE,
+    margin: float = GATE_MARGIN,
+    target_frames: int = MODEL_FRAMES,
+    coarse_energy=None,
+) -> Optional[dict]:
+    """
+    Derives the idle-window threshold from the labelled shot clips: every
+    training sample is a real shot, so the threshold sits at `margin` times
+    a low quantile of their energies. train_pass_rate is the share of
+    training shots the gate would let through (should be 1.0).
+    coarse_energy (clip_coarse_energy of the same clips) calibrates the
+    two-pass analyzer's keyframe threshold the same way; without it there is
+    no coarse_threshold and the analyzer falls back to the fine one.
+    """
+    if len(feature_matrix) == 0:
+        return None
+    energy = clip_motion_energy(feature_matrix, target_frames=target_frames)
+    threshold = float(margin * np.quantile(energy, quantile))
+    coarse = np.asarray([e for e in (coarse_energy or []) if e is not None], dtype=np.float64)
+    return {
+        "coarse_threshold": float(margin * np.quantile(coarse, quantile)) if len(coarse) else None,
+        "coarse_clips": int(len(coarse)),
+        "threshold": threshold,
+        "quantile": float(quantile),
+        "margin": float(margin),
+        "energy_features": MOTION_ENERGY_NAMES,
+        "train_clips": int(len(energy)),
+        "train_pass_rate": float(np.mean(energy >= threshold)),
+        "train_energy_min": float(energy.min()),
+        "train_energy_median": float(np.median(energy)),
+    }
+
+
+def load_motion_gate(metrics_path: str) -> Optional[dict]:
+    """The gate calibrated for the active model, or None (legacy model or gate disabled)."""
+    if not MOTION_GATE_ENABLED:
+        return None
+    try:
+        with open(metrics_path, "r", encoding="utf-8") as f:
+            metrics = json.load(f)
+    except Exception:
+        return None
+    gate = metrics.get("active_motion_gate")
+    if not gate or gate.get("threshold") is None:
+        return None
+    return gate
+
+
+def find_active_segments(timestamps, active, sample_interval, padding_sec: float = RALLY_PADDING_SEC):
+    """
+    Merges active coarse samples into (start_sec, end_sec) segments. Sample i
+    measures the motion over (timestamps[i] - sample_interval, timestamps[i]],
+    where sample_interval is one number or one per sample (irregularly
+    spaced keyframes); each one is widened by padding_sec on both sides and
+    overlapping or touching intervals are merged.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    active = np.asarray(active, dtype=bool)
+    intervals = np.broadcast_to(np.asarray(sample_interval, dtype=np.float64), timestamps.shape)
+    segments = []
+    for t, interval in zip(timestamps[active], intervals[active]):
+        start = max(float(t) - float(interval) - padding_sec, 0.0)
+        end = float(t) + padding_sec
+        if segments and start <= segments[-1][1]:
+            segments[-1][1] = max(segments[-1][1], end)
+        else:
+            segments.append([start, end])
+    return [(start, end) for start, end in segments]
@@ -0,0 +1,288 @@
+import json
+import os
+from typing import Iterable, Iterator, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from utils.atomic_write import atomic_write
+from utils.file_hash import cached_file_sha256
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+SEEK_INDEX_VERSION = 1
+# Indexes are keyed by video content, never stored next to the video itself.
+SEEK_INDEX_DIR = os.getenv("PADELEDGE_SEEK_INDEX_DIR", os.path.join(BASE_DIR, "data", "seek_index"))
+# Build and persist an index during full-video analysis passes.
+SEEK_INDEX_ENABLED = os.getenv("PADELEDGE_SEEK_INDEX", "1") != "0"
+# Container frame rates outside this range are treated as missing.
+MAX_PLAUSIBLE_FPS = 1000.0
+# A container rate further than this from the measured one is not trusted.
+FPS_TOLERANCE = 0.01
+
+
+def seek_index_path(video_path: str, index_dir: Optional[str] = None) -> Optional[str]:
+    """
+    <index_dir>/<sha[:2]>/<sha>.npz for the SHA-256 of the video's content,
+    so copies and re-uploads share one index and a changed file gets a new
+    one. None when the video cannot be read.
+    """
+    sha256 = cached_file_sha256(video_path)
+    if sha256 is None:
+        return None
+    return os.path.join(index_dir or SEEK_INDEX_DIR, sha256[:2], f"{sha256}.npz")
+
+
+class SeekIndex:
+    """
+    Per-video random-access index: the presentation time of every frame,
+    the frame numbers of all keyframes, the frame rate measured from those
+    timestamps and the container's declared rate. video_size / video_mtime_ns
+    record the file it was built from.
+
+    Keyframe flags come per packet (decode order), so with B-frames a
+    keyframe position can be off by the decoder's reorder delay (a few
+    frames). Seeks that rely on it stay correct and are at worst slightly
+    less tight.
+    """
+
+    def __init__(self, pts_sec, keyframes, container_fps: float, video_size: int = 0,
+                 video_mtime_ns: int = 0, timestamps_measured: bool = True):
+        self.pts_sec = np.asarray(pts_sec, dtype=np.float64)
+        self.keyframes = np.asarray(keyframes, dtype=np.int64)
+        self.container_fps = float(container_fps or 0.0)
+        self.video_size = int(video_size)
+        self.video_mtime_ns = int(video_mtime_ns)
+        # False when pts_sec was derived from the container rate, not decoded.
+        self.timestamps_measured = bool(timestamps_measured)
+
+    @property
+    def frame_count(self) -> int:
+        return len(self.pts_sec)
+
+    @property
+    def fps(self) -> float:
+        """Frame rate measured from the frame timestamps (median frame duration)."""
+        if self.timestamps_measured and self.frame_count > 1:
+            step = np.median(np.diff(self.pts_sec))
+            if step > 0:
+                return float(1.0 / step)
+        return self.container_fps
+
+    def frame_at(self, timestamp_sec: float) -> int:
+        """The frame shown at timestamp_sec (last frame whose pts is <= it)."""
+        i = int(np.searchsorted(self.pts_sec, float(timestamp_sec) + 1e-9, side="right")) - 1
+        return min(max(i, 0), max(self.frame_count - 1, 0))
+
+    def keyframe_before(self, frame_no: int) -> int:
+        """The last keyframe at or before frame_no (decoding must start there)."""
+        i = int(np.searchsorted(self.keyframes, int(frame_no), side="right")) - 1
+        return int(self.keyframes[i]) if i >= 0 else 0
+
+
+class SeekIndexBuilder:
+    """Collects keyframe flags and timestamps from a VideoCapture, one call per decoded frame."""
+
+    def __init__(self, container_fps: float = 0.0):
+        self.container_fps = container_fps
+        self._keys = []
+        self._pts_ms = []
+
+    def add(self, cap):
+        self._keys.append(cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME) > 0)
+        self._pts_ms.append(cap.get(cv2.CAP_PROP_POS_MSEC))
+
+    def build(self, video_path: str) -> Optional[SeekIndex]:
+        if not self._pts_ms:
+            return None
+        keyframes = np.flatnonzero(self._keys)
+        if not len(keyframes) or keyframes[0] != 0:
+            # Not every backend reports key flags; frame 0 always is one.
+            keyframes = np.concatenate([[0], keyframes])
+        stat = os.stat(video_path)
+        return SeekIndex(
+            np.asarray(self._pts_ms) / 1000.0,
+            keyframes,
+            self.container_fps,
+            stat.st_size,
+            stat.st_mtime_ns,
+        )
+
+
+def scan_seek_index(video_path: str) -> Optional[SeekIndex]:
+    """
+    Builds an index from the packet stream without decoding (OpenCV raw
+    mode). Packets carry keyframe flags but no usable timestamps there, so
+    frame times come from the container rate (timestamps_measured=False).
+    Used when the decode pass itself could not observe frames (ffmpeg).
+    """
+    cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG, [cv2.CAP_PROP_FORMAT, -1])
+    if not cap.isOpened():
+        return None
+    container_fps = cap.get(cv2.CAP_PROP_FPS)
+    keys = []
+    try:
+        while cap.grab():
+            keys.append(cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME) > 0)
+    finally:
+        cap.release()
+    if not keys or not (0 < container_fps < MAX_PLAUSIBLE_FPS):
+        return None
+    keyframes = np.flatnonzero(keys)
+    if not len(keyframes) or keyframes[0] != 0:
+        keyframes = np.concatenate([[0], keyframes])
+    stat = os.stat(video_path)
+    return SeekIndex(
+        np.arange(len(keys)) / container_fps,
+        keyframes,
+        container_fps,
+        stat.st_size,
+        stat.st_mtime_ns,
+        timestamps_measured=False,
+    )
+
+
+def save_seek_index(index: SeekIndex, video_path: str, index_dir: Optional[str] = None) -> str:
+    """Writes the index under the video's content hash (atomically, no pickles)."""
+    path = seek_index_path(video_path, index_dir)
+    if path is None:
+        raise FileNotFoundError(video_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    meta = {
+        "version": SEEK_INDEX_VERSION,
+        "container_fps": index.container_fps,
+        "video_size": index.video_size,
+        "video_mtime_ns": index.video_mtime_ns,
+        "timestamps_measured": index.timestamps_measured,
+    }
+    with atomic_write(path) as f:
+        np.savez(f, pts_sec=index.pts_sec, keyframes=index.keyframes, meta=np.array(json.dumps(meta)))
+    return path
+
+
+def load_seek_index(video_path: str, index_dir: Optional[str] = None) -> Optional[SeekIndex]:
+    """The persisted index of video_path's content, or None when missing or corrupt."""
+    path = seek_index_path(video_path, index_dir)
+    if path is None:
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            meta = json.loads(str(data["meta"]))
+            if meta.get("version") != SEEK_INDEX_VERSION:
+                return None
+            if meta["video_size"] != os.path.getsize(video_path):
+                return None
+            return SeekIndex(
+                data["pts_sec"],
+                data["keyframes"],
+                meta["container_fps"],
+                meta["video_size"],
+                meta["video_mtime_ns"],
+                meta.get("timestamps_measured", True),
+            )
+    except Exception:
+        return None
+
+
+def fps_plausible(fps: float) -> bool:
+    """Whether a container frame rate can be used as is (missing and absurd rates cannot)."""
+    return bool(fps) and 0 < fps < MAX_PLAUSIBLE_FPS
+
+
+def resolve_source_fps(container_fps: float, index: Optional[SeekIndex] = None, default: float = 25.0) -> float:
+    """
+    The frame rate to use for a video: the container's when it is plausible
+    and agrees with the measured rate, else the rate measured by the seek
+    index, else `default`.
+    """
+    container_ok = fps_plausible(container_fps)
+    if index is not None and index.timestamps_measured:
+        measured = index.fps
+        if measured > 0 and (not container_ok or abs(container_fps - measured) > FPS_TOLERANCE * measured):
+            return measured
+    if container_ok:
+        return float(container_fps)
+    if index is not None and index.fps > 0:
+        return index.fps
+    return float(default)
+
+
+def seek_to_frame(cap, frame_no: int, index: Optional[SeekIndex] = None, max_attempts: int = 4) -> bool:
+    """
+    Positions a freshly opened capture so its next read() returns frame
+    frame_no. OpenCV converts frame numbers to time with the container
+    rate, so on variable frame rate video its seek lands elsewhere. With an
+    index whose timestamps were measured, the frame actually landed on is
+    looked up by its timestamp: seeks that fall short are topped up by
+    grabbing forward, overshoots are retried further back, and when neither
+    works the capture grabs forward from frame 0. Without one the capture's seek is trusted. Returns False if
+    the video ends before frame_no.
+    """
+    frame_no = int(frame_no)
+    if frame_no <= 0:
+        return True
+    if index is None or not index.timestamps_measured:
+        cap.set(cv2.CAP_PROP_POS_FRAMES, frame_no)
+        return True
+    guess = frame_no
+    landed = -1  # last frame grabbed
+    for _ in range(max_attempts):
+        cap.set(cv2.CAP_PROP_POS_FRAMES, guess)
+        if not cap.grab():
+            break
+        landed = index.frame_at(cap.get(cv2.CAP_PROP_POS_MSEC) / 1000.0)
+        if landed < frame_no:
+            # OpenCV stops reading once its own (rate-based) frame counter
+            # passes the container frame count, so this can still fail.
+            if _grab_until(cap, landed, frame_no):
+                return True
+            break
+        guess -= landed - frame_no + 1
+        if guess <= 0:
+            break
+    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    return _grab_until(cap, -1, frame_no)
+
+
+def _grab_until(cap, landed: int, frame_no: int) -> bool:
+    """Grabs from frame landed + 1 until the next read() returns frame_no."""
+    while landed < frame_no - 1:
+        if not cap.grab():
+            return False
+        landed += 1
+    return True
+
+
+def iter_frames_at(cap, frame_nos: Iterable[int], index: Optional[SeekIndex] = None,
+                   seek_gap_frames: Optional[int] = None) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Yields (frame_no, BGR frame) for the requested frame numbers in
+    ascending order from a freshly opened capture (left open for the
+    caller). With an index, a target is seeked to only when a keyframe lies
+    between the current position and it (the seek then decodes from that
+    keyframe); otherwise the frames up to it are grabbed, since a seek would
+    restart from an earlier keyframe. Either way only frames from the
+    nearest keyframe or the current position onward are decoded. Without an
+    index it grabs straight through, seeking directly to targets more than
+    seek_gap_frames ahead.
+    """
+    targets = sorted(set(int(f) for f in frame_nos if f >= 0))
+    position = 0  # frame number the next read() returns
+    for target in targets:
+        if index is not None:
+            keyframe = index.keyframe_before(target)
+            if keyframe > position:
+                # The capture's own seek decodes forward from that keyframe.
+                cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+                position = target
+        elif seek_gap_frames and target - position > seek_gap_frames:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+            position = target
+        while position < target and cap.grab():
+            position += 1
+        if position < target:
+            return
+        ok, frame = cap.read()
+        if not ok:
+            return
+        position += 1
+        yield target, frame
@@ -1,16 +1,37 @@
 import os
-import joblib
+import json
 import numpy as np
 import time
 import subprocess
 import sys
 import cv2
 
+from utils.forest_engine import flat_forest_path, load_flat_forest
+from utils.file_hash import cached_file_sha256
+from utils.model_cache import get_cached_model
+from utils.seek_index import load_seek_index, resolve_source_fps, SEEK_INDEX_ENABLED
+from utils.stage_timing import current_stage_timer, timed_stage
+from utils.motion_gate import (
+    find_active_segments,
+    load_motion_gate,
+    RALLY_PADDING_SEC,
+    sequence_motion_energy,
+    window_motion_energy,
+)
 from utils.video_processor import (
+    decode_signature,
     extract_keypoints_from_video,
+    iter_keypoints_from_video,
+    record_decode_stages,
+    scan_motion_activity,
+    resolve_frame_stride,
     summarize_feature_sequence,
+    SlidingWindowBuffer,
+    WindowFeatureEngine,
     MODEL_FRAMES,
+    DEFAULT_FPS,
 )
+from utils.worker_pool import init_decode_worker, resolve_worker_count
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 MODEL_PATH = os.getenv(
@@ -19,24 +40,61 @@ MODEL_PATH = os.getenv(
 TRAIN_SCRIPT = os.getenv(
     "PADELEDGE_TRAIN_SCRIPT", os.path.join(BASE_DIR, "scripts", "train_shot_model.py")
 )
+# Flattened forest exported by train_shot_model.py; preferred over the pickle when it matches it.
+FOREST_PATH = os.getenv("PADELEDGE_FOREST_PATH", flat_forest_path(MODEL_PATH))
+USE_FLAT_FOREST = os.getenv("PADELEDGE_FLAT_FOREST", "1") != "0"
+# Stop evaluating trees once a window's vote is decided (flat forest only).
+EARLY_EXIT = os.getenv("PADELEDGE_EARLY_EXIT", "0") == "1"
+METRICS_PATH = os.getenv(
+    "PADELEDGE_METRICS_PATH", os.path.join(BASE_DIR, "models", "metrics.json")
+)
 LOG_PATH = os.getenv(
     "PADELEDGE_AUTO_RETRAIN_LOG", os.path.join(BASE_DIR, "models", "auto_retrain.log")
 )
+# Frames decoded per streaming step; bounds analysis memory independent of video length.
+STREAM_CHUNK_FRAMES = int(os.getenv("PADELEDGE_STREAM_CHUNK_FRAMES", "256"))
+# >0 decodes on a background thread with this many preprocessing threads.
+PIPELINE_WORKERS = int(os.getenv("PADELEDGE_DECODE_PIPELINE_WORKERS", "0"))
+# >0 computes motion descriptors for this many frames at a time (vectorized block mode).
+BLOCK_FRAMES = int(os.getenv("PADELEDGE_DECODE_BLOCK_FRAMES", "0"))
+# Analysis window hop as a fraction of the window length (0.5 = 50% overlap).
+WINDOW_HOP = float(os.getenv("PADELEDGE_WINDOW_HOP", "0.5"))
+# Worker processes for analyze_parallel(); 0 = one per CPU core.
+ANALYSIS_WORKERS = int(os.getenv("PADELEDGE_ANALYSIS_WORKERS", "0"))
+# How often analyze_parallel() reports the workers' decoded frames (and checks cancellation).
+PARALLEL_POLL_SEC = 0.25
+
+# (frames_done, cancel) shared with the parent, set in each analyze_parallel() worker.
+_CHUNK_SHARED = None
 
 
 def is_model_valid(model_path: str) -> bool:
-    """Checks if model file exists, is non-empty, and can be loaded."""
-    if not os.path.exists(model_path):
-        return False
+    """
+    Checks if model file exists, is non-empty, and can be loaded.
+    The load goes through the process-wide model cache, so a valid model is
+    not unpickled a second time when the detector picks it up.
+    """
+    return get_cached_model(model_path) is not None
 
-    if os.path.getsize(model_path) < 4096:  # 4KB minimum
-        return False
 
+def load_decode_options(metrics_path: str) -> dict:
+    """
+    Decode settings the active model was trained with (from metrics.json),
+    so inference samples frames at the same rate as training.
+    """
+    # Models trained before the decoder was recorded always used OpenCV.
+    options = {"target_fps": None, "frame_stride": None, "decoder": "opencv"}
     try:
-        joblib.load(model_path)
-        return True
+        with open(metrics_path, "r", encoding="utf-8") as f:
+            metrics = json.load(f)
     except Exception:
-        return False
+        return options
+
+    active = metrics.get("active_decode") or {}
+    options["target_fps"] = active.get("target_fps")
+    options["frame_stride"] = active.get("frame_stride")
+    options["decoder"] = active.get("decoder") or "opencv"
+    return options
 
 
 def auto_retrain():
@@ -61,22 +119,171 @@ def auto_retrain():
     return is_model_valid(MODEL_PATH)
 
 
+def merge_window_events(window_events):
+    """
+    Collapses runs of consecutive windows with the same label into one
+    event, keeping the last window of each run. Takes and yields
+    (label, timestamp_sec, representative_keypoint, confidence) tuples.
+    Windows labelled None (skipped as idle) end a run and emit nothing.
+    """
+    pending = None
+    for label, timestamp, keypoint, conf in window_events:
+        event = (label, float(timestamp), keypoint, conf)
+        if pending is not None and pending[0] != label and pending[0] is not None:
+            yield pending
+        pending = event
+    if pending is not None and pending[0] is not None:
+        yield pending
+
+
+def window_batch(span, starts, plan: dict, threshold=None):
+    """
+    (timestamps_sec, representative_keypoints, window_features, active) for
+    the windows at global feature rows `starts`, all lying inside `span`,
+    whose first row is global row starts[0]. Windows with motion energy
+    below `threshold` are inactive and get no feature row.
+    """
+    window_frames = plan["window_frames"]
+    # One engine per span: every overlapping window in it is built from
+    # the same precomputed arrays instead of being resampled from scratch.
+    engine = WindowFeatureEngine(span, window_frames, target_frames=MODEL_FRAMES)
+    local_starts = starts - starts[0]
+    timestamps = (starts + window_frames // 2) / plan["fps"]
+    # Copy the middle rows so callers holding them do not pin the chunk.
+    keypoints = np.array(span[local_starts + window_frames // 2])
+    active = np.ones(len(starts), dtype=bool)
+    if threshold is not None:
+        active = window_motion_energy(engine, local_starts) >= threshold
+    return timestamps, keypoints, engine.window_vectors(local_starts[active]), active
+
+
+def _init_chunk_worker(frames_done, cancel):
+    global _CHUNK_SHARED
+    init_decode_worker()
+    _CHUNK_SHARED = (frames_done, cancel)
+
+
+def _analyze_chunk_job(video_path: str, plan: dict, r0: int, r_end, threshold):
+    """
+    Worker side of analyze_parallel(): seeks to feature row r0, decodes up to
+    one window past the chunk and returns (window_batch or None, timings)
+    for the windows starting in [r0, r_end) (r_end None = to the end).
+    Decoded frames are added to the shared counter after every streaming
+    chunk; once the parent sets the cancel event the decode stops there.
+    """
+    window_frames = plan["window_frames"]
+    stride_frames = plan["stride_frames"]
+    end_frame = None
+    if r_end is not None:
+        # Last window starts at r_end - stride and needs window_frames rows.
+        end_frame = (r_end - plan["stride"] + window_frames + 1) * stride_frames
+    timings = {}
+    chunks = iter_keypoints_from_video(
+        video_path,
+        frame_stride=stride_frames,
+        chunk_size=STREAM_CHUNK_FRAMES,
+        decoder=plan["decoder"],
+        timings=timings,
+        start_frame=r0 * stride_frames,
+        end_frame=end_frame,
+    )
+    rows = []
+    try:
+        for chunk in chunks:
+            rows.append(chunk)
+            if _CHUNK_SHARED is not None:
+                frames_done, cancel = _CHUNK_SHARED
+                with frames_done.get_lock():
+                    frames_done.value += len(chunk) * stride_frames
+                if cancel.is_set():
+                    return None, timings
+    finally:
+        chunks.close()
+    seq = np.concatenate(rows) if rows else None
+    if seq is None or len(seq) < window_frames:
+        return None, timings
+    starts = r0 + np.arange(0, len(seq) - window_frames + 1, plan["stride"])
+    if r_end is not None:
+        starts = starts[starts < r_end]
+    return window_batch(seq, starts, plan, threshold), timings
+
+
+def load_matching_flat_forest():
+    """
+    The cached flattened forest if it was exported from the current pickle
+    (its recorded source hash matches MODEL_PATH), else None. Checking the
+    hash is much cheaper than unpickling the forest.
+    """
+    flat = get_cached_model(FOREST_PATH, loader=load_flat_forest)
+    if flat is None:
+        return None
+    if flat.model.source_sha256 != cached_file_sha256(MODEL_PATH):
+        return None
+    return flat
+
+
 class ShotDetector:
     def __init__(self):
-        """Loads model safely — retrains automatically if missing or broken."""
-        if not is_model_valid(MODEL_PATH):
-            print("⚠️ Model not valid — retraining...")
-            ok = auto_retrain()
-            if not ok:
-                raise RuntimeError(
-                    f"❌ Auto-retrain failed. Check log at: {LOG_PATH}"
-                )
-
-        self.model = joblib.load(MODEL_PATH)
+        """
+        Loads model safely — retrains automatically if missing or broken.
+        Construction is cheap once the model is cached in this process.
+        """
+        # Shared with every other detector in the process; reloaded only when
+        # the file on disk changes.
+        flat = load_matching_flat_forest() if USE_FLAT_FOREST else None
+        if flat is not None:
+            self.model = flat.model
+            self.model_sha256 = flat.model.source_sha256
+            self.model_format = "flat_forest"
+        else:
+            cached = get_cached_model(MODEL_PATH)
+            if cached is None:
+                print("⚠️ Model not valid — retraining...")
+                ok = auto_retrain()
+                cached = get_cached_model(MODEL_PATH) if ok else None
+                if cached is None:
+                    raise RuntimeError(
+                        f"❌ Auto-retrain failed. Check log at: {LOG_PATH}"
+                    )
+            self.model = cached.model
+            self.model_sha256 = cached.sha256
+            self.model_format = "sklearn_pickle"
+
         self.model_path = MODEL_PATH
         self.class_labels = list(getattr(self.model, "classes_", []))
+        self.decode_options = load_decode_options(METRICS_PATH)
+        # Idle-window gate calibrated at training time; None runs every window.
+        self.motion_gate = load_motion_gate(METRICS_PATH)
+        self.last_decode_timings = {}
+        self.last_gate_stats = {}
+        self.last_two_pass_stats = {}
+        self.early_exit = EARLY_EXIT and hasattr(self.model, "predict_early_exit")
+        self.last_early_exit_stats = self._empty_early_exit_stats()
+        # Optional callable(frames_done, frames_total) in source frames, called
+        # as decoding advances. An exception it raises aborts the run.
+        self.progress = None
         print(f"✅ Model loaded: {MODEL_PATH}")
 
+    def settings_signature(self, window_hop: float = WINDOW_HOP) -> str:
+        """
+        Everything besides the video and the model that changes analysis
+        results: decode rate and backend, window hop and the motion gate
+        (off, or its calibrated thresholds). Part of the analysis cache key.
+        """
+        gate = self.motion_gate
+        gate_sig = "off" if not gate else f"{gate['threshold']!r}/{gate.get('coarse_threshold')!r}"
+        return "|".join(
+            [
+                decode_signature(
+                    self.decode_options.get("target_fps"),
+                    self.decode_options.get("frame_stride"),
+                    self.decode_options.get("decoder"),
+                ),
+                f"window_hop={window_hop!r}",
+                f"motion_gate={gate_sig}",
+            ]
+        )
+
     def predict(self, feature_vector):
         """Predicts a single shot label."""
         fv = np.array(feature_vector).flatten().reshape(1, -1)
@@ -87,73 +294,493 @@ class ShotDetector:
         Predicts a single shot label and confidence.
         Confidence is max class probability if supported by the model.
         """
-        fv = np.array(feature_vector).flatten().reshape(1, -1)
-        label = self.model.predict(fv)[0]
-        confidence = None
+        labels, confidences = self.predict_batch(np.array(feature_vector).reshape(1, -1))
+        return labels[0], confidences[0]
+
+    def predict_batch(self, feature_matrix, early_exit=None):
+        """
+        Classifies a (n_windows, n_features) matrix with a single
+        predict_proba call. Labels are the argmax class, confidences the max
+        probability; models without predict_proba fall back to predict()
+        with confidence None.
+        With early_exit (default self.early_exit) the flat forest stops per
+        window once its vote is decided. Labels are unchanged; confidences
+        become the lower bound of the max probability, and the trees
+        evaluated are counted in self.last_early_exit_stats.
+        Returns: (labels, confidences) as lists of length n_windows.
+        """
+        X = np.asarray(feature_matrix)
+        X = X.reshape(len(X), -1)
+        if len(X) == 0:
+            return [], []
+        if early_exit is None:
+            early_exit = self.early_exit
+
+        if early_exit and hasattr(self.model, "predict_early_exit"):
+            labels, confidences, _, trees = self.model.predict_early_exit(X)
+            stats = self.last_early_exit_stats
+            stats["windows"] += int(len(X))
+            stats["trees_evaluated"] += int(trees.sum())
+            stats["mean_trees"] = stats["trees_evaluated"] / stats["windows"]
+            stats["tree_fraction"] = stats["mean_trees"] / stats["n_trees"]
+            return list(labels), list(confidences.astype(float))
+
         if hasattr(self.model, "predict_proba"):
             try:
-                probs = self.model.predict_proba(fv)[0]
-                confidence = float(np.max(probs))
+                probs = self.model.predict_proba(X)
+                best = np.argmax(probs, axis=1)
+                labels = np.asarray(self.model.classes_).take(best)
+                confidences = probs[np.arange(len(X)), best].astype(float)
+                return list(labels), list(confidences)
             except Exception:
-                confidence = None
-        return label, confidence
+                pass
+        return list(self.model.predict(X)), [None] * len(X)
 
-    def analyze(self, video_path: str):
+    def _empty_early_exit_stats(self) -> dict:
+        return {
+            "enabled": self.early_exit,
+            "n_trees": int(getattr(self.model, "n_trees", 0)),
+            "windows": 0,
+            "trees_evaluated": 0,
+            "mean_trees": 0.0,
+            "tree_fraction": 0.0,
+        }
+
+    def _analysis_plan(self, video_path: str, target_fps=None, frame_stride=None, decoder=None,
+                       window_hop: float = WINDOW_HOP) -> dict:
         """
-        Baseline analyzer using sliding windows over motion features.
-        Returns: (predicted_labels, timestamps_sec, representative_keypoints, confidences)
+        Decode and window geometry for one analysis run. Decode rate and
+        decoder default to the ones the model was trained with.
         """
-        keypoint_seq = extract_keypoints_from_video(video_path)
-        if keypoint_seq is None or len(keypoint_seq) == 0:
-            return [], [], [], []
-
         cap = cv2.VideoCapture(video_path)
-        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        # A seek index from an earlier pass knows the real rate and length
+        # even when the container's metadata is missing or wrong.
+        index = load_seek_index(video_path)
+        source_fps = resolve_source_fps(cap.get(cv2.CAP_PROP_FPS), index, DEFAULT_FPS)
+        source_frames = index.frame_count if index else int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
         cap.release()
 
-        n_frames = len(keypoint_seq)
+        if target_fps is None and frame_stride is None:
+            target_fps = self.decode_options.get("target_fps")
+            frame_stride = self.decode_options.get("frame_stride")
+        stride_frames = resolve_frame_stride(source_fps, target_fps, frame_stride)
+        fps = source_fps / stride_frames
         window_frames = max(int(fps * 0.8), 8)
-        stride = max(window_frames // 2, 4)
+        return {
+            "source_fps": source_fps,
+            "source_frames": source_frames,
+            "stride_frames": stride_frames,
+            "fps": fps,
+            "decoder": decoder or self.decode_options.get("decoder"),
+            "window_frames": window_frames,
+            "stride": max(int(window_frames * window_hop), 1),
+        }
 
-        preds = []
-        timestamps = []
-        rep_keypoints = []
-        confidences = []
+    def _report_progress(self, frames_done: int, frames_total: int):
+        if self.progress is not None:
+            self.progress(int(frames_done), int(max(frames_total, frames_done)))
+
+    def _reset_run_stats(self, plan: dict):
+        self.last_decode_timings = {}
+        self.last_early_exit_stats = self._empty_early_exit_stats()
+        threshold = self.motion_gate["threshold"] if self.motion_gate else None
+        self.last_gate_stats = {
+            "enabled": threshold is not None,
+            "threshold": threshold,
+            "windows": 0,
+            "skipped": 0,
+            "skip_rate": 0.0,
+        }
+
+    def _span_batch(self, span, starts, plan: dict):
+        """window_batch() with this run's gate threshold, counted in last_gate_stats."""
+        batch = window_batch(span, starts, plan, self.last_gate_stats["threshold"])
+        self._count_gated(batch[3])
+        return batch
+
+    def _short_clip_batch(self, keypoint_seq, plan: dict):
+        """The single batch for a clip no longer than one window, or None."""
+        features = summarize_feature_sequence(keypoint_seq, target_frames=MODEL_FRAMES)
+        if features is None:
+            return None
+        threshold = self.last_gate_stats["threshold"]
+        n_frames = len(keypoint_seq)
+        active = np.array([
+            threshold is None or sequence_motion_energy(keypoint_seq) >= threshold
+        ])
+        self._count_gated(active)
+        return (
+            np.array([n_frames / 2.0 / plan["fps"]]),
+            np.array(keypoint_seq[n_frames // 2:n_frames // 2 + 1]),
+            np.asarray(features).reshape(1, -1)[active],
+            active,
+        )
+
+    def _iter_window_batches(
+        self,
+        video_path: str,
+        target_fps=None,
+        frame_stride=None,
+        chunk_frames: int = STREAM_CHUNK_FRAMES,
+        pipeline_workers: int = PIPELINE_WORKERS,
+        block_frames: int = BLOCK_FRAMES,
+        decoder=None,
+        window_hop: float = WINDOW_HOP,
+    ):
+        """
+        Decodes the video chunk by chunk and yields, per chunk,
+        (timestamps_sec, representative_keypoints, window_features, active)
+        for every window completed by that chunk. `active` marks the windows
+        that pass the motion gate; window_features holds only their rows,
+        shaped (n_active, MODEL_FRAMES * feature_dim). A clip no longer than one
+        window is yielded as a single batch at the end. Windows advance by
+        window_hop of their length; smaller hops cost little extra since all
+        windows of a chunk share one WindowFeatureEngine.
+        Decode rate and decoder default to the ones the model was trained with.
+        """
+        plan = self._analysis_plan(video_path, target_fps, frame_stride, decoder, window_hop)
+        ring = SlidingWindowBuffer(plan["window_frames"], plan["stride"])
+        self._reset_run_stats(plan)
 
-        if n_frames <= window_frames:
-            features = summarize_feature_sequence(
-                keypoint_seq, target_frames=MODEL_FRAMES
+        chunks = iter_keypoints_from_video(
+            video_path,
+            frame_stride=plan["stride_frames"],
+            chunk_size=chunk_frames,
+            pipeline_workers=pipeline_workers,
+            block_frames=block_frames,
+            decoder=plan["decoder"],
+            timings=self.last_decode_timings,
+            seek_index=SEEK_INDEX_ENABLED,
+        )
+        rows = 0
+        for chunk in chunks:
+            rows += len(chunk)
+            self._report_progress(rows * plan["stride_frames"], plan["source_frames"])
+            batch = ring.push_span(chunk)
+            if batch is not None:
+                yield self._span_batch(batch[1], batch[0], plan)
+
+        if 0 < ring.frames_seen <= plan["window_frames"]:
+            # Short clip: the buffer still holds every frame.
+            batch = self._short_clip_batch(ring.buffer, plan)
+            if batch is not None:
+                yield batch
+
+    def _count_gated(self, active: np.ndarray):
+        stats = self.last_gate_stats
+        stats["windows"] += int(len(active))
+        stats["skipped"] += int(len(active) - np.count_nonzero(active))
+        stats["skip_rate"] = stats["skipped"] / stats["windows"] if stats["windows"] else 0.0
+
+    def _classify_gated(self, features, active):
+        """predict_batch over the active windows; idle windows get label/confidence None."""
+        labels = [None] * len(active)
+        confidences = [None] * len(active)
+        if len(features):
+            active_labels, active_confidences = self.predict_batch(features)
+            for i, label, conf in zip(np.flatnonzero(active), active_labels, active_confidences):
+                labels[i] = label
+                confidences[i] = conf
+        return labels, confidences
+
+    def iter_events(
+        self,
+        video_path: str,
+        target_fps=None,
+        frame_stride=None,
+        chunk_frames: int = STREAM_CHUNK_FRAMES,
+        pipeline_workers: int = PIPELINE_WORKERS,
+        block_frames: int = BLOCK_FRAMES,
+        decoder=None,
+        window_hop: float = WINDOW_HOP,
+    ):
+        """
+        Streaming analyzer: decodes the video chunk by chunk and yields
+        (label, timestamp_sec, representative_keypoint, confidence) events as
+        soon as they are final, i.e. when the next window's label differs.
+        Only a ring buffer of about one window plus one chunk of per-frame
+        features is held, regardless of video length, and every chunk's
+        windows are classified with one predict_proba call. Windows below the
+        motion gate are never classified. Per-stage decode timings of the run
+        end up in self.last_decode_timings, gate threshold and skip rate in
+        self.last_gate_stats.
+        """
+        def classified():
+            for timestamps, keypoints, features, active in self._iter_window_batches(
+                video_path,
+                target_fps=target_fps,
+                frame_stride=frame_stride,
+                chunk_frames=chunk_frames,
+                pipeline_workers=pipeline_workers,
+                block_frames=block_frames,
+                decoder=decoder,
+                window_hop=window_hop,
+            ):
+                labels, confidences = self._classify_gated(features, active)
+                yield from zip(labels, timestamps, keypoints, confidences)
+
+        yield from merge_window_events(classified())
+
+    def analyze(
+        self,
+        video_path: str,
+        target_fps=None,
+        frame_stride=None,
+        decoder=None,
+        window_hop: float = WINDOW_HOP,
+    ):
+        """
+        Baseline analyzer using sliding windows over motion features.
+        Windows whose motion energy is below the calibrated gate are marked
+        idle; all remaining window features are stacked into one matrix and
+        classified with a single predict_proba call before consecutive
+        windows are merged.
+        Decodes at the model's training rate unless target_fps / frame_stride
+        are given.
+        Returns: (predicted_labels, timestamps_sec, representative_keypoints, confidences)
+        """
+        batches = list(
+            self._iter_window_batches(
+                video_path,
+                target_fps=target_fps,
+                frame_stride=frame_stride,
+                decoder=decoder,
+                window_hop=window_hop,
             )
-            if features is not None:
-                pred, conf = self.predict_with_confidence(features)
-                preds.append(pred)
-                timestamps.append(float(n_frames / 2.0 / fps))
-                rep_keypoints.append(keypoint_seq[n_frames // 2])
-                confidences.append(conf)
-            return preds, timestamps, rep_keypoints, confidences
-
-        for start in range(0, n_frames - window_frames + 1, stride):
-            end = start + window_frames
-            window_seq = keypoint_seq[start:end]
-            features = summarize_feature_sequence(
-                window_seq, target_frames=MODEL_FRAMES
+        )
+        return self._events_from_batch_groups([batches])
+
+    def analyze_two_pass(
+        self,
+        video_path: str,
+        target_fps=None,
+        frame_stride=None,
+        decoder=None,
+        window_hop: float = WINDOW_HOP,
+        padding_sec: float = RALLY_PADDING_SEC,
+    ):
+        """
+        Coarse-to-fine analyzer for long recordings. Pass 1 scans motion
+        activity between consecutive keyframes, decoding nothing else (see
+        scan_motion_activity); pass 2 seeks into each active
+        segment (padded by padding_sec) and runs the full-rate extraction and
+        window classification there only, so dead time between rallies is
+        never decoded at full rate. Windows keep the positions they have in
+        analyze(), so inside segments results are identical wherever the
+        segment seeks are frame-accurate (see analyze_parallel); runs are
+        not merged across segments.
+        Segments and timings end up in self.last_two_pass_stats.
+        Returns the same tuple as analyze().
+        """
+        plan = self._analysis_plan(video_path, target_fps, frame_stride, decoder, window_hop)
+        coarse_timings = {}
+        with timed_stage("coarse_scan") as stage:
+            times, energy = scan_motion_activity(
+                video_path, timings=coarse_timings, seek_index=SEEK_INDEX_ENABLED,
+            )
+            stage.frames += int(coarse_timings.get("frames", 0))
+        if len(energy) < 2:
+            # Too short to be worth a coarse pass.
+            return self.analyze(
+                video_path, target_fps=target_fps, frame_stride=frame_stride,
+                decoder=decoder, window_hop=window_hop,
             )
-            if features is None:
-                continue
 
-            pred, conf = self.predict_with_confidence(features)
-            mid = start + (window_frames // 2)
-            timestamp = float(mid / fps)
+        self._reset_run_stats(plan)
+        if self.motion_gate:
+            # Calibrated on the shot clips at keyframe distance; models
+            # trained before that fall back to the (far lower) fine threshold.
+            coarse_threshold = self.motion_gate.get("coarse_threshold") or self.motion_gate["threshold"]
+        else:
+            coarse_threshold = 0.5 * float(np.median(energy))
+        # Sample i covers the motion since the previous keyframe.
+        segments = find_active_segments(
+            times, energy >= coarse_threshold, sample_interval=np.diff(times, prepend=0.0),
+            padding_sec=padding_sec,
+        )
 
-            if preds and preds[-1] == pred:
-                # Merge consecutive identical windows to reduce duplicate events.
-                timestamps[-1] = timestamp
-                rep_keypoints[-1] = keypoint_seq[mid]
-                confidences[-1] = conf
+        fps = plan["fps"]
+        window_frames = plan["window_frames"]
+        stride = plan["stride"]
+        # Feature rows; aligned to the window stride so windows land where analyze() puts them.
+        row_ranges = []
+        for start_sec, end_sec in segments:
+            r0 = int(start_sec * fps) // stride * stride
+            r1 = max(int(np.ceil(end_sec * fps)), r0 + window_frames)
+            if row_ranges and r0 <= row_ranges[-1][1]:
+                row_ranges[-1][1] = max(row_ranges[-1][1], r1)
             else:
+                row_ranges.append([r0, r1])
+
+        groups = []
+        analyzed_rows = 0
+        # Progress counts the source frames of the segments to analyze.
+        total_frames = sum(r1 - r0 for r0, r1 in row_ranges) * plan["stride_frames"]
+        done_frames = 0
+        self._report_progress(0, total_frames)
+        for r0, r1 in row_ranges:
+            # Row r is the motion between decoded frames r and r + 1.
+            seq = extract_keypoints_from_video(
+                video_path,
+                frame_stride=plan["stride_frames"],
+                decoder=plan["decoder"],
+                timings=self.last_decode_timings,
+                start_frame=r0 * plan["stride_frames"],
+                end_frame=(r1 + 1) * plan["stride_frames"],
+            )
+            done_frames += (r1 - r0) * plan["stride_frames"]
+            self._report_progress(done_frames, total_frames)
+            if seq is None or len(seq) < window_frames:
+                continue
+            analyzed_rows += len(seq)
+            starts = r0 + np.arange(0, len(seq) - window_frames + 1, stride)
+            groups.append([self._span_batch(seq, starts, plan)])
+
+        duration_sec = (
+            plan["source_frames"] / plan["source_fps"] if plan["source_frames"] else float(times[-1])
+        )
+        self.last_two_pass_stats = {
+            "coarse_threshold": float(coarse_threshold),
+            "coarse_samples": int(len(energy)),
+            "coarse_decoded_frames": int(coarse_timings.get("frames", 0)),
+            "coarse_wall_sec": coarse_timings.get("wall", 0.0),
+            "segments": [(r0 / fps, r1 / fps) for r0, r1 in row_ranges],
+            "analyzed_sec": analyzed_rows / fps,
+            "duration_sec": duration_sec,
+            "analyzed_fraction": (analyzed_rows / fps) / duration_sec if duration_sec else 0.0,
+        }
+        return self._events_from_batch_groups(groups)
+
+    def analyze_parallel(
+        self,
+        video_path: str,
+        workers=None,
+        n_chunks=None,
+        target_fps=None,
+        frame_stride=None,
+        decoder=None,
+        window_hop: float = WINDOW_HOP,
+    ):
+        """
+        Splits one video into n_chunks (default: one per worker) time chunks
+        and extracts each in a separate worker process that seeks to its
+        start. Chunks overlap by one analysis window, and every window
+        belongs to the chunk it starts in, so the stitched windows are the
+        ones analyze() sees as long as each seek lands on its start frame.
+        That holds at a constant frame rate; at a variable one it takes a
+        seek index with measured timestamps (written by a full OpenCV
+        pass), which the seeks then resync to. They are classified with one
+        predict_proba call and merged with the same consecutive-label rule,
+        giving identical results.
+        Returns the same tuple as analyze().
+        """
+        workers = resolve_worker_count(workers, ANALYSIS_WORKERS)
+        n_chunks = int(n_chunks or workers)
+        plan = self._analysis_plan(video_path, target_fps, frame_stride, decoder, window_hop)
+        stride = plan["stride"]
+        total_rows = plan["source_frames"] // plan["stride_frames"] - 1
+        # Chunk length in feature rows, a whole number of window strides.
+        chunk_rows = -(-max(total_rows, 0) // max(n_chunks, 1))
+        chunk_rows = -(-chunk_rows // stride) * stride
+        if n_chunks <= 1 or chunk_rows < plan["window_frames"]:
+            return self.analyze(
+                video_path, target_fps=target_fps, frame_stride=frame_stride,
+                decoder=decoder, window_hop=window_hop,
+            )
+
+        self._reset_run_stats(plan)
+        threshold = self.last_gate_stats["threshold"]
+        bounds = [k * chunk_rows for k in range(-(-total_rows // chunk_rows))]
+        # The last chunk runs to the real end; the container frame count can be off.
+        jobs = [
+            (r0, bounds[i + 1] if i + 1 < len(bounds) else None) for i, r0 in enumerate(bounds)
+        ]
+
+        import multiprocessing
+        from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+        t0 = time.perf_counter()
+        frames_done = multiprocessing.Value("q", 0)
+        cancel = multiprocessing.Event()
+        pool = ProcessPoolExecutor(
+            max_workers=min(workers, len(jobs)),
+            initializer=_init_chunk_worker,
+            initargs=(frames_done, cancel),
+        )
+        try:
+            futures = {
+                pool.submit(_analyze_chunk_job, video_path, plan, r0, r_end, threshold): i
+                for i, (r0, r_end) in enumerate(jobs)
+            }
+            results = [None] * len(jobs)
+            pending = set(futures)
+            # Progress (and with it the job's cancellation check) follows the
+            # frames the workers decoded, not whole chunks: with one chunk
+            # per worker, every chunk finishes near the end of the run.
+            while pending:
+                done, pending = wait(pending, timeout=PARALLEL_POLL_SEC, return_when=FIRST_COMPLETED)
+                for future in done:
+                    results[futures[future]] = future.result()
+                self._report_progress(frames_done.value, plan["source_frames"])
+        except BaseException:
+            # Cancelled or failed: running chunks stop at their next streaming
+            # chunk, queued ones never start.
+            cancel.set()
+            pool.shutdown(wait=True, cancel_futures=True)
+            raise
+        pool.shutdown(wait=True)
+
+        batches = []
+        for batch, timings in results:
+            for key, value in timings.items():
+                if isinstance(value, (int, float)):
+                    self.last_decode_timings[key] = self.last_decode_timings.get(key, 0) + value
+                else:
+                    self.last_decode_timings[key] = value
+            if batch is not None:
+                self._count_gated(batch[3])
+                batches.append(batch)
+        # Per-stage times are summed over workers; wall is the parallel run.
+        self.last_decode_timings["wall"] = time.perf_counter() - t0
+        self.last_decode_timings["chunks"] = len(jobs)
+        self.last_decode_timings["workers"] = min(workers, len(jobs))
+        stage_timer = current_stage_timer()
+        if stage_timer is not None:
+            # Worker processes have no timer of their own; their summed times are reported here.
+            record_decode_stages(stage_timer, self.last_decode_timings, {}, self.last_decode_timings.get("frames", 0))
+        return self._events_from_batch_groups([batches])
+
+    def _events_from_batch_groups(self, groups):
+        """
+        Classifies the active windows of all groups with one predict_proba
+        call, then merges consecutive windows within each group.
+        Returns: (predicted_labels, timestamps_sec, representative_keypoints, confidences)
+        """
+        batches = [batch for group in groups for batch in group]
+        if not batches:
+            return [], [], [], []
+
+        active = np.concatenate([b[3] for b in batches])
+        # Frames of the classify stage are the windows classified.
+        with timed_stage("classify", frames=int(np.count_nonzero(active))):
+            labels, confidences = self._classify_gated(np.concatenate([b[2] for b in batches]), active)
+
+        preds = []
+        event_times = []
+        rep_keypoints = []
+        event_confidences = []
+        offset = 0
+        for group in groups:
+            n = sum(len(b[3]) for b in group)
+            timestamps = np.concatenate([b[0] for b in group])
+            keypoints = np.concatenate([b[1] for b in group])
+            for pred, timestamp, keypoint, conf in merge_window_events(
+                zip(labels[offset:offset + n], timestamps, keypoints, confidences[offset:offset + n])
+            ):
                 preds.append(pred)
-                timestamps.append(timestamp)
-                rep_keypoints.append(keypoint_seq[mid])
-                confidences.append(conf)
+                event_times.append(timestamp)
+                rep_keypoints.append(keypoint)
+                event_confidences.append(conf)
+            offset += n
 
-        return preds, timestamps, rep_keypoints, confidences
+        return preds, event_times, rep_keypoints, event_confidences
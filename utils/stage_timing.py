@@ -0,0 +1,149 @@
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, peak RSS and child CPU are not recorded.
+    resource = None
+
+_CURRENT = contextvars.ContextVar("padeledge_stage_timer", default=None)
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """High-water RSS of this process or its largest waited-for child, in MB (Linux reports KB)."""
+    if resource is None:
+        return None
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    return peak / 1024.0
+
+
+def _cpu_sec() -> float:
+    """CPU seconds of this process plus its finished children (e.g. a parallel analysis pool)."""
+    cpu = time.process_time()
+    if resource is not None:
+        children = resource.getrusage(resource.RUSAGE_CHILDREN)
+        cpu += children.ru_utime + children.ru_stime
+    return cpu
+
+
+class StageRecord:
+    """Totals of one named stage; frames can be added while the stage runs."""
+
+    def __init__(self):
+        self.wall_sec = 0.0
+        self.cpu_sec = None
+        self.frames = 0
+        self.calls = 0
+        self.peak_rss_mb = None
+
+    def as_dict(self) -> Dict:
+        return {
+            "wall_sec": round(self.wall_sec, 6),
+            "cpu_sec": None if self.cpu_sec is None else round(self.cpu_sec, 6),
+            "frames": int(self.frames),
+            "fps": round(self.frames / self.wall_sec, 2) if self.frames and self.wall_sec > 0 else None,
+            "peak_rss_mb": None if self.peak_rss_mb is None else round(self.peak_rss_mb, 1),
+            "calls": self.calls,
+        }
+
+
+class StageTimer:
+    """
+    Per-stage wall time, CPU time, frames, frames per second and peak RSS of
+    one analysis. Stages repeat (totals accumulate) and may nest; a parent
+    stage's time includes its children's. Peak RSS is the process high-water
+    mark at the end of the stage, not the stage's own growth.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, StageRecord] = {}
+
+    def _record(self, name: str) -> StageRecord:
+        if name not in self.stages:
+            self.stages[name] = StageRecord()
+        return self.stages[name]
+
+    @contextmanager
+    def stage(self, name: str, frames: int = 0):
+        record = self._record(name)
+        record.frames += int(frames)
+        wall0, cpu0 = time.perf_counter(), _cpu_sec()
+        try:
+            yield record
+        finally:
+            record.wall_sec += time.perf_counter() - wall0
+            record.cpu_sec = (record.cpu_sec or 0.0) + _cpu_sec() - cpu0
+            record.calls += 1
+            rss = _peak_rss_mb()
+            if rss is not None:
+                record.peak_rss_mb = max(record.peak_rss_mb or 0.0, rss)
+
+    def add(self, name: str, wall_sec: float, frames: int = 0, cpu_sec: Optional[float] = None):
+        """Adds a stage measured elsewhere (e.g. decode time summed inside a frame loop)."""
+        record = self._record(name)
+        record.wall_sec += float(wall_sec)
+        record.frames += int(frames)
+        if cpu_sec is not None:
+            record.cpu_sec = (record.cpu_sec or 0.0) + float(cpu_sec)
+        record.calls += 1
+        rss = _peak_rss_mb()
+        if rss is not None:
+            record.peak_rss_mb = max(record.peak_rss_mb or 0.0, rss)
+
+    def as_dict(self) -> Dict[str, Dict]:
+        return {name: record.as_dict() for name, record in self.stages.items()}
+
+
+@contextmanager
+def use_stage_timer(timer: StageTimer):
+    """Makes timer the one timed_stage() and current_stage_timer() report to in this context."""
+    token = _CURRENT.set(timer)
+    try:
+        yield timer
+    finally:
+        _CURRENT.reset(token)
+
+
+def current_stage_timer() -> Optional[StageTimer]:
+    return _CURRENT.get()
+
+
+@contextmanager
+def timed_stage(name: str, frames: int = 0):
+    """StageTimer.stage() on the current timer; a no-op record when none is active."""
+    timer = _CURRENT.get()
+    if timer is None:
+        yield StageRecord()
+        return
+    with timer.stage(name, frames) as record:
+        yield record
+
+
+def summarize_stage_timings(records: Iterable[Dict], quantiles=(50, 95)) -> List[Dict]:
+    """
+    Per stage over the `stages` of logged analysis records: number of runs
+    and the given percentiles of wall time, CPU time, fps and peak RSS.
+    """
+    by_stage: Dict[str, Dict[str, List[float]]] = {}
+    for record in records:
+        for name, stage in (record.get("stages") or {}).items():
+            values = by_stage.setdefault(name, {"wall_sec": [], "cpu_sec": [], "fps": [], "peak_rss_mb": []})
+            for key in values:
+                if stage.get(key) is not None:
+                    values[key].append(float(stage[key]))
+
+    rows = []
+    for name, values in sorted(by_stage.items()):
+        row = {"stage": name, "runs": len(values["wall_sec"])}
+        for key, samples in values.items():
+            for q in quantiles:
+                row[f"{key}_p{q}"] = float(np.percentile(samples, q)) if samples else None
+        rows.append(row)
+    return rows
@@ -1,19 +1,92 @@
 # utils/thumbnails.py
-import os, cv2
+import os
+from typing import List, Optional
+
+import cv2
+
+from utils.atomic_write import atomic_write
+from utils.file_hash import cached_file_sha256
+from utils.seek_index import iter_frames_at, load_seek_index, resolve_source_fps
+from utils.video_processor import DEFAULT_FPS
+
+# Thumbnails are shown at ~220 px; frames are downscaled before JPEG encoding.
+THUMBNAIL_WIDTH = int(os.getenv("PADELEDGE_THUMBNAIL_WIDTH", "320"))
+THUMBNAIL_JPEG_QUALITY = 85
+# Gaps longer than this are skipped with one forward seek instead of grabbing every frame.
+THUMBNAIL_SEEK_GAP_SEC = float(os.getenv("PADELEDGE_THUMBNAIL_SEEK_GAP_SEC", "20"))
+
+
+def _thumbnail_path(out_dir: str, video_sha256: str, frame_no: int, width: int) -> str:
+    return os.path.join(out_dir, video_sha256[:2], video_sha256, f"f{frame_no:08d}_w{width}.jpg")
+
+
+def _write_thumbnail(frame, out_path: str, width: int) -> Optional[str]:
+    h, w = frame.shape[:2]
+    if w > width:
+        frame = cv2.resize(frame, (width, max(int(round(h * width / w)), 1)), interpolation=cv2.INTER_AREA)
+    ok, buf = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, THUMBNAIL_JPEG_QUALITY])
+    if not ok:
+        return None
+    with atomic_write(out_path) as f:
+        f.write(buf.tobytes())
+    return out_path
+
+
+def extract_thumbnails(
+    video_path: str,
+    timestamps,
+    out_dir: str,
+    video_sha256: Optional[str] = None,
+    width: int = THUMBNAIL_WIDTH,
+) -> List[Optional[str]]:
+    """
+    Thumbnail paths for all timestamps of one video (None where the frame
+    could not be read), in the order given.
+    Thumbnails are written under out_dir in a per-video directory named by
+    the video's content hash, one file per frame number, so they never
+    collide across videos and ones already there are not decoded again.
+    The caller owns out_dir: analysis jobs use a temp directory and keep
+    the only copies in the analysis cache. Missing frames are read in one
+    sorted forward pass over a single capture (see iter_frames_at): with a
+    seek index the pass jumps to the keyframe before each target; without
+    one, frames in between are only grabbed and gaps longer than
+    THUMBNAIL_SEEK_GAP_SEC are skipped with a forward seek.
+    """
+    if not len(timestamps):
+        return []
+    video_sha256 = video_sha256 or cached_file_sha256(video_path)
+    if video_sha256 is None:
+        return [None] * len(timestamps)
 
-def extract_thumbnail(video_path, timestamp_sec, save_folder="data/thumbnails"):
-    os.makedirs(save_folder, exist_ok=True)
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
-        return None
-    fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
-    frame_no = int(timestamp_sec * fps)
-    cap.set(cv2.CAP_PROP_POS_FRAMES, frame_no)
-    ret, frame = cap.read()
-    if not ret:
+        return [None] * len(timestamps)
+    try:
+        index = load_seek_index(video_path)
+        fps = resolve_source_fps(cap.get(cv2.CAP_PROP_FPS), index, DEFAULT_FPS)
+        if index is not None:
+            frame_nos = [index.frame_at(ts) for ts in timestamps]
+        else:
+            frame_nos = [max(int(float(ts) * fps), 0) for ts in timestamps]
+
+        by_frame = {}
+        for frame_no in sorted(set(frame_nos)):
+            path = _thumbnail_path(out_dir, video_sha256, frame_no, width)
+            by_frame[frame_no] = path if os.path.exists(path) else None
+        missing = [frame_no for frame_no, path in by_frame.items() if path is None]
+
+        frames = iter_frames_at(
+            cap, missing, index=index, seek_gap_frames=max(int(THUMBNAIL_SEEK_GAP_SEC * fps), 1)
+        )
+        for frame_no, frame in frames:
+            by_frame[frame_no] = _write_thumbnail(
+                frame, _thumbnail_path(out_dir, video_sha256, frame_no, width), width
+            )
+    finally:
         cap.release()
-        return None
-    out_path = os.path.join(save_folder, f"thumb_{int(timestamp_sec*100)}.jpg")
-    cv2.imwrite(out_path, frame)
-    cap.release()
-    return out_path
+    return [by_frame[frame_no] for frame_no in frame_nos]
+
+
+def extract_thumbnail(video_path, timestamp_sec, save_folder="data/thumbnails"):
+    """Single-timestamp form of extract_thumbnails()."""
+    return extract_thumbnails(video_path, [timestamp_sec], save_folder)[0]
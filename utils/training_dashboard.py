@@ -6,7 +6,7 @@ import streamlit as st
 
 from utils.dataset_manager import get_dataset_overview, list_sample_videos
 from utils.model_versions import get_current_model_overview, list_model_versions
-from utils.metrics import load_metrics_summary
+from utils.metrics import load_metrics_summary, load_stage_latency_summary
 from utils.training_api import run_training_now, load_training_log
 from utils.labeling_ui import render_labeling_ui
 
@@ -27,6 +27,9 @@ def _render_overview():
         st.metric("Model tilgængelig", "Ja ✅" if model_info["exists"] else "Nej ❌")
         if model_info["path"]:
             st.caption(f"Path: `{model_info['path']}`")
+        if model_info["format"]:
+            mapped = f", {model_info['mapped_size']} mmap" if model_info["mapped_size"] else ""
+            st.caption(f"Format: `{model_info['format']}`{mapped}")
 
     with c2:
         if model_info["modified"]:
@@ -164,6 +167,8 @@ def _render_versions_tab():
                 "Name": v["name"],
                 "Modified": v["modified"].strftime("%Y-%m-%d %H:%M"),
                 "Size": v["size"],
+                "Format": v["format"],
+                "Mapped": v["mapped_size"] or "-",
                 "Path": v["path"],
             }
         )
@@ -221,6 +226,38 @@ def _render_training_tab():
     st.text_area("Auto-retrain log", auto_log, height=250)
 
 
+def _render_latency_tab():
+    st.subheader("⏱️ Analyse-latens pr. trin")
+    rows = load_stage_latency_summary()
+    if not rows:
+        st.info(
+            "Ingen tidsmålinger endnu. Hver analyse i Match Analyzer logger sine trin "
+            "til `data/analysis_logs/match_analyses.jsonl`."
+        )
+        return
+
+    df = pd.DataFrame(rows).rename(
+        columns={
+            "stage": "Trin",
+            "runs": "Kørsler",
+            "wall_sec_p50": "Wall p50 (s)",
+            "wall_sec_p95": "Wall p95 (s)",
+            "cpu_sec_p50": "CPU p50 (s)",
+            "cpu_sec_p95": "CPU p95 (s)",
+            "fps_p50": "Frames/s p50",
+            "fps_p95": "Frames/s p95",
+            "peak_rss_mb_p50": "Peak RSS p50 (MB)",
+            "peak_rss_mb_p95": "Peak RSS p95 (MB)",
+        }
+    )
+    st.dataframe(df, use_container_width=True)
+    st.caption(
+        "`analyze` dækker decode, features og classify, som også vises hver for sig. "
+        "Frames/s for `classify` er vinduer pr. sekund. Peak RSS er processens højeste "
+        "forbrug ved trinnets afslutning."
+    )
+
+
 def _render_active_learning_tab():
     st.subheader("🧠 Active Learning (V2 placeholder)")
     st.write(
@@ -252,6 +289,7 @@ def render_training_dashboard():
             "Labeling",
             "Versions",
             "Training",
+            "Latency",
             "Active Learning",
         ]
     )
@@ -269,4 +307,6 @@ def render_training_dashboard():
     with tabs[5]:
         _render_training_tab()
     with tabs[6]:
+        _render_latency_tab()
+    with tabs[7]:
         _render_active_learning_tab()
@@ -0,0 +1,96 @@
+import hashlib
+import os
+from typing import BinaryIO, Optional
+
+from utils.atomic_write import temp_file
+from utils.file_hash import cached_file_sha256, HASH_CHUNK_BYTES, remember_file_sha256
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+UPLOAD_CHUNK_BYTES = int(os.getenv("PADELEDGE_UPLOAD_CHUNK_BYTES", str(HASH_CHUNK_BYTES)))
+UPLOAD_DIR = os.getenv("PADELEDGE_UPLOAD_DIR", os.path.join(BASE_DIR, "data", "uploads"))
+
+
+class SavedUpload:
+    """Where an upload ended up, its content hash and whether an identical file was already there."""
+
+    def __init__(self, path: str, sha256: str, size: int, reused: bool):
+        self.path = path
+        self.sha256 = sha256
+        self.size = size
+        self.reused = reused
+
+
+def _stream_to_temp(fileobj: BinaryIO, directory: str, name: str, chunk_size: int):
+    """Copies the upload to a hidden .part file in directory; returns (tmp_path, sha256, size)."""
+    if hasattr(fileobj, "seek"):
+        fileobj.seek(0)
+
+    digest = hashlib.sha256()
+    size = 0
+    with temp_file(directory, prefix=f".{name}.", suffix=".part") as (f, tmp_path):
+        for chunk in iter(lambda: fileobj.read(chunk_size), b""):
+            digest.update(chunk)
+            f.write(chunk)
+            size += len(chunk)
+    return tmp_path, digest.hexdigest(), size
+
+
+def save_upload_stream(fileobj: BinaryIO, target_path: str, chunk_size: int = UPLOAD_CHUNK_BYTES) -> SavedUpload:
+    """
+    Copies a file-like upload to target_path in fixed-size chunks, hashing
+    each chunk as it is written, so the upload is never held in memory a
+    second time. Data goes to a hidden temp file in the target directory
+    that is renamed into place only once complete; readers of target_path
+    never see a partial file. If target_path already holds identical
+    content it is left untouched (reused=True).
+    The SHA-256 is registered with cached_file_sha256(), so caches keyed by
+    the video's content do not read it again.
+    """
+    target_dir = os.path.dirname(os.path.abspath(target_path))
+    tmp_path, sha256, size = _stream_to_temp(fileobj, target_dir, os.path.basename(target_path), chunk_size)
+    try:
+        if os.path.exists(target_path) and cached_file_sha256(target_path) == sha256:
+            os.remove(tmp_path)
+            return SavedUpload(target_path, sha256, size, reused=True)
+        os.replace(tmp_path, target_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    remember_file_sha256(target_path, sha256)
+    return SavedUpload(target_path, sha256, size, reused=False)
+
+
+def save_upload_by_content(
+    fileobj: BinaryIO,
+    filename: str,
+    upload_dir: Optional[str] = None,
+    chunk_size: int = UPLOAD_CHUNK_BYTES,
+) -> SavedUpload:
+    """
+    Like save_upload_stream, but stores the upload at
+    <upload_dir>/<sha256>/<filename>. A path there only ever holds one
+    content, so a later upload under the same name can never change a file
+    a queued or running analysis job reads. A copy of the same content
+    under the same name is reused.
+    """
+    upload_dir = os.path.abspath(upload_dir or UPLOAD_DIR)
+    filename = os.path.basename(filename)
+    tmp_path, sha256, size = _stream_to_temp(fileobj, upload_dir, filename, chunk_size)
+    target_path = os.path.join(upload_dir, sha256, filename)
+    try:
+        if os.path.exists(target_path):
+            os.remove(tmp_path)
+            reused = True
+        else:
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            os.replace(tmp_path, target_path)
+            reused = False
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    remember_file_sha256(target_path, sha256)
+    return SavedUpload(target_path, sha256, size, reused=reused)
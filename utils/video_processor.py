@@ -1,10 +1,719 @@
+import os
+import queue
+import threading
+import time
+from functools import lru_cache
+
 import cv2
 import numpy as np
 
+from utils.ffmpeg_decoder import FfmpegGrayReader, ffmpeg_available
+from utils.stage_timing import current_stage_timer
+from utils.seek_index import (
+    fps_plausible,
+    load_seek_index,
+    resolve_source_fps,
+    save_seek_index,
+    scan_seek_index,
+    seek_to_frame,
+    SeekIndexBuilder,
+)
+
 MODEL_FRAMES = 30
+# Bump whenever the per-frame descriptors change so cached features are invalidated.
+FEATURE_EXTRACTOR_VERSION = "motion-v1"
+DEFAULT_FPS = 25.0
+DECODERS = ("opencv", "ffmpeg")
+DECODER = os.getenv("PADELEDGE_DECODER", "auto")
+FRAME_SIZE = (256, 144)
+# Coarse activity scan (two-pass analysis): tiny frames at a few fps.
+COARSE_FRAME_SIZE = (64, 36)
+# Frame distance used to calibrate the coarse threshold on short shot clips;
+# keyframes of real recordings are at least this far apart.
+COARSE_PROBE_SEC = 0.5
+PIPELINE_QUEUE_SIZE = 32
+DEFAULT_BLOCK_FRAMES = 16
+_PIPELINE_DONE = object()
+
+
+def resolve_frame_stride(source_fps: float, target_fps=None, frame_stride=None) -> int:
+    """
+    Number of source frames per decoded frame. An explicit frame_stride wins;
+    otherwise target_fps is approximated by the nearest integer stride and
+    never upsamples.
+    """
+    if frame_stride:
+        return max(int(frame_stride), 1)
+    if target_fps and source_fps and float(target_fps) < float(source_fps):
+        return max(int(round(float(source_fps) / float(target_fps))), 1)
+    return 1
+
+
+def decode_signature(target_fps=None, frame_stride=None, decoder=None) -> str:
+    """Stable description of decode settings, used in cache keys."""
+    return f"target_fps={target_fps}|frame_stride={frame_stride}|decoder={resolve_decoder(decoder)}"
+
+
+def _frame_motion_features(gray: np.ndarray, prev: np.ndarray) -> np.ndarray:
+    """19 motion descriptors for one frame: mean, max, std and 16-bin histogram of |gray - prev|."""
+    diff = cv2.absdiff(gray, prev)
+
+    # Feature extraction (simple motion descriptors)
+    mean_motion = np.mean(diff)
+    max_motion = np.max(diff)
+    std_motion = np.std(diff)
+
+    # Histogram-based motion
+    hist = cv2.calcHist([diff.astype("uint8")], [0], None, [16], [0, 256])
+    hist = hist.flatten()
+
+    return np.concatenate([[mean_motion, max_motion, std_motion], hist])
+
+
+def _add_timing(timings, stage: str, seconds: float):
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+def _preprocess_frame(frame: np.ndarray) -> np.ndarray:
+    # Resize for speed + consistency
+    frame = cv2.resize(frame, FRAME_SIZE)
+
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return gray.astype("float32")
+
+
+def _iter_decoded_frames(cap, stride: int, timings=None, reuse_buffer=False, index_builder=None):
+    """
+    Yields every stride-th BGR frame; the frames in between are only grabbed.
+    With reuse_buffer the same array is decoded into every time, so each
+    frame is only valid until the next one is requested. An index_builder
+    records every read or grabbed frame's keyframe flag and timestamp.
+    """
+    exhausted = False
+    frame = None
+    while not exhausted:
+        t0 = time.perf_counter()
+        ret, frame = cap.read(frame if reuse_buffer else None)
+        if ret:
+            if index_builder is not None:
+                index_builder.add(cap)
+            for _ in range(stride - 1):
+                if not cap.grab():
+                    exhausted = True
+                    break
+                if index_builder is not None:
+                    index_builder.add(cap)
+        _add_timing(timings, "decode", time.perf_counter() - t0)
+        if not ret:
+            break
+        yield frame
+
+
+class _OpenCVGraySource:
+    """Gray-frame source backed by cv2.VideoCapture plus resize/cvtColor."""
 
+    def __init__(self, cap, stride: int, timings=None, size=FRAME_SIZE, index_builder=None):
+        self._frames = _iter_decoded_frames(
+            cap, stride, timings, reuse_buffer=True, index_builder=index_builder
+        )
+        self._timings = timings
+        self._size = tuple(size)
+        width, height = self._size
+        self._small = np.empty((height, width, 3), dtype=np.uint8)
 
-def extract_keypoints_from_video(video_path: str):
+    def read_into(self, out: np.ndarray) -> bool:
+        frame = next(self._frames, None)
+        if frame is None:
+            return False
+        t0 = time.perf_counter()
+        # Resize for speed + consistency
+        cv2.resize(frame, self._size, dst=self._small)
+        cv2.cvtColor(self._small, cv2.COLOR_BGR2GRAY, dst=out)
+        _add_timing(self._timings, "preprocess", time.perf_counter() - t0)
+        return True
+
+
+class _FfmpegGraySource:
+    """Gray-frame source reading already scaled gray frames from an ffmpeg pipe."""
+
+    def __init__(self, reader: FfmpegGrayReader, timings=None):
+        self._reader = reader
+        self._timings = timings
+
+    def read_into(self, out: np.ndarray) -> bool:
+        t0 = time.perf_counter()
+        ok = self._reader.read_into(out)
+        _add_timing(self._timings, "decode", time.perf_counter() - t0)
+        return ok
+
+
+def _iter_serial_features(source, timings=None):
+    width, height = FRAME_SIZE
+    frame = np.empty((height, width), dtype=np.uint8)
+    prev = None
+    while source.read_into(frame):
+        gray = frame.astype("float32")
+
+        if prev is None:
+            prev = gray
+            continue
+
+        t0 = time.perf_counter()
+        vec = _frame_motion_features(gray, prev)
+        _add_timing(timings, "features", time.perf_counter() - t0)
+        prev = gray
+        yield vec
+
+
+def _block_motion_features(block: np.ndarray, diff: np.ndarray, levels: np.ndarray, n: int) -> np.ndarray:
+    """
+    Motion descriptors for frames 1..n of a (block_frames + 1, H, W) uint8
+    block, each against its predecessor, in a handful of vectorized passes:
+    one integer absdiff over the whole block, then one bincount giving every
+    frame's full 256-level histogram, from which max, mean, std and the
+    16-bin histogram follow exactly or in float64.
+
+    Matches _frame_motion_features within rtol=1e-5 / atol=1e-4 (max and
+    histogram are exact; only the float32 rounding of mean/std differs).
+    """
+    h, w = block.shape[1:]
+    n_pixels = h * w
+    cur = block[1:n + 1].reshape(n * h, w)
+    prev = block[:n].reshape(n * h, w)
+    d = diff[:n].reshape(n * h, w)
+    cv2.absdiff(cur, prev, dst=d)
+
+    # Offset each frame into its own 256-bin range so one bincount covers the block.
+    lv = levels[:n]
+    offsets = (np.arange(n, dtype=levels.dtype) * 256)[:, None]
+    np.add(d.reshape(n, n_pixels), offsets, out=lv, casting="unsafe")
+    counts = np.bincount(lv.ravel(), minlength=n * 256).reshape(n, 256)
+
+    values = np.arange(256, dtype=np.float64)
+    mean = counts @ values / n_pixels
+    var = np.maximum(counts @ (values * values) / n_pixels - mean * mean, 0.0)
+    max_motion = 255 - np.argmax(counts[:, ::-1] > 0, axis=1)
+
+    out = np.empty((n, 19), dtype=np.float32)
+    out[:, 0] = mean
+    out[:, 1] = max_motion
+    out[:, 2] = np.sqrt(var)
+    out[:, 3:] = counts.reshape(n, 16, 16).sum(axis=2)
+    return out
+
+
+def _iter_block_features(source, block_frames: int, timings=None):
+    """
+    Decodes block_frames frames at a time into one preallocated uint8 gray
+    array (the previous block's last frame is carried over as row 0) and
+    computes their descriptors together. Buffers are reused across blocks.
+    """
+    width, height = FRAME_SIZE
+    block = np.empty((block_frames + 1, height, width), dtype=np.uint8)
+    diff = np.empty((block_frames, height, width), dtype=np.uint8)
+    levels_dtype = np.uint16 if block_frames <= 256 else np.uint32
+    levels = np.empty((block_frames, height * width), dtype=levels_dtype)
+    filled = 0  # rows of `block` holding decoded frames
+
+    def _flush(n):
+        t0 = time.perf_counter()
+        out = _block_motion_features(block, diff, levels, n)
+        _add_timing(timings, "features", time.perf_counter() - t0)
+        return out
+
+    # Sources write each decoded gray frame straight into its block row.
+    while source.read_into(block[filled]):
+        filled += 1
+
+        if filled == block_frames + 1:
+            yield _flush(block_frames)
+            block[0] = block[block_frames]
+            filled = 1
+
+    if filled > 1:
+        yield _flush(filled - 1)
+
+
+def _iter_pipelined_features(cap, stride: int, workers: int, timings=None, queue_size=PIPELINE_QUEUE_SIZE,
+                             index_builder=None):
+    """
+    Decoder thread -> bounded queue -> `workers` preprocessing threads ->
+    in-order frame differencing on the calling thread. OpenCV releases the
+    GIL in read/resize/cvtColor, so decoding overlaps with preprocessing.
+    Output is identical to the serial path. Stage times are busy time summed
+    over the threads running that stage.
+    """
+    frame_q = queue.Queue(maxsize=queue_size)
+    gray_q = queue.Queue(maxsize=queue_size + workers)
+    stop = threading.Event()
+    lock = threading.Lock()
+    errors = []
+
+    def _put(q, item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _decode():
+        local = {}
+        try:
+            for idx, frame in enumerate(_iter_decoded_frames(cap, stride, local, index_builder=index_builder)):
+                if not _put(frame_q, (idx, frame)):
+                    break
+        except Exception as e:
+            errors.append(e)
+        finally:
+            with lock:
+                _add_timing(timings, "decode", local.get("decode", 0.0))
+            for _ in range(workers):
+                _put(frame_q, _PIPELINE_DONE)
+
+    def _preprocess():
+        busy = 0.0
+        try:
+            while not stop.is_set():
+                try:
+                    item = frame_q.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is _PIPELINE_DONE:
+                    break
+                idx, frame = item
+                t0 = time.perf_counter()
+                gray = _preprocess_frame(frame)
+                busy += time.perf_counter() - t0
+                if not _put(gray_q, (idx, gray)):
+                    break
+        except Exception as e:
+            errors.append(e)
+        finally:
+            with lock:
+                _add_timing(timings, "preprocess", busy)
+            _put(gray_q, _PIPELINE_DONE)
+
+    threads = [threading.Thread(target=_decode, daemon=True)]
+    threads += [threading.Thread(target=_preprocess, daemon=True) for _ in range(workers)]
+    for t in threads:
+        t.start()
+
+    pending = {}
+    next_idx = 0
+    finished_workers = 0
+    prev = None
+    try:
+        while True:
+            if next_idx not in pending:
+                if finished_workers == workers:
+                    break
+                item = gray_q.get()
+                if item is _PIPELINE_DONE:
+                    finished_workers += 1
+                else:
+                    pending[item[0]] = item[1]
+                continue
+
+            gray = pending.pop(next_idx)
+            next_idx += 1
+            if prev is None:
+                prev = gray
+                continue
+
+            t0 = time.perf_counter()
+            vec = _frame_motion_features(gray, prev)
+            _add_timing(timings, "features", time.perf_counter() - t0)
+            prev = gray
+            yield vec
+
+        if errors:
+            raise errors[0]
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+
+
+def resolve_decoder(decoder=None) -> str:
+    """
+    Concrete decoder backend for a requested one: "ffmpeg", "opencv", or
+    "auto" (ffmpeg when the binary is on PATH, else OpenCV).
+    """
+    decoder = (decoder or DECODER).lower()
+    if decoder == "auto":
+        return "ffmpeg" if ffmpeg_available() else "opencv"
+    if decoder not in DECODERS:
+        raise ValueError(f"Unknown decoder: {decoder!r} (expected one of {DECODERS + ('auto',)})")
+    return decoder
+
+
+def _iter_source_features(source, block_frames: int, timings=None):
+    if block_frames and block_frames > 0:
+        return _iter_block_features(source, int(block_frames), timings)
+    return _iter_serial_features(source, timings)
+
+
+def _ffmpeg_seek_sec(start_frame: int, source_fps: float, index=None):
+    """
+    ffmpeg -ss time of source frame start_frame, half a frame early so float
+    rounding can never skip it. Uses the frame's own timestamp from a seek
+    index when there is one, so variable frame rate video lands on the same
+    frame; start_frame / fps only holds at a constant rate.
+    """
+    if start_frame <= 0:
+        return None
+    if index is not None and index.timestamps_measured and start_frame < index.frame_count:
+        pts = index.pts_sec
+        return float(pts[start_frame] - 0.5 * (pts[start_frame] - pts[start_frame - 1]))
+    return (start_frame - 0.5) / source_fps
+
+
+def _iter_ffmpeg_features(
+    video_path: str,
+    stride: int,
+    block_frames: int,
+    timings=None,
+    start_sec=None,
+    max_frames=None,
+):
+    """
+    Yields features decoded through ffmpeg. Returns True when ffmpeg handled
+    the video (even if it had no frames), False when it failed before
+    producing anything so the caller can fall back to OpenCV.
+    """
+    try:
+        reader = FfmpegGrayReader(
+            video_path, FRAME_SIZE, frame_stride=stride, start_sec=start_sec, max_frames=max_frames
+        )
+    except OSError as e:
+        print("⚠️ Could not start ffmpeg, falling back to OpenCV:", e)
+        return False
+
+    produced = 0
+    exhausted = False
+    frames = _iter_source_features(_FfmpegGraySource(reader, timings), block_frames, timings)
+    try:
+        for item in frames:
+            produced += 1
+            yield item
+        exhausted = True
+    finally:
+        frames.close()
+        # Closing early kills ffmpeg, so its exit code only means something after a full read.
+        returncode = reader.close()
+
+    if exhausted and returncode != 0:
+        if produced == 0:
+            print("⚠️ ffmpeg could not decode video, falling back to OpenCV:", reader.error)
+            return False
+        print(
+            f"⚠️ ffmpeg failed after {produced} frames of {video_path}; features are truncated:",
+            reader.error,
+        )
+    return True
+
+
+def _iter_opencv_features(cap, stride: int, pipeline_workers: int, block_frames: int, timings=None,
+                          index_builder=None):
+    if block_frames and block_frames > 0:
+        source = _OpenCVGraySource(cap, stride, timings, index_builder=index_builder)
+        frames = _iter_block_features(source, int(block_frames), timings)
+    elif pipeline_workers and pipeline_workers > 0:
+        frames = _iter_pipelined_features(
+            cap, stride, int(pipeline_workers), timings, index_builder=index_builder
+        )
+    else:
+        source = _OpenCVGraySource(cap, stride, timings, index_builder=index_builder)
+        frames = _iter_serial_features(source, timings)
+
+    try:
+        yield from frames
+    finally:
+        frames.close()
+        cap.release()
+
+
+def _iter_decoded_features(
+    video_path,
+    cap,
+    decoder,
+    stride,
+    pipeline_workers,
+    block_frames,
+    timings=None,
+    start_frame: int = 0,
+    max_frames=None,
+    source_fps: float = DEFAULT_FPS,
+    index_builder=None,
+    index=None,
+):
+    if decoder == "ffmpeg":
+        # The ffmpeg process already decodes concurrently with us, so the
+        # thread pipeline does not apply; `cap` was only needed for metadata.
+        cap.release()
+        if timings is not None:
+            timings["decoder"] = "ffmpeg"
+        handled = yield from _iter_ffmpeg_features(
+            video_path,
+            stride,
+            block_frames,
+            timings,
+            start_sec=_ffmpeg_seek_sec(start_frame, source_fps, index),
+            max_frames=max_frames,
+        )
+        if handled:
+            return
+        cap = cv2.VideoCapture(video_path)
+
+    if timings is not None:
+        timings["decoder"] = "opencv"
+    seek_to_frame(cap, start_frame, index)
+    yield from _iter_opencv_features(
+        cap, stride, pipeline_workers, block_frames, timings, index_builder=index_builder
+    )
+
+
+def _iter_frame_features(
+    video_path: str,
+    target_fps=None,
+    frame_stride=None,
+    pipeline_workers: int = 0,
+    block_frames: int = 0,
+    decoder=None,
+    timings=None,
+    start_frame: int = 0,
+    end_frame=None,
+    seek_index: bool = False,
+):
+    """
+    Yields per-frame vectors, or (n, feature_dim) blocks when block_frames > 0.
+    With start_frame / end_frame only source frames in [start_frame, end_frame)
+    are decoded (every stride-th one, counting from start_frame).
+    With seek_index, a full pass over a video without a valid seek index
+    persists one once the last frame has been decoded.
+    """
+    if pipeline_workers and block_frames:
+        raise ValueError("pipeline_workers and block_frames are mutually exclusive")
+
+    decoder = resolve_decoder(decoder)
+    if decoder == "ffmpeg" and not ffmpeg_available():
+        print("⚠️ ffmpeg not found, falling back to OpenCV decoder")
+        decoder = "opencv"
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print("❌ Could not open video:", video_path)
+        return
+
+    # Decode and feature time are summed inside the frame loops, so an active
+    # stage timer gets them from the per-run timings rather than a wrapper.
+    stage_timer = current_stage_timer()
+    if stage_timer is not None and timings is None:
+        timings = {}
+    timings_before = dict(timings) if timings is not None else {}
+
+    start_frame = max(int(start_frame or 0), 0)
+    container_fps = cap.get(cv2.CAP_PROP_FPS)
+    # Looking up the index hashes the whole file, so a pass from frame 0 of
+    # a video with a usable rate starts decoding without it.
+    index = None
+    if start_frame > 0 or not fps_plausible(container_fps):
+        index = load_seek_index(video_path)
+    source_fps = resolve_source_fps(container_fps, index, DEFAULT_FPS)
+    stride = resolve_frame_stride(source_fps, target_fps, frame_stride)
+    index_builder = None
+    if seek_index and index is None and start_frame == 0 and end_frame is None:
+        index_builder = SeekIndexBuilder(container_fps)
+    max_frames = None
+    max_rows = None
+    if end_frame is not None:
+        max_frames = max(-(-(int(end_frame) - start_frame) // stride), 0)
+        # The first decoded frame only serves as `prev` for the second.
+        max_rows = max(max_frames - 1, 0)
+    frames = _iter_decoded_features(
+        video_path,
+        cap,
+        decoder,
+        stride,
+        pipeline_workers,
+        block_frames,
+        timings,
+        start_frame=start_frame,
+        max_frames=max_frames,
+        source_fps=source_fps,
+        index_builder=index_builder,
+        index=index,
+    )
+
+    t_start = time.perf_counter()
+    n_frames = 0
+    completed = False
+    try:
+        for item in frames:
+            if max_rows is not None:
+                if n_frames >= max_rows:
+                    break
+                if item.ndim == 2 and n_frames + len(item) > max_rows:
+                    item = item[:max_rows - n_frames]
+            n_frames += len(item) if item.ndim == 2 else 1
+            yield item
+        completed = True
+    finally:
+        # Runs on exhaustion and when a consumer closes the generator early.
+        frames.close()
+        cap.release()
+        if completed and index_builder is not None:
+            _persist_seek_index(video_path, index_builder)
+        if timings is not None:
+            timings["frames"] = timings.get("frames", 0) + n_frames
+            _add_timing(timings, "wall", time.perf_counter() - t_start)
+        if stage_timer is not None:
+            record_decode_stages(stage_timer, timings, timings_before, n_frames)
+
+
+def record_decode_stages(stage_timer, timings: dict, timings_before: dict, n_frames: int):
+    """Adds the decode (incl. preprocess) and feature time accrued since timings_before to stage_timer."""
+    def delta(key):
+        return timings.get(key, 0.0) - timings_before.get(key, 0.0)
+
+    stage_timer.add("decode", delta("decode") + delta("preprocess"), frames=n_frames)
+    stage_timer.add("features", delta("features"), frames=n_frames)
+
+
+def _persist_seek_index(video_path: str, index_builder: SeekIndexBuilder):
+    """
+    Saves the index collected during a completed decode pass, unless the
+    video already has one. When the pass did not go through
+    cv2.VideoCapture (ffmpeg), the keyframes come from a packet scan that
+    does not decode anything.
+    """
+    try:
+        if load_seek_index(video_path) is not None:
+            return
+        index = index_builder.build(video_path) or scan_seek_index(video_path)
+        if index is not None:
+            save_seek_index(index, video_path)
+    except Exception as e:
+        print("⚠️ Could not write seek index:", e)
+
+
+def iter_keypoints_from_video(
+    video_path: str,
+    target_fps=None,
+    frame_stride=None,
+    chunk_size=None,
+    pipeline_workers: int = 0,
+    block_frames: int = 0,
+    decoder=None,
+    timings=None,
+    start_frame: int = 0,
+    end_frame=None,
+    seek_index: bool = False,
+):
+    """
+    Streaming counterpart of extract_keypoints_from_video.
+
+    Yields one (feature_dim,) vector per frame, or with chunk_size a
+    (<= chunk_size, feature_dim) array per chunk, as soon as the frames are
+    decoded. Nothing is yielded for unreadable videos.
+
+    pipeline_workers > 0 decodes on a background thread and preprocesses on
+    that many worker threads. block_frames > 0 instead decodes that many
+    frames into a preallocated uint8 block and computes their descriptors
+    with vectorized NumPy (see _block_motion_features for the tolerance
+    against the per-frame path).
+
+    decoder picks the backend: "opencv", "ffmpeg" (scale + gray inside an
+    ffmpeg process, see utils.ffmpeg_decoder) or "auto" / None (ffmpeg when
+    available, PADELEDGE_DECODER overrides). ffmpeg falls back to OpenCV
+    when it is missing or fails. The backends resize differently, so models
+    should be used with the decoder they were trained with.
+
+    If a dict is passed as `timings`, busy seconds per stage ("decode",
+    "preprocess", "features"), "wall", "frames" and the "decoder" actually
+    used are recorded in it.
+
+    start_frame / end_frame restrict decoding to the source frames in
+    [start_frame, end_frame); the video is seeked, not decoded up to the
+    start. Rows then describe the motion between consecutive decoded frames
+    of that range, so a range starting at stride * k yields exactly rows
+    k .. of the full-video output.
+
+    seek_index=True makes a full pass also record every frame's timestamp
+    and keyframe flag and persist them under the video's content hash (see
+    utils.seek_index), unless a valid index already exists. Seeked ranges
+    and videos with a missing or absurd container rate take the frame rate
+    from a persisted index.
+    """
+    frames = _iter_frame_features(
+        video_path,
+        target_fps=target_fps,
+        frame_stride=frame_stride,
+        pipeline_workers=pipeline_workers,
+        block_frames=block_frames,
+        decoder=decoder,
+        timings=timings,
+        start_frame=start_frame,
+        end_frame=end_frame,
+        seek_index=seek_index,
+    )
+    if block_frames:
+        yield from _rechunk_blocks(frames, chunk_size)
+        return
+
+    if not chunk_size:
+        yield from frames
+        return
+
+    chunk = []
+    for vec in frames:
+        chunk.append(vec)
+        if len(chunk) >= chunk_size:
+            yield np.array(chunk)
+            chunk = []
+    if chunk:
+        yield np.array(chunk)
+
+
+def _rechunk_blocks(blocks, chunk_size=None):
+    """Re-slices (n, dim) blocks into per-frame rows or chunk_size-row arrays."""
+    if not chunk_size:
+        for block in blocks:
+            yield from block
+        return
+
+    pending = []
+    pending_rows = 0
+    for block in blocks:
+        pending.append(block)
+        pending_rows += len(block)
+        if pending_rows < chunk_size:
+            continue
+        merged = np.concatenate(pending)
+        n_full = len(merged) // chunk_size * chunk_size
+        for i in range(0, n_full, chunk_size):
+            yield merged[i:i + chunk_size]
+        pending = [merged[n_full:]]
+        pending_rows = len(pending[0])
+    if pending_rows:
+        yield np.concatenate(pending)
+
+
+def extract_keypoints_from_video(
+    video_path: str,
+    target_fps=None,
+    frame_stride=None,
+    pipeline_workers: int = 0,
+    block_frames: int = 0,
+    decoder=None,
+    timings=None,
+    start_frame: int = 0,
+    end_frame=None,
+    seek_index: bool = False,
+):
     """
     Mediapipe-free version.
     Extracts extremely lightweight motion+pose proxy features.
@@ -15,53 +724,278 @@ def extract_keypoints_from_video(video_path: str):
     - Computes frame differences
     - Extracts simple movement statistics per frame
     - Returns a (num_frames, feature_dim) numpy array
+
+    With target_fps / frame_stride only every stride-th frame is decoded;
+    skipped frames are grab()bed so they are never converted to BGR.
+    See iter_keypoints_from_video for pipeline_workers, block_frames, decoder,
+    timings, the start_frame / end_frame range and seek_index.
     """
+    feature_list = list(
+        iter_keypoints_from_video(
+            video_path,
+            target_fps=target_fps,
+            frame_stride=frame_stride,
+            pipeline_workers=pipeline_workers,
+            block_frames=block_frames,
+            decoder=decoder,
+            timings=timings,
+            start_frame=start_frame,
+            end_frame=end_frame,
+            seek_index=seek_index,
+        )
+    )
+
+    if len(feature_list) == 0:
+        return None
+
+    return np.array(feature_list)
+
+
+def _iter_opencv_keyframes(cap, keyframes, size, timings=None):
+    """
+    Gray keyframes at `size` through cv2.VideoCapture. OpenCV cannot skip
+    decoding, so the frames in between are still grabbed; only keyframes
+    are retrieved and converted. The yielded array is reused.
+    """
+    width, height = size
+    small = np.empty((height, width, 3), dtype=np.uint8)
+    gray = np.empty((height, width), dtype=np.uint8)
+    frame = None
+    position = 0  # frames grabbed so far
+    for keyframe in keyframes:
+        t0 = time.perf_counter()
+        ok = True
+        while ok and position <= keyframe:
+            ok = cap.grab()
+            position += 1
+        if ok:
+            ok, frame = cap.retrieve(frame)
+        _add_timing(timings, "decode", time.perf_counter() - t0)
+        if not ok:
+            break
+        # Area averaging, like ffmpeg's downscale, so both backends agree.
+        cv2.resize(frame, tuple(size), dst=small, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(small, cv2.COLOR_BGR2GRAY, dst=gray)
+        yield gray
+    _add_timing(timings, "frames", position)
 
+
+def _iter_ffmpeg_keyframes(reader: FfmpegGrayReader, n_keyframes: int, timings=None):
+    """Gray keyframes from a keyframes_only reader, at most n_keyframes; the yielded array is reused."""
+    gray = np.empty((reader.height, reader.width), dtype=np.uint8)
+    produced = 0
+    while produced < n_keyframes:
+        t0 = time.perf_counter()
+        ok = reader.read_into(gray)
+        _add_timing(timings, "decode", time.perf_counter() - t0)
+        if not ok:
+            break
+        produced += 1
+        yield gray
+    _add_timing(timings, "frames", produced)
+
+
+def _coarse_energy(gray: np.ndarray, prev: np.ndarray, diff: np.ndarray) -> float:
+    cv2.absdiff(gray, prev, dst=diff)
+    mean, std = cv2.meanStdDev(diff)
+    return float(mean[0, 0] + std[0, 0])
+
+
+def clip_coarse_energy(video_path: str, probe_sec: float = COARSE_PROBE_SEC, size=COARSE_FRAME_SIZE):
+    """
+    Coarse-scan energy (see scan_motion_activity) a short shot clip is sure
+    to reach: for every phase, the highest energy between frames probe_sec
+    apart, then the lowest of those over all phases, since the recording's
+    keyframes can fall anywhere in the shot. None when the clip is shorter
+    than probe_sec.
+    """
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
-        print("❌ Could not open video:", video_path)
         return None
+    fps = resolve_source_fps(cap.get(cv2.CAP_PROP_FPS), None, DEFAULT_FPS)
+    width, height = size
+    frames = []
+    try:
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            small = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+            frames.append(cv2.cvtColor(small, cv2.COLOR_BGR2GRAY))
+    finally:
+        cap.release()
+    gap = max(int(round(probe_sec * fps)), 1)
+    if len(frames) <= gap:
+        return None
+    diff = np.empty((height, width), dtype=np.uint8)
+    energy = [_coarse_energy(frames[i], frames[i - gap], diff) for i in range(gap, len(frames))]
+    return float(min(max(energy[phase::gap]) for phase in range(min(gap, len(energy)))))
 
-    prev = None
-    feature_list = []
 
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
+def scan_motion_activity(
+    video_path: str,
+    size=COARSE_FRAME_SIZE,
+    decoder=None,
+    timings=None,
+    seek_index: bool = False,
+):
+    """
+    Cheap first pass for long videos: decodes only the keyframes, as tiny
+    gray frames, and returns (timestamps_sec, energy). energy[i] is mean +
+    std of |gray - prev| between keyframes i and i + 1, i.e. the same two
+    descriptors the motion gate uses, at coarse resolution;
+    timestamps_sec[i] is the time of keyframe i + 1 (keyframe 0 is frame 0).
 
-        # Resize for speed + consistency
-        frame = cv2.resize(frame, (256, 144))
+    Keyframe positions come from the persisted seek index or a packet scan,
+    neither of which decodes anything. ffmpeg skips all other frames inside
+    the decoder; OpenCV cannot, so there every frame is still grabbed but
+    only keyframes are converted. The coarse energies never reach the
+    model, so ffmpeg is used whenever it is available unless decoder is
+    "opencv". With seek_index a scanned index is persisted.
+    """
+    t_start = time.perf_counter()
+    index = load_seek_index(video_path)
+    scanned = index is None
+    if scanned:
+        index = scan_seek_index(video_path)
+    cap = cv2.VideoCapture(video_path)
+    if index is None or not cap.isOpened():
+        cap.release()
+        print("❌ Could not open video:", video_path)
+        return np.zeros(0), np.zeros(0)
+    source_fps = resolve_source_fps(cap.get(cv2.CAP_PROP_FPS), index, DEFAULT_FPS)
+    keyframes = index.keyframes
 
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        gray = gray.astype("float32")
+    reader = None
+    if decoder != "opencv" and ffmpeg_available():
+        cap.release()
+        reader = FfmpegGrayReader(video_path, size, keyframes_only=True)
+        frames = _iter_ffmpeg_keyframes(reader, len(keyframes), timings)
+    else:
+        frames = _iter_opencv_keyframes(cap, keyframes, size, timings)
 
-        if prev is None:
-            prev = gray
-            continue
+    width, height = size
+    prev = np.empty((height, width), dtype=np.uint8)
+    diff = np.empty_like(prev)
+    energy = []
+    decoded = 0
+    try:
+        for gray in frames:
+            if decoded:
+                energy.append(_coarse_energy(gray, prev, diff))
+            decoded += 1
+            prev[:] = gray
+    finally:
+        if reader is not None:
+            reader.close()
+        cap.release()
+        _add_timing(timings, "wall", time.perf_counter() - t_start)
+    if reader is not None and reader.returncode != 0 and not decoded:
+        print("⚠️ ffmpeg keyframe scan failed, falling back to OpenCV:", reader.error[-300:])
+        return scan_motion_activity(video_path, size, "opencv", timings, seek_index)
+    if seek_index and scanned:
+        try:
+            save_seek_index(index, video_path)
+        except Exception as e:
+            print("⚠️ Could not write seek index:", e)
 
-        diff = cv2.absdiff(gray, prev)
+    timestamps = keyframes[1:len(energy) + 1] / source_fps
+    return timestamps, np.asarray(energy)
 
-        # Feature extraction (simple motion descriptors)
-        mean_motion = np.mean(diff)
-        max_motion = np.max(diff)
-        std_motion = np.std(diff)
 
-        # Histogram-based motion
-        hist = cv2.calcHist([diff.astype("uint8")], [0], None, [16], [0, 256])
-        hist = hist.flatten()
+class SlidingWindowBuffer:
+    """
+    Ring-style buffer turning a stream of per-frame feature chunks into
+    sliding windows. Only frames a future window can still use are kept, so
+    memory is bounded by one chunk plus one window regardless of video length.
 
-        feature_vector = np.concatenate([[mean_motion, max_motion, std_motion], hist])
-        feature_list.append(feature_vector)
+    Windows start at 0, stride, 2*stride, ... exactly as sliding_windows()
+    would produce them on the full sequence. They are only released once more
+    than window_frames frames have been seen, so a stream that ends at or
+    below window_frames can still be summarized as a single clip via
+    `buffer`.
+    """
 
-        prev = gray
+    def __init__(self, window_frames: int, stride: int):
+        self.window_frames = int(window_frames)
+        self.stride = int(stride)
+        self.buffer = None
+        self.offset = 0  # global frame index of buffer[0]
+        self.next_start = 0
+        self.frames_seen = 0
 
-    cap.release()
+    def push(self, chunk: np.ndarray):
+        """
+        Appends a (n, feature_dim) chunk. Returns (starts, windows) for every
+        newly complete window, or None. `windows` is a read-only view of shape
+        (n_windows, window_frames, feature_dim).
+        """
+        batch = self.push_span(chunk)
+        if batch is None:
+            return None
+        starts, span = batch
+        return starts, sliding_windows(span, self.window_frames, self.stride)
 
-    if len(feature_list) == 0:
-        return None
+    def push_span(self, chunk: np.ndarray):
+        """
+        Like push(), but returns (starts, span): the contiguous frames covering
+        every newly complete window, with window i at span[starts[i] - starts[0]:].
+        Handy for feeding a WindowFeatureEngine.
+        """
+        chunk = np.asarray(chunk)
+        if chunk.ndim != 2 or len(chunk) == 0:
+            return None
 
-    return np.array(feature_list)
+        if self.buffer is None or len(self.buffer) == 0:
+            self.buffer = chunk
+        else:
+            self.buffer = np.concatenate([self.buffer, chunk])
+        self.frames_seen += len(chunk)
+
+        end = self.offset + len(self.buffer)
+        if self.frames_seen <= self.window_frames or end - self.next_start < self.window_frames:
+            return None
+
+        n_windows = (end - self.next_start - self.window_frames) // self.stride + 1
+        local = self.next_start - self.offset
+        span = self.buffer[local:local + (n_windows - 1) * self.stride + self.window_frames]
+        starts = self.next_start + self.stride * np.arange(n_windows)
+
+        self.next_start += n_windows * self.stride
+        drop = min(self.next_start - self.offset, len(self.buffer))
+        # Copy the retained tail so it does not pin the consumed frames in memory.
+        self.buffer = self.buffer[drop:].copy()
+        self.offset += drop
+        return starts, span
+
+
+@lru_cache(maxsize=64)
+def _resample_plan(n_frames: int, target_frames: int):
+    """
+    Gather indices and weights for resampling n_frames -> target_frames.
+    Mirrors np.interp on integer source positions exactly: each output row is
+    (hi - lo) * frac + lo in float64, and rows landing exactly on a source
+    frame copy it verbatim.
+    """
+    dst_idx = np.linspace(0, n_frames - 1, num=target_frames, dtype=np.float32)
+    dst_idx = dst_idx.astype(np.float64)
+    lo = np.minimum(np.floor(dst_idx).astype(np.intp), n_frames - 1)
+    hi = np.minimum(lo + 1, n_frames - 1)
+    frac = dst_idx - lo
+    exact = frac == 0.0
+    for a in (lo, hi, frac, exact):
+        a.setflags(write=False)
+    return lo, hi, frac, exact
+
+
+def _resample(arr: np.ndarray, target_frames: int) -> np.ndarray:
+    """Resamples axis -2 of a (..., n_frames, dim) float32 array in one pass."""
+    lo, hi, frac, exact = _resample_plan(arr.shape[-2], target_frames)
+    lo_vals = arr[..., lo, :].astype(np.float64)
+    hi_vals = arr[..., hi, :].astype(np.float64)
+    out = (hi_vals - lo_vals) * frac[:, None] + lo_vals
+    out[..., exact, :] = lo_vals[..., exact, :]
+    return out.astype(np.float32)
 
 
 def summarize_feature_sequence(feature_seq: np.ndarray, target_frames: int = MODEL_FRAMES):
@@ -75,24 +1009,122 @@ def summarize_feature_sequence(feature_seq: np.ndarray, target_frames: int = MOD
     if arr.ndim != 2:
         return None
 
-    n_frames, feat_dim = arr.shape
-
-    if n_frames == target_frames:
+    if arr.shape[0] == target_frames:
         sampled = arr
     else:
-        # Linear interpolation indices keep dimensionality fixed across clip lengths.
-        src_idx = np.arange(n_frames, dtype=np.float32)
-        dst_idx = np.linspace(0, n_frames - 1, num=target_frames, dtype=np.float32)
-        sampled = np.empty((target_frames, feat_dim), dtype=np.float32)
-        for d in range(feat_dim):
-            sampled[:, d] = np.interp(dst_idx, src_idx, arr[:, d])
+        # Linear interpolation keeps dimensionality fixed across clip lengths.
+        sampled = _resample(arr, target_frames)
 
     return sampled.flatten()
 
 
-def extract_clip_features(video_path: str, target_frames: int = MODEL_FRAMES):
+def summarize_feature_windows(windows: np.ndarray, target_frames: int = MODEL_FRAMES):
+    """
+    Batched summarize_feature_sequence for equal-length windows.
+    windows: (n_windows, window_frames, feature_dim)
+    Returns a (n_windows, target_frames * feature_dim) float32 matrix whose rows
+    are identical to calling summarize_feature_sequence on each window.
+    """
+    arr = np.asarray(windows, dtype=np.float32)
+    if arr.ndim != 3 or arr.shape[0] == 0 or arr.shape[1] == 0:
+        return None
+
+    n_windows, window_frames, feat_dim = arr.shape
+    if window_frames == target_frames:
+        sampled = arr
+    else:
+        sampled = _resample(arr, target_frames)
+
+    return sampled.reshape(n_windows, target_frames * feat_dim)
+
+
+class WindowFeatureEngine:
+    """
+    Fixed-length window features for many (possibly heavily overlapping)
+    windows of one per-frame sequence. The float64 sequence, its forward
+    differences and its prefix sums are built once; each window vector is
+    then a single gather + multiply-add into those arrays, so shrinking the
+    stride adds gathers but never re-converts or re-differences frames.
+
+    window_vectors() rows are bit-identical to summarize_feature_windows()
+    on the same windows.
+    """
+
+    def __init__(self, feature_seq: np.ndarray, window_frames: int, target_frames: int = MODEL_FRAMES):
+        arr = np.asarray(feature_seq, dtype=np.float32)
+        if arr.ndim != 2:
+            raise ValueError("feature_seq must be (n_frames, feature_dim)")
+        self.n_frames, self.feature_dim = arr.shape
+        self.window_frames = int(window_frames)
+        self.target_frames = int(target_frames)
+
+        self.values = arr.astype(np.float64)
+        # delta[i] = values[i + 1] - values[i]; the trailing zero row is only
+        # ever multiplied by frac == 0 and then overwritten as an exact row.
+        self.delta = np.zeros_like(self.values)
+        np.subtract(self.values[1:], self.values[:-1], out=self.delta[:-1])
+        self.cumsum = np.zeros((self.n_frames + 1, self.feature_dim))
+        np.cumsum(self.values, axis=0, out=self.cumsum[1:])
+        self.cumsum_sq = np.zeros_like(self.cumsum)
+        np.cumsum(self.values * self.values, axis=0, out=self.cumsum_sq[1:])
+
+    def window_starts(self, stride: int) -> np.ndarray:
+        """Every window start 0, stride, 2*stride, ... that fits the sequence."""
+        last = self.n_frames - self.window_frames
+        if last < 0:
+            return np.zeros(0, dtype=np.intp)
+        return np.arange(0, last + 1, int(stride), dtype=np.intp)
+
+    def window_vectors(self, starts) -> np.ndarray:
+        """(n_windows, target_frames * feature_dim) float32 window features."""
+        starts = np.asarray(starts, dtype=np.intp)
+        if self.window_frames == self.target_frames:
+            idx = starts[:, None] + np.arange(self.target_frames)
+            return self.values[idx].astype(np.float32).reshape(len(starts), self.target_frames * self.feature_dim)
+
+        lo, _, frac, exact = _resample_plan(self.window_frames, self.target_frames)
+        idx = starts[:, None] + lo
+        out = self.delta[idx] * frac[:, None] + self.values[idx]
+        out[:, exact] = self.values[idx[:, exact]]
+        return out.astype(np.float32).reshape(len(starts), self.target_frames * self.feature_dim)
+
+    def window_means(self, starts) -> np.ndarray:
+        """(n_windows, feature_dim) per-window means from the prefix sums, O(1) per window."""
+        starts = np.asarray(starts, dtype=np.intp)
+        totals = self.cumsum[starts + self.window_frames] - self.cumsum[starts]
+        return totals / self.window_frames
+
+    def window_stds(self, starts) -> np.ndarray:
+        """(n_windows, feature_dim) per-window standard deviations from the prefix sums."""
+        starts = np.asarray(starts, dtype=np.intp)
+        sq = self.cumsum_sq[starts + self.window_frames] - self.cumsum_sq[starts]
+        mean = self.window_means(starts)
+        return np.sqrt(np.maximum(sq / self.window_frames - mean * mean, 0.0))
+
+
+def sliding_windows(feature_seq: np.ndarray, window_frames: int, stride: int):
+    """
+    Zero-copy (n_windows, window_frames, feature_dim) view of every window
+    starting at 0, stride, 2*stride, ... that fits inside feature_seq.
+    """
+    arr = np.asarray(feature_seq)
+    view = np.lib.stride_tricks.sliding_window_view(arr, window_frames, axis=0)
+    return view[::stride].transpose(0, 2, 1)
+
+
+def extract_clip_features(
+    video_path: str,
+    target_frames: int = MODEL_FRAMES,
+    target_fps=None,
+    frame_stride=None,
+    decoder=None,
+    timings=None,
+):
     """
     Convenience helper for training/inference from a video file path.
+    timings["decoder"] records the backend that actually decoded the clip.
     """
-    seq = extract_keypoints_from_video(video_path)
+    seq = extract_keypoints_from_video(
+        video_path, target_fps=target_fps, frame_stride=frame_stride, decoder=decoder, timings=timings
+    )
     return summarize_feature_sequence(seq, target_frames=target_frames)
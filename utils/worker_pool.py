@@ -0,0 +1,20 @@
+import os
+
+import cv2
+
+
+def resolve_worker_count(workers=None, default: int = 0) -> int:
+    """None -> default, 0 -> one worker per CPU core."""
+    if workers is None:
+        workers = default
+    workers = int(workers)
+    if workers <= 0:
+        workers = os.cpu_count() or 1
+    return workers
+
+
+def init_decode_worker():
+    """ProcessPoolExecutor initializer for workers that decode video."""
+    # The pool supplies the parallelism; letting every worker also spin up
+    # OpenCV's own thread pool would oversubscribe the cores.
+    cv2.setNumThreads(1)